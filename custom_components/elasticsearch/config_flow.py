@@ -24,27 +24,104 @@ from custom_components.elasticsearch.es_privilege_check import ESPrivilegeCheck
 from custom_components.elasticsearch.es_version import ElasticsearchVersion
 
 from .const import (
+    ATTRIBUTE_OVERFLOW_STRATEGY_DROP,
+    ATTRIBUTE_OVERFLOW_STRATEGY_SERIALIZE,
+    CONF_ADDITIONAL_CLUSTERS,
+    CONF_ATTRIBUTE_FIELD_BUDGET,
+    CONF_ATTRIBUTE_OVERFLOW_STRATEGY,
+    CONF_BULK_CHUNK_SIZE_MAX,
+    CONF_BULK_CHUNK_SIZE_MIN,
+    CONF_BULK_DISCOVER_MAX_BYTES,
+    CONF_BULK_MAX_BYTES,
+    CONF_BULK_TARGET_LATENCY,
+    CONF_CIRCUIT_BREAKER_ERROR_RATE,
+    CONF_CIRCUIT_BREAKER_LATENCY,
+    CONF_CIRCUIT_BREAKER_OPEN_DURATION,
+    CONF_CIRCUIT_BREAKER_PROBE_SIZE,
+    CONF_CONNECTION_KEEPALIVE,
+    CONF_CONNECTION_POOL_SIZE,
     CONF_DATASTREAM_NAME_PREFIX,
     CONF_DATASTREAM_NAMESPACE,
     CONF_DATASTREAM_TYPE,
+    CONF_DOWNSAMPLING,
     CONF_EXCLUDED_DOMAINS,
     CONF_EXCLUDED_ENTITIES,
+    CONF_FLATTENED_ATTRIBUTES,
     CONF_ILM_ENABLED,
     CONF_ILM_POLICY_NAME,
     CONF_INCLUDED_DOMAINS,
     CONF_INCLUDED_ENTITIES,
     CONF_INDEX_FORMAT,
     CONF_INDEX_MODE,
+    CONF_NODE_URLS,
+    CONF_NUMERIC_DATASTREAM,
+    CONF_PREWARM_CONNECTIONS,
     CONF_PUBLISH_ENABLED,
     CONF_PUBLISH_FREQUENCY,
     CONF_PUBLISH_MODE,
+    CONF_RATE_LIMIT_BURST,
+    CONF_RATE_LIMIT_DOMAINS,
+    CONF_RATE_LIMIT_ENTITIES,
+    CONF_RATE_LIMIT_PER_ENTITY,
+    CONF_RATE_LIMIT_STRATEGY,
+    CONF_ROLLUP_DOMAINS,
+    CONF_ROLLUP_ENTITIES,
+    CONF_ROLLUP_PASSTHROUGH_DOMAINS,
+    CONF_ROLLUP_PASSTHROUGH_ENTITIES,
+    CONF_ROLLUP_WINDOW,
+    CONF_SERVER_SIDE_ENRICHMENT,
+    CONF_SINK_QUEUE_SIZE,
+    CONF_SNAPSHOT_SHARDS,
+    CONF_SNIFF_NODES,
     CONF_SSL_CA_PATH,
+    CONF_STORAGE_PROFILE,
+    CONF_TRACE_ENTITIES,
+    CONF_TRACE_SAMPLE_RATE,
+    CONF_TSDS_DIMENSIONS,
+    DEFAULT_ATTRIBUTE_FIELD_BUDGET,
+    DEFAULT_ATTRIBUTE_OVERFLOW_STRATEGY,
+    DEFAULT_BULK_CHUNK_SIZE_MAX,
+    DEFAULT_BULK_CHUNK_SIZE_MIN,
+    DEFAULT_BULK_DISCOVER_MAX_BYTES,
+    DEFAULT_BULK_MAX_BYTES,
+    DEFAULT_BULK_TARGET_LATENCY,
+    DEFAULT_CIRCUIT_BREAKER_ERROR_RATE,
+    DEFAULT_CIRCUIT_BREAKER_LATENCY,
+    DEFAULT_CIRCUIT_BREAKER_OPEN_DURATION,
+    DEFAULT_CIRCUIT_BREAKER_PROBE_SIZE,
+    DEFAULT_CONNECTION_KEEPALIVE,
+    DEFAULT_CONNECTION_POOL_SIZE,
+    DEFAULT_DOWNSAMPLING,
+    DEFAULT_FLATTENED_ATTRIBUTES,
+    DEFAULT_NUMERIC_DATASTREAM,
+    DEFAULT_PREWARM_CONNECTIONS,
+    DEFAULT_RATE_LIMIT_BURST,
+    DEFAULT_RATE_LIMIT_PER_ENTITY,
+    DEFAULT_RATE_LIMIT_STRATEGY,
+    DEFAULT_ROLLUP_WINDOW,
+    DEFAULT_SERVER_SIDE_ENRICHMENT,
+    DEFAULT_SINK_QUEUE_SIZE,
+    DEFAULT_SNAPSHOT_SHARDS,
+    DEFAULT_SNIFF_NODES,
+    DEFAULT_STORAGE_PROFILE,
+    DEFAULT_TRACE_SAMPLE_RATE,
+    DEFAULT_TSDS_DIMENSIONS,
     INDEX_MODE_DATASTREAM,
     INDEX_MODE_LEGACY,
     ONE_MINUTE,
     PUBLISH_MODE_ALL,
     PUBLISH_MODE_ANY_CHANGES,
     PUBLISH_MODE_STATE_CHANGES,
+    RATE_LIMIT_STRATEGY_DROP,
+    RATE_LIMIT_STRATEGY_LATEST,
+    STORAGE_PROFILE_BALANCED,
+    STORAGE_PROFILE_MINIMAL_STORAGE,
+    STORAGE_PROFILE_QUERY_OPTIMIZED,
+    TSDS_DIMENSION_DEVICE_ID,
+    TSDS_DIMENSION_DOMAIN,
+    TSDS_DIMENSION_ENTITY_ID,
+    TSDS_DIMENSION_OBJECT_ID,
+    TSDS_IDENTIFYING_DIMENSIONS,
 )
 from .const import DOMAIN as ELASTIC_DOMAIN
 from .errors import (
@@ -459,19 +536,53 @@ class ElasticOptionsFlowHandler(config_entries.OptionsFlow):
 
     async def async_step_publish_options(self, user_input=None):
         """Publish Options."""
+        errors = {}
+
         if user_input is not None:
+            for conf_rates in (CONF_RATE_LIMIT_DOMAINS, CONF_RATE_LIMIT_ENTITIES):
+                if not self._valid_rate_limits(user_input.get(conf_rates)):
+                    errors[conf_rates] = "invalid_rate_limits"
+            if not self._valid_tsds_dimensions(user_input.get(CONF_TSDS_DIMENSIONS)):
+                errors[CONF_TSDS_DIMENSIONS] = "invalid_tsds_dimensions"
+
+        if user_input is not None and not errors:
             self.options.update(user_input)
             if (
                 self.config_entry.data.get(CONF_INDEX_MODE, INDEX_MODE_DATASTREAM)
                 == INDEX_MODE_DATASTREAM
             ):
-                return await self._update_options()
+                return await self._async_step_after_index_options()
             else:
                 return await self.async_step_ilm_options()
 
         return self.async_show_form(
             step_id="publish_options",
             data_schema=vol.Schema(await self.async_build_publish_options_schema()),
+            errors=errors,
+        )
+
+    @staticmethod
+    def _valid_rate_limits(rates) -> bool:
+        """Rate limit overrides must map a domain or entity to a number of documents per minute."""
+        if rates is None:
+            return True
+        if not isinstance(rates, dict):
+            return False
+        return all(
+            isinstance(name, str)
+            and isinstance(rate, int | float)
+            and not isinstance(rate, bool)
+            and rate >= 0
+            for name, rate in rates.items()
+        )
+
+    @staticmethod
+    def _valid_tsds_dimensions(dimensions) -> bool:
+        """Time series dimensions must include a field which tells the entities apart."""
+        if dimensions is None:
+            return True
+        return any(
+            dimension in TSDS_IDENTIFYING_DIMENSIONS for dimension in dimensions
         )
 
     async def async_step_ilm_options(self, user_input=None):
@@ -480,7 +591,7 @@ class ElasticOptionsFlowHandler(config_entries.OptionsFlow):
 
         if user_input is not None:
             self.options.update(user_input)
-            return await self._update_options()
+            return await self._async_step_after_index_options()
 
         return self.async_show_form(
             step_id="ilm_options",
@@ -488,6 +599,42 @@ class ElasticOptionsFlowHandler(config_entries.OptionsFlow):
             errors=errors,
         )
 
+    async def async_step_connection_options(self, user_input=None):
+        """Show connection options."""
+        errors = {}
+
+        if user_input is not None:
+            if self._valid_additional_clusters(
+                user_input.get(CONF_ADDITIONAL_CLUSTERS)
+            ):
+                self.options.update(user_input)
+                return await self._update_options()
+            errors[CONF_ADDITIONAL_CLUSTERS] = "invalid_additional_clusters"
+
+        return self.async_show_form(
+            step_id="connection_options",
+            data_schema=vol.Schema(self._build_connection_options_schema()),
+            errors=errors,
+        )
+
+    @staticmethod
+    def _valid_additional_clusters(clusters) -> bool:
+        """Each additional cluster must be a mapping which at least contains a URL."""
+        if clusters is None:
+            return True
+        if not isinstance(clusters, list):
+            return False
+        return all(
+            isinstance(cluster, dict) and isinstance(cluster.get(CONF_URL), str)
+            for cluster in clusters
+        )
+
+    async def _async_step_after_index_options(self):
+        """Offer connection options to advanced users, or finish the options flow."""
+        if self.show_advanced_options:
+            return await self.async_step_connection_options()
+        return await self._update_options()
+
     async def _update_options(self):
         """Update config entry options."""
         return self.async_create_entry(title="", data=self.options)
@@ -565,6 +712,216 @@ class ElasticOptionsFlowHandler(config_entries.OptionsFlow):
             ): cv.multi_select(entity_options),
         }
 
+        if self.show_advanced_options:
+            schema[
+                vol.Required(
+                    CONF_RATE_LIMIT_PER_ENTITY,
+                    default=self._get_config_value(
+                        CONF_RATE_LIMIT_PER_ENTITY, DEFAULT_RATE_LIMIT_PER_ENTITY
+                    ),
+                )
+            ] = vol.All(int, vol.Range(min=0))
+
+            for conf_rates in (CONF_RATE_LIMIT_DOMAINS, CONF_RATE_LIMIT_ENTITIES):
+                schema[
+                    vol.Optional(
+                        conf_rates, default=self._get_config_value(conf_rates, {})
+                    )
+                ] = selector({"object": {}})
+
+            schema[
+                vol.Required(
+                    CONF_RATE_LIMIT_BURST,
+                    default=self._get_config_value(
+                        CONF_RATE_LIMIT_BURST, DEFAULT_RATE_LIMIT_BURST
+                    ),
+                )
+            ] = vol.All(int, vol.Range(min=1))
+
+            schema[
+                vol.Required(
+                    CONF_RATE_LIMIT_STRATEGY,
+                    default=self._get_config_value(
+                        CONF_RATE_LIMIT_STRATEGY, DEFAULT_RATE_LIMIT_STRATEGY
+                    ),
+                )
+            ] = selector(
+                {
+                    "select": {
+                        "options": [
+                            {
+                                "label": "Keep the latest value",
+                                "value": RATE_LIMIT_STRATEGY_LATEST,
+                            },
+                            {
+                                "label": "Drop",
+                                "value": RATE_LIMIT_STRATEGY_DROP,
+                            },
+                        ]
+                    }
+                }
+            )
+
+            schema[
+                vol.Required(
+                    CONF_SNAPSHOT_SHARDS,
+                    default=self._get_config_value(
+                        CONF_SNAPSHOT_SHARDS, DEFAULT_SNAPSHOT_SHARDS
+                    ),
+                )
+            ] = vol.All(int, vol.Range(min=1))
+
+            schema[
+                vol.Required(
+                    CONF_ATTRIBUTE_FIELD_BUDGET,
+                    default=self._get_config_value(
+                        CONF_ATTRIBUTE_FIELD_BUDGET, DEFAULT_ATTRIBUTE_FIELD_BUDGET
+                    ),
+                )
+            ] = vol.All(int, vol.Range(min=0))
+
+            schema[
+                vol.Required(
+                    CONF_ATTRIBUTE_OVERFLOW_STRATEGY,
+                    default=self._get_config_value(
+                        CONF_ATTRIBUTE_OVERFLOW_STRATEGY,
+                        DEFAULT_ATTRIBUTE_OVERFLOW_STRATEGY,
+                    ),
+                )
+            ] = selector(
+                {
+                    "select": {
+                        "options": [
+                            {
+                                "label": "Serialize into a single attribute",
+                                "value": ATTRIBUTE_OVERFLOW_STRATEGY_SERIALIZE,
+                            },
+                            {
+                                "label": "Drop",
+                                "value": ATTRIBUTE_OVERFLOW_STRATEGY_DROP,
+                            },
+                        ]
+                    }
+                }
+            )
+
+            schema[
+                vol.Required(
+                    CONF_STORAGE_PROFILE,
+                    default=self._get_config_value(
+                        CONF_STORAGE_PROFILE, DEFAULT_STORAGE_PROFILE
+                    ),
+                )
+            ] = selector(
+                {
+                    "select": {
+                        "options": [
+                            {
+                                "label": "Balanced",
+                                "value": STORAGE_PROFILE_BALANCED,
+                            },
+                            {
+                                "label": "Minimal storage",
+                                "value": STORAGE_PROFILE_MINIMAL_STORAGE,
+                            },
+                            {
+                                "label": "Query optimized",
+                                "value": STORAGE_PROFILE_QUERY_OPTIMIZED,
+                            },
+                        ]
+                    }
+                }
+            )
+
+            current_trace_entities = self._get_config_value(CONF_TRACE_ENTITIES, [])
+            schema[
+                vol.Required(
+                    CONF_TRACE_SAMPLE_RATE,
+                    default=self._get_config_value(
+                        CONF_TRACE_SAMPLE_RATE, DEFAULT_TRACE_SAMPLE_RATE
+                    ),
+                )
+            ] = vol.All(int, vol.Range(min=0))
+            schema[
+                vol.Required(
+                    CONF_TRACE_ENTITIES,
+                    default=current_trace_entities,
+                )
+            ] = cv.multi_select(
+                self._dedup_list(entity_options + current_trace_entities)
+            )
+
+        if (
+            self.show_advanced_options
+            and self.config_entry.data.get(CONF_INDEX_MODE, DEFAULT_INDEX_MODE)
+            == INDEX_MODE_DATASTREAM
+        ):
+            schema[
+                vol.Required(
+                    CONF_SERVER_SIDE_ENRICHMENT,
+                    default=self._get_config_value(
+                        CONF_SERVER_SIDE_ENRICHMENT, DEFAULT_SERVER_SIDE_ENRICHMENT
+                    ),
+                )
+            ] = bool
+            schema[
+                vol.Required(
+                    CONF_NUMERIC_DATASTREAM,
+                    default=self._get_config_value(
+                        CONF_NUMERIC_DATASTREAM, DEFAULT_NUMERIC_DATASTREAM
+                    ),
+                )
+            ] = bool
+            schema[
+                vol.Required(
+                    CONF_ROLLUP_WINDOW,
+                    default=self._get_config_value(
+                        CONF_ROLLUP_WINDOW, DEFAULT_ROLLUP_WINDOW
+                    ),
+                )
+            ] = vol.All(int, vol.Range(min=1))
+            for conf_rollup, options in (
+                (CONF_ROLLUP_DOMAINS, domain_options),
+                (CONF_ROLLUP_ENTITIES, entity_options),
+                (CONF_ROLLUP_PASSTHROUGH_DOMAINS, domain_options),
+                (CONF_ROLLUP_PASSTHROUGH_ENTITIES, entity_options),
+            ):
+                current = self._get_config_value(conf_rollup, [])
+                schema[vol.Required(conf_rollup, default=current)] = cv.multi_select(
+                    self._dedup_list(options + current)
+                )
+            schema[
+                vol.Required(
+                    CONF_DOWNSAMPLING,
+                    default=self._get_config_value(
+                        CONF_DOWNSAMPLING, DEFAULT_DOWNSAMPLING
+                    ),
+                )
+            ] = bool
+            schema[
+                vol.Required(
+                    CONF_FLATTENED_ATTRIBUTES,
+                    default=self._get_config_value(
+                        CONF_FLATTENED_ATTRIBUTES, DEFAULT_FLATTENED_ATTRIBUTES
+                    ),
+                )
+            ] = bool
+            schema[
+                vol.Required(
+                    CONF_TSDS_DIMENSIONS,
+                    default=self._get_config_value(
+                        CONF_TSDS_DIMENSIONS, DEFAULT_TSDS_DIMENSIONS
+                    ),
+                )
+            ] = cv.multi_select(
+                {
+                    TSDS_DIMENSION_ENTITY_ID: "Entity ID",
+                    TSDS_DIMENSION_DOMAIN: "Domain",
+                    TSDS_DIMENSION_DEVICE_ID: "Device ID",
+                    TSDS_DIMENSION_OBJECT_ID: "Object ID",
+                }
+            )
+
         if (
             self.show_advanced_options
             and self.config_entry.data.get(CONF_INDEX_MODE, DEFAULT_INDEX_MODE)
@@ -603,6 +960,104 @@ class ElasticOptionsFlowHandler(config_entries.OptionsFlow):
 
         return schema
 
+    def _build_connection_options_schema(self):
+        schema = {
+            vol.Required(
+                CONF_CONNECTION_POOL_SIZE,
+                default=self._get_config_value(
+                    CONF_CONNECTION_POOL_SIZE, DEFAULT_CONNECTION_POOL_SIZE
+                ),
+            ): vol.All(int, vol.Range(min=1)),
+            vol.Required(
+                CONF_CONNECTION_KEEPALIVE,
+                default=self._get_config_value(
+                    CONF_CONNECTION_KEEPALIVE, DEFAULT_CONNECTION_KEEPALIVE
+                ),
+            ): vol.All(int, vol.Range(min=0)),
+            vol.Required(
+                CONF_PREWARM_CONNECTIONS,
+                default=self._get_config_value(
+                    CONF_PREWARM_CONNECTIONS, DEFAULT_PREWARM_CONNECTIONS
+                ),
+            ): vol.All(int, vol.Range(min=0)),
+            vol.Optional(
+                CONF_NODE_URLS,
+                default=self._get_config_value(CONF_NODE_URLS, []),
+            ): selector({"text": {"type": "url", "multiple": True}}),
+            vol.Optional(
+                CONF_ADDITIONAL_CLUSTERS,
+                default=self._get_config_value(CONF_ADDITIONAL_CLUSTERS, []),
+            ): selector({"object": {}}),
+            vol.Required(
+                CONF_SINK_QUEUE_SIZE,
+                default=self._get_config_value(
+                    CONF_SINK_QUEUE_SIZE, DEFAULT_SINK_QUEUE_SIZE
+                ),
+            ): vol.All(int, vol.Range(min=1)),
+            vol.Required(
+                CONF_SNIFF_NODES,
+                default=self._get_config_value(CONF_SNIFF_NODES, DEFAULT_SNIFF_NODES),
+            ): bool,
+            vol.Required(
+                CONF_CIRCUIT_BREAKER_ERROR_RATE,
+                default=self._get_config_value(
+                    CONF_CIRCUIT_BREAKER_ERROR_RATE, DEFAULT_CIRCUIT_BREAKER_ERROR_RATE
+                ),
+            ): vol.All(vol.Coerce(float), vol.Range(min=0, max=1, min_included=False)),
+            vol.Required(
+                CONF_CIRCUIT_BREAKER_LATENCY,
+                default=self._get_config_value(
+                    CONF_CIRCUIT_BREAKER_LATENCY, DEFAULT_CIRCUIT_BREAKER_LATENCY
+                ),
+            ): vol.All(int, vol.Range(min=1)),
+            vol.Required(
+                CONF_CIRCUIT_BREAKER_OPEN_DURATION,
+                default=self._get_config_value(
+                    CONF_CIRCUIT_BREAKER_OPEN_DURATION,
+                    DEFAULT_CIRCUIT_BREAKER_OPEN_DURATION,
+                ),
+            ): vol.All(int, vol.Range(min=1)),
+            vol.Required(
+                CONF_CIRCUIT_BREAKER_PROBE_SIZE,
+                default=self._get_config_value(
+                    CONF_CIRCUIT_BREAKER_PROBE_SIZE,
+                    DEFAULT_CIRCUIT_BREAKER_PROBE_SIZE,
+                ),
+            ): vol.All(int, vol.Range(min=1)),
+            vol.Required(
+                CONF_BULK_CHUNK_SIZE_MIN,
+                default=self._get_config_value(
+                    CONF_BULK_CHUNK_SIZE_MIN, DEFAULT_BULK_CHUNK_SIZE_MIN
+                ),
+            ): vol.All(int, vol.Range(min=1)),
+            vol.Required(
+                CONF_BULK_CHUNK_SIZE_MAX,
+                default=self._get_config_value(
+                    CONF_BULK_CHUNK_SIZE_MAX, DEFAULT_BULK_CHUNK_SIZE_MAX
+                ),
+            ): vol.All(int, vol.Range(min=1)),
+            vol.Required(
+                CONF_BULK_TARGET_LATENCY,
+                default=self._get_config_value(
+                    CONF_BULK_TARGET_LATENCY, DEFAULT_BULK_TARGET_LATENCY
+                ),
+            ): vol.All(vol.Coerce(float), vol.Range(min=0, min_included=False)),
+            vol.Required(
+                CONF_BULK_MAX_BYTES,
+                default=self._get_config_value(
+                    CONF_BULK_MAX_BYTES, DEFAULT_BULK_MAX_BYTES
+                ),
+            ): vol.All(int, vol.Range(min=0)),
+            vol.Required(
+                CONF_BULK_DISCOVER_MAX_BYTES,
+                default=self._get_config_value(
+                    CONF_BULK_DISCOVER_MAX_BYTES, DEFAULT_BULK_DISCOVER_MAX_BYTES
+                ),
+            ): bool,
+        }
+
+        return schema
+
     def _dedup_list(self, list_to_dedup):
         return list(dict.fromkeys(list_to_dedup))
 
@@ -2,6 +2,12 @@
 
 DOMAIN = "elasticsearch"
 
+# States of sun.sun, defined here rather than imported so that the sun integration is not loaded.
+STATE_ABOVE_HORIZON = "above_horizon"
+STATE_BELOW_HORIZON = "below_horizon"
+# Sensor state class of monotonically increasing totals, defined here for the same reason.
+STATE_CLASS_TOTAL_INCREASING = "total_increasing"
+
 CONF_PUBLISH_ENABLED = "publish_enabled"
 CONF_INDEX_FORMAT = "index_format"
 
@@ -29,6 +35,51 @@ CONF_ONLY_PUBLISH_CHANGED = "only_publish_changed"
 
 CONF_TAGS = "tags"
 
+CONF_RATE_LIMIT_PER_ENTITY = "rate_limit_per_entity"
+CONF_RATE_LIMIT_DOMAINS = "rate_limit_domains"
+CONF_RATE_LIMIT_ENTITIES = "rate_limit_entities"
+CONF_RATE_LIMIT_BURST = "rate_limit_burst"
+CONF_RATE_LIMIT_STRATEGY = "rate_limit_strategy"
+
+CONF_SNAPSHOT_SHARDS = "snapshot_shards"
+
+CONF_TRACE_SAMPLE_RATE = "trace_sample_rate"
+CONF_TRACE_ENTITIES = "trace_entities"
+
+CONF_CONNECTION_POOL_SIZE = "connection_pool_size"
+CONF_CONNECTION_KEEPALIVE = "connection_keepalive"
+CONF_PREWARM_CONNECTIONS = "prewarm_connections"
+
+CONF_NODE_URLS = "node_urls"
+CONF_SNIFF_NODES = "sniff_nodes"
+
+CONF_CIRCUIT_BREAKER_ERROR_RATE = "circuit_breaker_error_rate"
+CONF_CIRCUIT_BREAKER_LATENCY = "circuit_breaker_latency"
+CONF_CIRCUIT_BREAKER_OPEN_DURATION = "circuit_breaker_open_duration"
+CONF_CIRCUIT_BREAKER_PROBE_SIZE = "circuit_breaker_probe_size"
+
+CONF_BULK_CHUNK_SIZE_MIN = "bulk_chunk_size_min"
+CONF_BULK_CHUNK_SIZE_MAX = "bulk_chunk_size_max"
+CONF_BULK_TARGET_LATENCY = "bulk_target_latency"
+CONF_BULK_MAX_BYTES = "bulk_max_bytes"
+CONF_BULK_DISCOVER_MAX_BYTES = "bulk_discover_max_bytes"
+
+CONF_ADDITIONAL_CLUSTERS = "additional_clusters"
+CONF_SINK_QUEUE_SIZE = "sink_queue_size"
+CONF_SERVER_SIDE_ENRICHMENT = "server_side_enrichment"
+CONF_TSDS_DIMENSIONS = "tsds_dimensions"
+CONF_NUMERIC_DATASTREAM = "numeric_datastream"
+CONF_ATTRIBUTE_FIELD_BUDGET = "attribute_field_budget"
+CONF_ATTRIBUTE_OVERFLOW_STRATEGY = "attribute_overflow_strategy"
+CONF_FLATTENED_ATTRIBUTES = "flattened_attributes"
+CONF_STORAGE_PROFILE = "storage_profile"
+CONF_ROLLUP_DOMAINS = "rollup_domains"
+CONF_ROLLUP_ENTITIES = "rollup_entities"
+CONF_ROLLUP_PASSTHROUGH_DOMAINS = "rollup_passthrough_domains"
+CONF_ROLLUP_PASSTHROUGH_ENTITIES = "rollup_passthrough_entities"
+CONF_ROLLUP_WINDOW = "rollup_window"
+CONF_DOWNSAMPLING = "downsampling"
+
 ONE_MINUTE = 60
 ONE_HOUR = 60 * 60
 
@@ -36,11 +87,163 @@ VERSION_SUFFIX = "-v4_2"
 
 DATASTREAM_METRICS_INDEX_TEMPLATE_NAME = "metrics-homeassistant"
 DATASTREAM_METRICS_ILM_POLICY_NAME = "metrics-homeassistant"
+# Existing ILM policies are never updated, so downsampling uses a policy of its own.
+DATASTREAM_METRICS_DOWNSAMPLING_ILM_POLICY_NAME = "metrics-homeassistant-downsampling"
+# Numeric states are published to metrics-homeassistant_numeric.<domain>-<namespace>
+DATASTREAM_NUMERIC_DATASET_SUFFIX = "_numeric"
+DATASTREAM_NUMERIC_INDEX_TEMPLATE_NAME = "metrics-homeassistant_numeric"
+# Rollups of numeric states are published to metrics-homeassistant_rollup.<domain>-<namespace>
+DATASTREAM_ROLLUP_DATASET_SUFFIX = "_rollup"
+DATASTREAM_ROLLUP_INDEX_TEMPLATE_NAME = "metrics-homeassistant_rollup"
 LEGACY_TEMPLATE_NAME = "hass-index-template" + VERSION_SUFFIX
 
+ENTITY_METADATA_INDEX_NAME = "homeassistant-entity-metadata"
+ENTITY_METADATA_ENRICH_POLICY_NAME = "homeassistant-entity-metadata"
+ENRICHMENT_PIPELINE_NAME = "homeassistant-enrichment"
+
 PUBLISH_MODE_ALL = "All"
 PUBLISH_MODE_STATE_CHANGES = "State changes"
 PUBLISH_MODE_ANY_CHANGES = "Any changes"
 
 INDEX_MODE_LEGACY = "index"
 INDEX_MODE_DATASTREAM = "datastream"
+
+RATE_LIMIT_STRATEGY_DROP = "drop"
+RATE_LIMIT_STRATEGY_LATEST = "latest"
+
+ATTRIBUTE_OVERFLOW_STRATEGY_SERIALIZE = "serialize"
+ATTRIBUTE_OVERFLOW_STRATEGY_DROP = "drop"
+
+STORAGE_PROFILE_BALANCED = "balanced"
+STORAGE_PROFILE_MINIMAL_STORAGE = "minimal-storage"
+STORAGE_PROFILE_QUERY_OPTIMIZED = "query-optimized"
+
+# Maximum number of documents per minute, per entity. 0 disables rate limiting.
+DEFAULT_RATE_LIMIT_PER_ENTITY = 0
+DEFAULT_RATE_LIMIT_BURST = 1
+DEFAULT_RATE_LIMIT_STRATEGY = RATE_LIMIT_STRATEGY_LATEST
+
+# Number of slots the "All" publish mode snapshot is spread across, per publish interval.
+DEFAULT_SNAPSHOT_SHARDS = 1
+
+# Trace 1 in N state change events when debug logging is enabled. 0 disables sampling.
+DEFAULT_TRACE_SAMPLE_RATE = 0
+
+# Maximum number of open HTTP connections to Elasticsearch.
+DEFAULT_CONNECTION_POOL_SIZE = 10
+# Seconds an idle pooled connection is kept open.
+DEFAULT_CONNECTION_KEEPALIVE = 15
+# Number of connections opened during startup. 0 disables pre-warming.
+DEFAULT_PREWARM_CONNECTIONS = 0
+
+# Discover the other nodes of the cluster, rather than only using the configured URLs.
+DEFAULT_SNIFF_NODES = False
+# Seconds between refreshes of the discovered nodes.
+SNIFFER_TIMEOUT = 60
+
+# Seconds without any successful request before the connection is actively tested.
+PROBE_INTERVAL = 30
+# Bounds, in seconds, of the exponential backoff between tests of a failed connection.
+PROBE_BACKOFF_INITIAL = 5
+PROBE_BACKOFF_MAX = 5 * ONE_MINUTE
+
+CIRCUIT_STATE_CLOSED = "closed"
+CIRCUIT_STATE_OPEN = "open"
+CIRCUIT_STATE_HALF_OPEN = "half_open"
+
+# Fired on the Home Assistant event bus when the circuit breaker changes state.
+EVENT_CIRCUIT_BREAKER_STATE_CHANGED = "elasticsearch_circuit_breaker_state_changed"
+
+# Number of recent bulk requests the circuit breaker error rate is computed over.
+CIRCUIT_BREAKER_WINDOW = 10
+CIRCUIT_BREAKER_MIN_REQUESTS = 3
+# Fraction of failed (or too slow) bulk requests which opens the circuit breaker.
+DEFAULT_CIRCUIT_BREAKER_ERROR_RATE = 0.5
+# Seconds after which a bulk request counts as too slow.
+DEFAULT_CIRCUIT_BREAKER_LATENCY = 10
+# Seconds the circuit breaker stays open before sending a probe.
+DEFAULT_CIRCUIT_BREAKER_OPEN_DURATION = 60
+# Maximum number of documents sent while the circuit breaker is half-open.
+DEFAULT_CIRCUIT_BREAKER_PROBE_SIZE = 50
+
+# Initial number of documents per bulk request (the client's default).
+DEFAULT_BULK_CHUNK_SIZE = 500
+DEFAULT_BULK_CHUNK_SIZE_MIN = 50
+DEFAULT_BULK_CHUNK_SIZE_MAX = 5000
+# Seconds a bulk request may take for the chunk size to keep growing.
+DEFAULT_BULK_TARGET_LATENCY = 2
+BULK_CHUNK_SIZE_INCREASE = 100
+BULK_CHUNK_SIZE_DECREASE_FACTOR = 0.5
+
+# Maximum size of a bulk request body, in bytes. Defaults to the default http.max_content_length
+# of Elasticsearch (100MB), which 0 falls back to as well.
+DEFAULT_BULK_MAX_BYTES = 100 * 1024 * 1024
+DEFAULT_BULK_DISCOVER_MAX_BYTES = False
+
+# Maximum number of fields the attributes may add to the mapping of each index or
+# datastream, which keeps it below the field limit of 10000 the templates set, with
+# room for the other fields. 0 disables the limit.
+DEFAULT_ATTRIBUTE_FIELD_BUDGET = 9000
+DEFAULT_ATTRIBUTE_OVERFLOW_STRATEGY = ATTRIBUTE_OVERFLOW_STRATEGY_SERIALIZE
+# Attribute which holds the serialized attributes beyond the budget. Normalized
+# attribute names never start with an underscore, so it cannot collide with them.
+ATTRIBUTE_OVERFLOW_KEY = "_overflow"
+
+# Map the attributes of datastream documents as a single flattened field, rather
+# than mapping each attribute dynamically.
+DEFAULT_FLATTENED_ATTRIBUTES = False
+
+# Storage profile rendered into the index templates. The balanced profile matches the
+# templates as shipped.
+DEFAULT_STORAGE_PROFILE = STORAGE_PROFILE_BALANCED
+
+# Seconds covered by each rollup document, of the entities which are rolled up.
+DEFAULT_ROLLUP_WINDOW = 60
+
+# Downsample time series datastreams as they age, which replaces the original documents.
+DEFAULT_DOWNSAMPLING = False
+# (age after rollover, fixed interval) of each downsampling round.
+DOWNSAMPLING_ROUNDS = [("7d", "1m"), ("90d", "1h")]
+
+# Maximum number of documents queued for each cluster while it is unavailable.
+DEFAULT_SINK_QUEUE_SIZE = 100000
+
+# Move entity details and static properties out of the documents, and into an
+# ingest pipeline which enriches them in Elasticsearch.
+DEFAULT_SERVER_SIDE_ENRICHMENT = False
+# Seconds to wait for further registry changes before updating the entity metadata.
+ENTITY_METADATA_SYNC_DELAY = 10
+# Fingerprints of the entity metadata written to each cluster are kept in Home
+# Assistant storage, so that unchanged metadata is not written again on every start.
+ENTITY_METADATA_STORAGE_KEY = f"{DOMAIN}.entity_metadata"
+ENTITY_METADATA_STORAGE_VERSION = 1
+
+# Fields which identify a time series, when the cluster supports time series datastreams.
+# The same fields are used to route documents to shards.
+TSDS_DIMENSION_ENTITY_ID = "entity_id"
+TSDS_DIMENSION_DOMAIN = "domain"
+TSDS_DIMENSION_DEVICE_ID = "device_id"
+TSDS_DIMENSION_OBJECT_ID = "object_id"
+TSDS_DIMENSION_FIELDS = {
+    TSDS_DIMENSION_ENTITY_ID: "hass.entity.id",
+    TSDS_DIMENSION_DOMAIN: "hass.entity.domain",
+    TSDS_DIMENSION_DEVICE_ID: "hass.entity.device.id",
+    TSDS_DIMENSION_OBJECT_ID: "hass.object_id",
+}
+DEFAULT_TSDS_DIMENSIONS = [TSDS_DIMENSION_ENTITY_ID]
+# At least one of these is needed to tell the entities apart, and to give every document a routing value.
+TSDS_IDENTIFYING_DIMENSIONS = [TSDS_DIMENSION_ENTITY_ID, TSDS_DIMENSION_OBJECT_ID]
+
+# Publish numeric states to their own datastreams, with a minimal mapping.
+DEFAULT_NUMERIC_DATASTREAM = False
+
+# Maximum number of datastreams created at the same time during setup.
+DATASTREAM_CREATION_CONCURRENCY = 4
+
+# Facts about each cluster (version, flavor, fingerprints of the installed templates
+# and policies) are kept in Home Assistant storage, so that unchanged templates are
+# not installed again on every start.
+CLUSTER_FACTS_STORAGE_KEY = f"{DOMAIN}.cluster_facts"
+CLUSTER_FACTS_STORAGE_VERSION = 1
+# Seconds after which cached facts are verified against the cluster again.
+CLUSTER_FACTS_MAX_AGE = 86400
@@ -0,0 +1,37 @@
+"""Diagnostics support for Elastic."""
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.helpers.typing import HomeAssistantType
+
+from .const import DOMAIN
+from .es_integration import ElasticIntegration
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistantType, config_entry: ConfigEntry
+) -> dict:
+    """Return the publish statistics of the running integration."""
+    integration = hass.data.get(DOMAIN)
+    if not isinstance(integration, ElasticIntegration):
+        return {}
+
+    publisher = integration.publisher
+    if not publisher.publish_enabled:
+        return {"publish_enabled": False}
+
+    rate_limiter = publisher.rate_limiter
+    return {
+        "publish_enabled": True,
+        "rate_limiting": {
+            "enabled": rate_limiter.enabled,
+            "total_suppressed": rate_limiter.total_suppressed,
+            # Chattiest entities first.
+            "suppressed": dict(
+                sorted(
+                    rate_limiter.suppressed_counts.items(),
+                    key=lambda item: item[1],
+                    reverse=True,
+                )
+            ),
+        },
+    }
@@ -0,0 +1,157 @@
+"""Guard index mappings against an ever growing number of attribute fields."""
+
+import re
+
+from .const import (
+    ATTRIBUTE_OVERFLOW_KEY,
+    ATTRIBUTE_OVERFLOW_STRATEGY_DROP,
+    ATTRIBUTE_OVERFLOW_STRATEGY_SERIALIZE,
+    CONF_ATTRIBUTE_FIELD_BUDGET,
+    CONF_ATTRIBUTE_OVERFLOW_STRATEGY,
+    CONF_INDEX_MODE,
+    DEFAULT_ATTRIBUTE_FIELD_BUDGET,
+    DEFAULT_ATTRIBUTE_OVERFLOW_STRATEGY,
+    INDEX_MODE_LEGACY,
+)
+from .errors import ElasticException
+from .es_gateway import ElasticsearchGateway
+from .es_serializer import get_serializer
+from .logger import LOGGER
+
+ATTRIBUTES_PATH = "hass.entity.attributes."
+
+# The dynamic templates map each attribute as text, with keyword and float multi-fields.
+FIELDS_PER_ATTRIBUTE = 3
+
+# .ds-<datastream>-<yyyy.MM.dd>-<generation>
+BACKING_INDEX_PATTERN = re.compile(r"^\.ds-(.+)-\d{4}\.\d{2}\.\d{2}-\d{6}$")
+
+
+class AttributeFieldGuard:
+    """Limit the number of fields which attributes add to each index or datastream.
+
+    Every attribute name is mapped dynamically, and adds fields to the mapping of its
+    destination. Once the attributes of a destination take up the budgeted number of
+    fields, any new attribute is serialized into a single catch-all attribute, or
+    dropped. Attributes which were already introduced keep their own fields.
+    """
+
+    def __init__(self, config: dict):
+        """Initialize the guard."""
+        self._budget = config.get(
+            CONF_ATTRIBUTE_FIELD_BUDGET, DEFAULT_ATTRIBUTE_FIELD_BUDGET
+        )
+        self._strategy = config.get(
+            CONF_ATTRIBUTE_OVERFLOW_STRATEGY, DEFAULT_ATTRIBUTE_OVERFLOW_STRATEGY
+        )
+
+        if self._strategy not in (
+            ATTRIBUTE_OVERFLOW_STRATEGY_SERIALIZE,
+            ATTRIBUTE_OVERFLOW_STRATEGY_DROP,
+        ):
+            raise ElasticException(
+                "Unexpected attribute overflow strategy: %s", self._strategy
+            )
+
+        # Legacy documents hold the attributes twice, in hass.attributes and hass.entity.attributes.
+        self._fields_per_attribute = FIELDS_PER_ATTRIBUTE * (
+            2 if config.get(CONF_INDEX_MODE) == INDEX_MODE_LEGACY else 1
+        )
+        # Number of attributes which fit into the budget, keeping room for the overflow attribute.
+        self._capacity = self._budget // self._fields_per_attribute
+        if self._strategy == ATTRIBUTE_OVERFLOW_STRATEGY_SERIALIZE:
+            self._capacity = max(0, self._capacity - 1)
+
+        self._serializer = get_serializer()
+
+        # Attribute names introduced in each destination, other than the overflow attribute.
+        self._fields: dict[str, set[str]] = {}
+
+        self.overflow_counts: dict[str, int] = {}
+
+    @property
+    def enabled(self) -> bool:
+        """Return if the number of attributes is limited."""
+        return self._budget > 0
+
+    async def async_load(self, gateway: ElasticsearchGateway, index: str):
+        """Seed the destinations matching the index pattern with the attributes they have already mapped.
+
+        Args:
+            gateway (ElasticsearchGateway): The gateway of the cluster the destinations live in.
+            index (str): An alias, datastream or pattern of datastreams.
+
+        """
+        from elasticsearch7.exceptions import ElasticsearchException
+
+        if not self.enabled:
+            return
+
+        client = gateway.get_client()
+        try:
+            response = await client.indices.get_field_mapping(
+                fields=ATTRIBUTES_PATH + "*",
+                index=index,
+                allow_no_indices=True,
+                ignore_unavailable=True,
+                ignore=[404],
+            )
+        except ElasticsearchException as err:
+            LOGGER.warning(
+                "Unable to read the mapped attributes of [%s], the attribute field budget starts empty: %s",
+                index,
+                err,
+            )
+            return
+
+        for index_name, index_mapping in (response or {}).items():
+            # Backing indices belong to their datastream, and indices to the alias.
+            match = BACKING_INDEX_PATTERN.match(index_name)
+            destination = match.group(1) if match else index
+
+            fields = self._fields.setdefault(destination, set())
+            for field in index_mapping.get("mappings", {}):
+                if not field.startswith(ATTRIBUTES_PATH):
+                    continue
+                key = field[len(ATTRIBUTES_PATH) :].split(".")[0]
+                if key != ATTRIBUTE_OVERFLOW_KEY:
+                    fields.add(key)
+
+        LOGGER.debug(
+            "Loaded the mapped attributes of %i destinations matching [%s]",
+            len(response or {}),
+            index,
+        )
+
+    def apply(self, destination: str, attributes: dict):
+        """Move the attributes which exceed the budget of the destination out of the dictionary, in place."""
+        if not self.enabled or not attributes:
+            return
+
+        fields = self._fields.setdefault(destination, set())
+        overflow = {}
+        for key in list(attributes):
+            if key in fields:
+                continue
+            if key == ATTRIBUTE_OVERFLOW_KEY or len(fields) < self._capacity:
+                fields.add(key)
+                continue
+            overflow[key] = attributes.pop(key)
+
+        if not overflow:
+            return
+
+        serialize = self._strategy == ATTRIBUTE_OVERFLOW_STRATEGY_SERIALIZE
+        if destination not in self.overflow_counts:
+            LOGGER.warning(
+                "[%s] has reached its budget of %i attribute fields. New attributes are %s.",
+                destination,
+                self._budget,
+                f"serialized into [{ATTRIBUTE_OVERFLOW_KEY}]" if serialize else "dropped",
+            )
+        self.overflow_counts[destination] = self.overflow_counts.get(
+            destination, 0
+        ) + len(overflow)
+
+        if serialize:
+            attributes[ATTRIBUTE_OVERFLOW_KEY] = self._serializer.dumps(overflow)
@@ -0,0 +1,65 @@
+"""Adaptive sizing of bulk request chunks."""
+
+from .const import (
+    BULK_CHUNK_SIZE_DECREASE_FACTOR,
+    BULK_CHUNK_SIZE_INCREASE,
+    CONF_BULK_CHUNK_SIZE_MAX,
+    CONF_BULK_CHUNK_SIZE_MIN,
+    CONF_BULK_TARGET_LATENCY,
+    DEFAULT_BULK_CHUNK_SIZE,
+    DEFAULT_BULK_CHUNK_SIZE_MAX,
+    DEFAULT_BULK_CHUNK_SIZE_MIN,
+    DEFAULT_BULK_TARGET_LATENCY,
+)
+from .logger import LOGGER
+
+
+class AdaptiveChunkSizer:
+    """Adjust the number of documents per bulk request to what the cluster can handle.
+
+    Uses additive-increase / multiplicative-decrease: while bulk requests complete
+    within the target latency, the chunk size grows by a fixed number of documents.
+    When the cluster rejects requests (HTTP 429) or requests time out, the chunk
+    size is halved. Requests which are slower than the target hold the size steady.
+    """
+
+    def __init__(self, config: dict):
+        """Initialize the chunk sizer."""
+        self._min_size = max(
+            1, config.get(CONF_BULK_CHUNK_SIZE_MIN, DEFAULT_BULK_CHUNK_SIZE_MIN)
+        )
+        self._max_size = max(
+            self._min_size,
+            config.get(CONF_BULK_CHUNK_SIZE_MAX, DEFAULT_BULK_CHUNK_SIZE_MAX),
+        )
+        self._target_latency = config.get(
+            CONF_BULK_TARGET_LATENCY, DEFAULT_BULK_TARGET_LATENCY
+        )
+
+        self.chunk_size = self._clamp(DEFAULT_BULK_CHUNK_SIZE)
+
+    def record_success(self, latency: float, documents: int):
+        """Record a bulk request which the cluster accepted."""
+        # Small chunks say little about the capacity of the cluster.
+        if latency <= self._target_latency and documents >= self.chunk_size:
+            self._resize(self.chunk_size + BULK_CHUNK_SIZE_INCREASE, "latency below target")
+
+    def record_overload(self, reason: str):
+        """Record a bulk request which was rejected or timed out."""
+        self._resize(int(self.chunk_size * BULK_CHUNK_SIZE_DECREASE_FACTOR), reason)
+
+    def _resize(self, size: int, reason: str):
+        size = self._clamp(size)
+        if size == self.chunk_size:
+            return
+
+        LOGGER.debug(
+            "Changing bulk chunk size from %i to %i documents (%s)",
+            self.chunk_size,
+            size,
+            reason,
+        )
+        self.chunk_size = size
+
+    def _clamp(self, size: int) -> int:
+        return max(self._min_size, min(self._max_size, size))
@@ -0,0 +1,145 @@
+"""Circuit breaker around bulk publishing."""
+
+import time
+from collections import deque
+from collections.abc import Callable
+
+from .const import (
+    CIRCUIT_BREAKER_MIN_REQUESTS,
+    CIRCUIT_BREAKER_WINDOW,
+    CIRCUIT_STATE_CLOSED,
+    CIRCUIT_STATE_HALF_OPEN,
+    CIRCUIT_STATE_OPEN,
+    CONF_CIRCUIT_BREAKER_ERROR_RATE,
+    CONF_CIRCUIT_BREAKER_LATENCY,
+    CONF_CIRCUIT_BREAKER_OPEN_DURATION,
+    CONF_CIRCUIT_BREAKER_PROBE_SIZE,
+    DEFAULT_CIRCUIT_BREAKER_ERROR_RATE,
+    DEFAULT_CIRCUIT_BREAKER_LATENCY,
+    DEFAULT_CIRCUIT_BREAKER_OPEN_DURATION,
+    DEFAULT_CIRCUIT_BREAKER_PROBE_SIZE,
+)
+from .logger import LOGGER
+
+
+class CircuitBreaker:
+    """Stop sending bulk requests to a cluster which is failing or too slow to keep up.
+
+    While closed, the outcome of the most recent requests is tracked. A request which
+    takes longer than the latency threshold counts as a failure. Once the failure
+    rate exceeds the threshold, the breaker opens and no requests are sent. After the
+    open duration, the breaker is half-open: a single, small probe batch is sent. If
+    it succeeds the breaker closes, otherwise it opens again.
+    """
+
+    def __init__(
+        self,
+        config: dict,
+        on_state_change: Callable[[str, str, str], None] | None = None,
+        now: float | None = None,
+    ):
+        """Initialize a closed circuit breaker."""
+        self._error_rate = config.get(
+            CONF_CIRCUIT_BREAKER_ERROR_RATE, DEFAULT_CIRCUIT_BREAKER_ERROR_RATE
+        )
+        self._latency_threshold = config.get(
+            CONF_CIRCUIT_BREAKER_LATENCY, DEFAULT_CIRCUIT_BREAKER_LATENCY
+        )
+        self._open_duration = config.get(
+            CONF_CIRCUIT_BREAKER_OPEN_DURATION, DEFAULT_CIRCUIT_BREAKER_OPEN_DURATION
+        )
+        self._probe_size = config.get(
+            CONF_CIRCUIT_BREAKER_PROBE_SIZE, DEFAULT_CIRCUIT_BREAKER_PROBE_SIZE
+        )
+        self._on_state_change = on_state_change
+
+        # True for each failed request, False for each successful request.
+        self._outcomes: deque[bool] = deque(maxlen=CIRCUIT_BREAKER_WINDOW)
+        self._opened_at = 0.0
+
+        self.state = CIRCUIT_STATE_CLOSED
+        self.state_changed_at = time.monotonic() if now is None else now
+
+    @property
+    def max_batch_size(self) -> int | None:
+        """Return the maximum number of documents to send, or None if unbounded."""
+        if self.state == CIRCUIT_STATE_HALF_OPEN:
+            return self._probe_size
+        return None
+
+    def allow_request(self, now: float | None = None) -> bool:
+        """Determine if a bulk request may be sent right now."""
+        if self.state != CIRCUIT_STATE_OPEN:
+            return True
+
+        now = time.monotonic() if now is None else now
+        if now - self._opened_at < self._open_duration:
+            return False
+
+        self._set_state(CIRCUIT_STATE_HALF_OPEN, "open duration elapsed", now)
+        return True
+
+    def record_success(self, latency: float, now: float | None = None):
+        """Record the outcome of a request which the cluster completed."""
+        if latency > self._latency_threshold:
+            self._record(
+                True,
+                f"request took {latency:.1f}s (threshold: {self._latency_threshold}s)",
+                now,
+            )
+        else:
+            self._record(False, f"request took {latency:.1f}s", now)
+
+    def record_failure(self, now: float | None = None):
+        """Record the outcome of a request which failed."""
+        self._record(True, "request failed", now)
+
+    def _record(self, failed: bool, reason: str, now: float | None):
+        now = time.monotonic() if now is None else now
+
+        if self.state == CIRCUIT_STATE_HALF_OPEN:
+            if failed:
+                self._open(f"probe failed: {reason}", now)
+            else:
+                self._outcomes.clear()
+                self._set_state(CIRCUIT_STATE_CLOSED, f"probe succeeded: {reason}", now)
+            return
+
+        self._outcomes.append(failed)
+        if self.state == CIRCUIT_STATE_CLOSED and self._should_trip():
+            self._open(
+                f"{sum(self._outcomes)} of the last {len(self._outcomes)} requests failed or were too slow",
+                now,
+            )
+
+    def _should_trip(self) -> bool:
+        if len(self._outcomes) < CIRCUIT_BREAKER_MIN_REQUESTS:
+            return False
+        return sum(self._outcomes) / len(self._outcomes) >= self._error_rate
+
+    def _open(self, reason: str, now: float):
+        self._opened_at = now
+        self._outcomes.clear()
+        self._set_state(CIRCUIT_STATE_OPEN, reason, now)
+
+    def _set_state(self, state: str, reason: str, now: float):
+        previous = self.state
+        self.state = state
+        self.state_changed_at = now
+
+        if state == CIRCUIT_STATE_OPEN:
+            LOGGER.warning(
+                "Circuit breaker opened, publishing is paused for %s seconds: %s",
+                self._open_duration,
+                reason,
+            )
+        elif state == CIRCUIT_STATE_HALF_OPEN:
+            LOGGER.info(
+                "Circuit breaker half-open, sending a probe of up to %s documents",
+                self._probe_size,
+            )
+        else:
+            LOGGER.info("Circuit breaker closed, publishing resumes: %s", reason)
+
+        if self._on_state_change is not None:
+            self._on_state_change(previous, state, reason)
@@ -0,0 +1,104 @@
+"""Remember facts about Elasticsearch clusters across restarts."""
+
+import asyncio
+import hashlib
+import json
+import time
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .const import (
+    CLUSTER_FACTS_MAX_AGE,
+    CLUSTER_FACTS_STORAGE_KEY,
+    CLUSTER_FACTS_STORAGE_VERSION,
+    DOMAIN,
+)
+from .es_version import ElasticsearchVersion
+
+# Shared by every cluster and config entry, so that they do not overwrite each other's facts.
+DATA_CLUSTER_FACTS = f"{DOMAIN}_cluster_facts"
+
+
+def fingerprint(resource) -> str:
+    """Compute a stable fingerprint of a template or policy body."""
+    canonical = json.dumps(resource, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def get_cluster_facts(hass: HomeAssistant) -> "ClusterFacts":
+    """Return the cluster facts shared by all config entries."""
+    cluster_facts = hass.data.get(DATA_CLUSTER_FACTS)
+    if cluster_facts is None:
+        cluster_facts = hass.data[DATA_CLUSTER_FACTS] = ClusterFacts(hass)
+    return cluster_facts
+
+
+class ClusterFacts:
+    """Remember the version and flavor of each cluster, and the fingerprints of the resources installed on it.
+
+    Facts are keyed by cluster UUID. When the version or flavor of a cluster changes,
+    everything known about it is forgotten. Fingerprints are trusted for a limited
+    time only, after which the resource is verified against the cluster again.
+    """
+
+    def __init__(self, hass: HomeAssistant):
+        """Initialize the cluster facts."""
+        self._store = Store(hass, CLUSTER_FACTS_STORAGE_VERSION, CLUSTER_FACTS_STORAGE_KEY)
+        self._facts: dict | None = None
+        self._load_lock = asyncio.Lock()
+
+    async def async_is_current(
+        self, es_version: ElasticsearchVersion, resource: str, resource_fingerprint: str
+    ) -> bool:
+        """Determine if the resource was recently verified to match the fingerprint."""
+        cluster = await self._async_get_cluster(es_version)
+        if cluster is None:
+            return False
+
+        verified = cluster["resources"].get(resource)
+        return (
+            verified is not None
+            and verified["fingerprint"] == resource_fingerprint
+            and time.time() - verified["verified_at"] < CLUSTER_FACTS_MAX_AGE
+        )
+
+    async def async_record(
+        self, es_version: ElasticsearchVersion, resource: str, resource_fingerprint: str
+    ):
+        """Record that the resource on the cluster matches the fingerprint."""
+        if es_version.cluster_uuid is None:
+            return
+
+        facts = await self._async_load()
+        cluster = await self._async_get_cluster(es_version)
+        if cluster is None:
+            cluster = facts[es_version.cluster_uuid] = {
+                "version": es_version.to_string(),
+                "flavor": es_version.build_flavor,
+                "resources": {},
+            }
+
+        cluster["resources"][resource] = {
+            "fingerprint": resource_fingerprint,
+            "verified_at": time.time(),
+        }
+        await self._store.async_save(facts)
+
+    async def _async_get_cluster(self, es_version: ElasticsearchVersion) -> dict | None:
+        """Return the facts about the cluster, if its version and flavor are unchanged."""
+        facts = await self._async_load()
+        cluster = facts.get(es_version.cluster_uuid)
+        if (
+            cluster is None
+            or cluster["version"] != es_version.to_string()
+            or cluster["flavor"] != es_version.build_flavor
+        ):
+            return None
+        return cluster
+
+    async def _async_load(self) -> dict:
+        async with self._load_lock:
+            if self._facts is None:
+                self._facts = await self._store.async_load() or {}
+        return self._facts
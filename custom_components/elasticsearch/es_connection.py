@@ -0,0 +1,78 @@
+"""Gets the custom HTTP connection class."""
+
+
+def create_ssl_context(verify_certs: bool, ca_certs: str | None):
+    """Create the SSL context the connections verify the cluster's certificate with."""
+    import os
+    import ssl
+
+    from homeassistant.util.ssl import client_context, create_no_verify_ssl_context
+
+    if not verify_certs:
+        return create_no_verify_ssl_context()
+
+    if not ca_certs:
+        return client_context()
+
+    # The contexts of Home Assistant are shared, so custom certificates get their own.
+    if os.path.isdir(ca_certs):
+        return ssl.create_default_context(capath=ca_certs)
+    return ssl.create_default_context(cafile=ca_certs)
+
+
+def get_connection_class():
+    """Get the HTTP connection class used by the Elasticsearch client."""
+    import aiohttp
+    from elasticsearch7 import AIOHttpConnection
+    from elasticsearch7._async.compat import get_running_loop
+    from elasticsearch7._async.http_aiohttp import ESClientResponse
+
+    class KeepAliveConnection(AIOHttpConnection):
+        """AIOHttpConnection with a configurable keep-alive for idle pooled connections.
+
+        The pool size and SSL context are taken from the constructor arguments, so pass
+        an ssl_context rather than verify_certs and ca_certs.
+        """
+
+        def __init__(
+            self,
+            *args,
+            maxsize: int = 10,
+            ssl_context=None,
+            keepalive_timeout: float | None = None,
+            **kwargs,
+        ):
+            """Initialize the connection."""
+            super().__init__(*args, maxsize=maxsize, ssl_context=ssl_context, **kwargs)
+            self.maxsize = maxsize
+            self.ssl_context = ssl_context
+            self.keepalive_timeout = keepalive_timeout
+
+        async def _create_aiohttp_session(self):
+            """Create the aiohttp session, mirroring AIOHttpConnection apart from the connector."""
+            if self.loop is None:
+                self.loop = get_running_loop()
+
+            self.session = aiohttp.ClientSession(
+                headers=self.headers,
+                auto_decompress=True,
+                loop=self.loop,
+                cookie_jar=aiohttp.DummyCookieJar(),
+                response_class=ESClientResponse,
+                connector=self._create_connector(),
+            )
+
+        def _create_connector(self):
+            """Create the connector which pools the connections to the node."""
+            connector_kwargs = {}
+            if self.keepalive_timeout is not None:
+                connector_kwargs["keepalive_timeout"] = self.keepalive_timeout
+
+            return aiohttp.TCPConnector(
+                limit=self.maxsize,
+                use_dns_cache=True,
+                ssl=self.ssl_context,
+                **connector_kwargs,
+            )
+
+    return KeepAliveConnection
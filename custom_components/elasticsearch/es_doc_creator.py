@@ -2,10 +2,9 @@
 
 import re
 import unicodedata
-from datetime import datetime
+from datetime import datetime, timedelta
 from math import isinf
 
-from homeassistant.components.sun import STATE_ABOVE_HORIZON, STATE_BELOW_HORIZON
 from homeassistant.const import (
     STATE_CLOSED,
     STATE_HOME,
@@ -20,10 +19,19 @@ from homeassistant.const import (
 from homeassistant.core import HomeAssistant, State
 from homeassistant.helpers import state as state_helper
 from homeassistant.util import dt as dt_util
-from pytz import utc
 
-from custom_components.elasticsearch.const import CONF_TAGS
+from custom_components.elasticsearch.const import (
+    CONF_FLATTENED_ATTRIBUTES,
+    CONF_SERVER_SIDE_ENRICHMENT,
+    CONF_TAGS,
+    DEFAULT_FLATTENED_ATTRIBUTES,
+    DEFAULT_SERVER_SIDE_ENRICHMENT,
+    STATE_ABOVE_HORIZON,
+    STATE_BELOW_HORIZON,
+    STATE_CLASS_TOTAL_INCREASING,
+)
 from custom_components.elasticsearch.entity_details import EntityDetails
+from custom_components.elasticsearch.es_rollup import Rollup
 from custom_components.elasticsearch.es_serializer import get_serializer
 from custom_components.elasticsearch.logger import LOGGER
 from custom_components.elasticsearch.system_info import SystemInfo
@@ -43,10 +51,24 @@ class DocumentCreator:
         self._system_info: SystemInfo = SystemInfo(hass)
         self._hass = hass
         self._config = config
+        self._server_side_enrichment = False
+        self._flattened_attributes = False
 
     async def async_init(self) -> None:
         """Async initialization."""
 
+        if self._static_v2doc_properties is not None:
+            return
+
+        # Entity details and static properties are added by an ingest pipeline instead.
+        self._server_side_enrichment = self._config.get(
+            CONF_SERVER_SIDE_ENRICHMENT, DEFAULT_SERVER_SIDE_ENRICHMENT
+        )
+        # A flattened field accepts objects, so they do not have to be serialized.
+        self._flattened_attributes = self._config.get(
+            CONF_FLATTENED_ATTRIBUTES, DEFAULT_FLATTENED_ATTRIBUTES
+        )
+
         LOGGER.debug("async_init: initializing static doc properties")
 
         await self._populate_static_doc_properties()
@@ -91,11 +113,12 @@ class DocumentCreator:
             self._static_v2doc_properties["host.os.name"] = system_info.get("os_name")
             self._static_v2doc_properties["host.hostname"] = system_info.get("hostname")
 
-    def _state_to_attributes(self, state: State) -> dict:
+    def _state_to_attributes(self, state: State, serialize_objects: bool = True) -> dict:
         """Convert the attributes of a State object into a dictionary compatible with Elasticsearch mappings.
 
         Args:
             state (State): The State object containing the attributes.
+            serialize_objects (bool): Serialize objects and arrays of objects to strings, as dynamically mapped attributes cannot hold them.
 
         Returns:
             dict: A dictionary containing the converted attributes.
@@ -135,7 +158,9 @@ class DocumentCreator:
             # index the contents as an actual list. Otherwise, we need to serialize
             # the contents so that we can respect the index mapping
             # (Arrays of objects cannot be indexed as-is)
-            if value and isinstance(value, list | tuple):
+            if not serialize_objects:
+                should_serialize = False
+            elif value and isinstance(value, list | tuple):
                 should_serialize = isinstance(value[0], tuple | dict | set | list)
             else:
                 should_serialize = isinstance(value, dict)
@@ -153,6 +178,11 @@ class DocumentCreator:
 
         return attributes
 
+    @property
+    def static_doc_properties(self) -> dict | None:
+        """Return the properties which are the same for every modern document."""
+        return self._static_v2doc_properties
+
     def _state_to_entity_details(self, state: State) -> dict:
         """Gather entity details from the state object and return a mapped dictionary ready to be put in an elasticsearch document.
 
@@ -163,7 +193,19 @@ class DocumentCreator:
             dict: An Elasticsearch mapping-compatible entity details dictionary.
 
         """
-        entity_details = self._entity_details.async_get(state.entity_id)
+        return self.entity_details_to_document(state.entity_id)
+
+    def entity_details_to_document(self, entity_id: str) -> dict:
+        """Gather the device, area, platform and name of an entity from the registries.
+
+        Args:
+            entity_id (str): The ID of the entity.
+
+        Returns:
+            dict: An Elasticsearch mapping-compatible entity details dictionary.
+
+        """
+        entity_details = self._entity_details.async_get(entity_id)
 
         additions = {}
 
@@ -240,6 +282,8 @@ class DocumentCreator:
             and self.is_valid_number(state_helper.state_as_number(state))
         ):
             additions["valueas"]["float"] = state_helper.state_as_number(state)
+            if self.is_counter(state):
+                additions["valueas"]["counter"] = additions["valueas"]["float"]
 
         elif isinstance(_state, str) and self.try_state_as_datetime(state):
             _tempState = self.state_as_datetime(state)
@@ -291,7 +335,7 @@ class DocumentCreator:
                 "lat": entity["attributes"]["latitude"],
                 "lon": entity["attributes"]["longitude"],
             }
-        else:
+        elif not self._server_side_enrichment:
             additions["hass.entity"]["geo.location"] = {
                 "lat": self._hass.config.latitude,
                 "lon": self._hass.config.longitude,
@@ -299,15 +343,115 @@ class DocumentCreator:
 
         return additions
 
+    def state_as_metric(self, state: State) -> float | None:
+        """Return the numeric value of a state, or None if the state is not a number.
+
+        Args:
+            state (State): The state to convert.
+
+        Returns:
+            float | None: The numeric value, as it would be published in valueas.float.
+
+        """
+        _state = state.state
+
+        if (
+            not isinstance(_state, str)
+            or self.try_state_as_boolean(state)
+            or not self.try_state_as_number(state)
+        ):
+            return None
+
+        value = state_helper.state_as_number(state)
+        return value if self.is_valid_number(value) else None
+
+    def state_to_metric_document(
+        self, state: State, time: datetime, value: float
+    ) -> dict:
+        """Convert a numeric entity state to a lean metric document.
+
+        Metric documents only hold the value, the unit and the entity details, which are
+        all mapped as numbers or keywords.
+
+        Args:
+            state (State): The state to convert.
+            time (datetime): The time of the state.
+            value (float): The numeric value of the state, see state_as_metric.
+
+        Returns:
+            dict: The metric document.
+
+        """
+        # The value is stored where documents of other datastreams keep their numeric value.
+        entity = {
+            "id": state.entity_id,
+            "domain": state.domain,
+            "valueas": {"float": value},
+        }
+        if self.is_counter(state):
+            entity["valueas"]["counter"] = value
+
+        unit_of_measurement = state.attributes.get("unit_of_measurement")
+        if isinstance(unit_of_measurement, str):
+            entity["unit_of_measurement"] = unit_of_measurement
+
+        document_body = {
+            "@timestamp": self._to_utc(time),
+            "hass.object_id": state.object_id,
+            "hass.entity": entity,
+        }
+
+        # Otherwise added by the ingest pipeline
+        if not self._server_side_enrichment:
+            entity.update(self._state_to_entity_details(state))
+
+            tags = (self._static_v2doc_properties or {}).get("tags")
+            if tags:
+                document_body["tags"] = tags
+
+        return document_body
+
+    def rollup_to_document(self, rollup: Rollup, window: timedelta) -> dict:
+        """Convert a rollup of numeric entity states to a metric document.
+
+        The document is timestamped at the start of the window, and holds the last
+        value like a metric document does, along with the statistics of the window.
+
+        Args:
+            rollup (Rollup): The closed window of an entity.
+            window (timedelta): The length of the window.
+
+        Returns:
+            dict: The rollup document.
+
+        """
+        document_body = self.state_to_metric_document(
+            rollup.state, rollup.start, rollup.last
+        )
+        document_body["hass.rollup"] = {
+            "count": rollup.count,
+            "min": rollup.min,
+            "max": rollup.max,
+            "avg": rollup.avg,
+            "window": int(window.total_seconds()),
+        }
+        return document_body
+
+    @staticmethod
+    def _to_utc(time: datetime) -> datetime:
+        """Assume naive times are local, and convert them to UTC."""
+        if time.tzinfo is None:
+            return time.astimezone(dt_util.UTC)
+        return time
+
     def state_to_document(self, state: State, time: datetime, version: int = 2) -> dict:
         """Convert entity state to ES document."""
 
-        if time.tzinfo is None:
-            time_tz = time.astimezone(utc)
-        else:
-            time_tz = time
+        time_tz = self._to_utc(time)
 
-        attributes = self._state_to_attributes(state)
+        attributes = self._state_to_attributes(
+            state, serialize_objects=version == 1 or not self._flattened_attributes
+        )
 
         entity = {
             "id": state.entity_id,
@@ -317,7 +461,8 @@ class DocumentCreator:
         }
 
         # Add details from entity onto object
-        entity.update(self._state_to_entity_details(state))
+        if version == 1 or not self._server_side_enrichment:
+            entity.update(self._state_to_entity_details(state))
 
         """
         # log the python type of 'value' for debugging purposes
@@ -354,7 +499,10 @@ class DocumentCreator:
         if version == 2:
             document_body.update(self._state_to_document_v2(state, entity, time_tz))
 
-            if self._static_v2doc_properties is not None:
+            if (
+                self._static_v2doc_properties is not None
+                and not self._server_side_enrichment
+            ):
                 document_body.update(self._static_v2doc_properties)
 
         return document_body
@@ -375,6 +523,10 @@ class DocumentCreator:
 
         return replaced_string.lower()
 
+    def is_counter(self, state: State) -> bool:
+        """Determine if the state is a monotonically increasing total, which is also published as a counter metric."""
+        return state.attributes.get("state_class") == STATE_CLASS_TOTAL_INCREASING
+
     def is_valid_number(self, number) -> bool:
         """Determine if the passed number is valid for Elasticsearch."""
         is_infinity = isinf(number)
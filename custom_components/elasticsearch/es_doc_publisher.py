@@ -1,35 +1,75 @@
 """Publishes documents to Elasticsearch."""
 import asyncio
 import time
+import zlib
 from datetime import datetime
 from queue import Queue
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import EVENT_HOMEASSISTANT_CLOSE, EVENT_STATE_CHANGED
+from homeassistant.const import (
+    CONF_API_KEY,
+    CONF_PASSWORD,
+    CONF_URL,
+    CONF_USERNAME,
+    EVENT_HOMEASSISTANT_CLOSE,
+    EVENT_STATE_CHANGED,
+)
 from homeassistant.core import HomeAssistant, State, callback
 from homeassistant.helpers.typing import EventType
 
 from custom_components.elasticsearch.errors import ElasticException
+from custom_components.elasticsearch.es_attribute_guard import AttributeFieldGuard
 from custom_components.elasticsearch.es_doc_creator import DocumentCreator
+from custom_components.elasticsearch.es_enrichment import EntityEnrichment
 from custom_components.elasticsearch.es_gateway import ElasticsearchGateway
 from custom_components.elasticsearch.es_index_manager import IndexManager
+from custom_components.elasticsearch.es_privilege_check import ESPrivilegeCheck
+from custom_components.elasticsearch.es_publish_sink import PublishSink
+from custom_components.elasticsearch.es_rate_limiter import EntityRateLimiter
+from custom_components.elasticsearch.es_rollup import Rollup, RollupAggregator
+from custom_components.elasticsearch.utils import async_gather_all
 
 from .const import (
+    CONF_ADDITIONAL_CLUSTERS,
     CONF_EXCLUDED_DOMAINS,
     CONF_EXCLUDED_ENTITIES,
     CONF_INCLUDED_DOMAINS,
     CONF_INCLUDED_ENTITIES,
     CONF_INDEX_MODE,
+    CONF_NODE_URLS,
     CONF_PUBLISH_ENABLED,
     CONF_PUBLISH_FREQUENCY,
     CONF_PUBLISH_MODE,
+    CONF_SERVER_SIDE_ENRICHMENT,
+    CONF_SNAPSHOT_SHARDS,
+    CONF_SSL_CA_PATH,
     CONF_TAGS,
+    CONF_TRACE_ENTITIES,
+    CONF_TRACE_SAMPLE_RATE,
+    DATASTREAM_NUMERIC_DATASET_SUFFIX,
+    DATASTREAM_ROLLUP_DATASET_SUFFIX,
+    DEFAULT_SERVER_SIDE_ENRICHMENT,
+    DEFAULT_SNAPSHOT_SHARDS,
+    DEFAULT_TRACE_SAMPLE_RATE,
+    ENRICHMENT_PIPELINE_NAME,
     INDEX_MODE_DATASTREAM,
     INDEX_MODE_LEGACY,
     PUBLISH_MODE_ALL,
     PUBLISH_MODE_STATE_CHANGES,
 )
-from .logger import LOGGER
+from .logger import LOGGER, EventTracer
+
+# Settings which are specific to a cluster. Additional clusters share the rest of
+# the configuration with the primary cluster.
+CLUSTER_CONNECTION_KEYS = (
+    CONF_URL,
+    CONF_USERNAME,
+    CONF_PASSWORD,
+    CONF_API_KEY,
+    CONF_NODE_URLS,
+    CONF_SSL_CA_PATH,
+    CONF_ADDITIONAL_CLUSTERS,
+)
 
 
 class DocumentPublisher:
@@ -58,57 +98,73 @@ class DocumentPublisher:
         elif self._destination_type == INDEX_MODE_DATASTREAM:
             self.datastream_prefix: str = index_manager.datastream_type + "-" + index_manager.datastream_name_prefix
             self.datastream_suffix: str = index_manager.datastream_namespace
+            self._numeric_datastream: bool = index_manager.numeric_datastream
+            self._flattened_attributes: bool = index_manager.flattened_attributes
 
         self._publish_frequency = config.get(CONF_PUBLISH_FREQUENCY)
         self._publish_mode = config.get(CONF_PUBLISH_MODE)
         self._publish_timer_ref = None
         self._tags = config.get(CONF_TAGS)
 
-        self._excluded_domains = config.get(CONF_EXCLUDED_DOMAINS)
-        self._excluded_entities = config.get(CONF_EXCLUDED_ENTITIES)
-        self._included_domains = config.get(CONF_INCLUDED_DOMAINS)
-        self._included_entities = config.get(CONF_INCLUDED_ENTITIES)
-
-        if self._excluded_domains:
-            LOGGER.debug(
-                "Excluding the following domains: %s", str(self._excluded_domains)
-            )
-
-        if self._excluded_entities:
-            LOGGER.debug(
-                "Excluding the following entities: %s", str(self._excluded_entities)
-            )
-
-        if self._included_domains:
-            LOGGER.debug(
-                "Including the following domains: %s", str(self._included_domains)
-            )
+        self._tracer = EventTracer(
+            sample_rate=config.get(CONF_TRACE_SAMPLE_RATE, DEFAULT_TRACE_SAMPLE_RATE),
+            entities=config.get(CONF_TRACE_ENTITIES),
+        )
 
-        if self._included_entities:
-            LOGGER.debug(
-                "Including the following entities: %s", str(self._included_entities)
+        # When publishing all entities, the snapshot is split into shards which are
+        # published in their own slot, spread evenly across the publish interval.
+        self._snapshot_shards = 1
+        if self._publish_mode == PUBLISH_MODE_ALL:
+            self._snapshot_shards = max(
+                1,
+                min(
+                    config.get(CONF_SNAPSHOT_SHARDS, DEFAULT_SNAPSHOT_SHARDS),
+                    self._publish_frequency,
+                ),
             )
+        self._publish_interval = self._publish_frequency / self._snapshot_shards
+        self._next_snapshot_shard = 0
+
+        # Entity IDs which pass the configured filters (in state machine order),
+        # mapped to their snapshot shard.
+        # Only maintained when publishing all entities on every cycle.
+        self._eligible_entities: dict[str, int] = {}
+        self._snapshot_shard_members: list[dict[str, None]] = [
+            {} for _ in range(self._snapshot_shards)
+        ]
+        # Entities published because of a state change since their last snapshot slot.
+        self._published_since_snapshot: set[str] = set()
+        self.set_entity_filters(config)
 
         def elastic_event_listener(event: EventType):
             """Listen for new messages on the bus and queue them for send."""
             state: State = event.data.get("new_state")
             old_state: State = event.data.get("old_state")
+
+            if self._publish_mode == PUBLISH_MODE_ALL and (
+                state is None or old_state is None
+            ):
+                self._update_eligible_entity(event.data.get("entity_id"), state)
+
             if state is None:
                 return
 
+            trace = self._tracer.active and self._tracer.should_trace(state.entity_id)
+
             if (
                 old_state is not None
                 and self._publish_mode == PUBLISH_MODE_STATE_CHANGES
             ):
                 state_value_changed = old_state.state != state.state
                 if not state_value_changed:
-                    LOGGER.debug(
-                        "Excluding event state change for %s because the value did not change",
-                        state.entity_id,
-                    )
+                    if trace:
+                        LOGGER.debug(
+                            "Excluding event state change for %s because the value did not change",
+                            state.entity_id,
+                        )
                     return
 
-            self.enqueue_state(state, event)
+            self.enqueue_state(state, event, trace=trace)
 
         self.remove_state_change_listener = hass.bus.async_listen(
             EVENT_STATE_CHANGED, elastic_event_listener
@@ -124,17 +180,67 @@ class DocumentPublisher:
         )
 
         self._document_creator = DocumentCreator(hass, config)
+        self.rate_limiter = EntityRateLimiter(config)
+        self.attribute_guard = AttributeFieldGuard(config)
+        # Rollups are published to their own datastreams, which legacy indices lack.
+        self.rollups = RollupAggregator(
+            config if self._destination_type == INDEX_MODE_DATASTREAM else {}
+        )
+
+        self._enrichment: EntityEnrichment | None = None
+        if self._destination_type == INDEX_MODE_DATASTREAM and config.get(
+            CONF_SERVER_SIDE_ENRICHMENT, DEFAULT_SERVER_SIDE_ENRICHMENT
+        ):
+            self._enrichment = EntityEnrichment(
+                hass, self._document_creator, config_entry=config_entry
+            )
+
+        # Documents are built once, and sent to each cluster by its own sink.
+        self.primary_sink = PublishSink(
+            config.get(CONF_URL),
+            config,
+            gateway,
+            hass,
+            config_entry=config_entry,
+            index_manager=index_manager,
+        )
+        self._additional_sinks: list[PublishSink] = [
+            self._create_additional_sink(config, cluster)
+            for cluster in config.get(CONF_ADDITIONAL_CLUSTERS) or []
+        ]
 
         self.publish_queue = Queue[tuple[State, EventType]]()
         self._last_publish_time = None
 
+        # Publish right away once the connection has been reestablished.
+        self._publish_now = False
+        # The integration prepares the publisher while it connects, so that async_init does not have to.
+        self._prepared = False
+        self.remove_recovery_listener = gateway.add_recovery_listener(
+            self._on_connection_restored
+        )
+
+    async def async_prepare(self):
+        """Perform the initialization which does not require a connection to Elasticsearch."""
+        if not self.publish_enabled or self._prepared:
+            return
+
+        await self._document_creator.async_init()
+        self._prepared = True
+
     async def async_init(self):
         """Perform async initialization for the ES document publisher."""
         if not self.publish_enabled:
             LOGGER.debug("Aborting async_init: publish is not enabled")
             return
 
-        await self._document_creator.async_init()
+        await self.async_prepare()
+        await async_gather_all(
+            self._async_init_sink(self.primary_sink),
+            self._async_init_additional_sinks(),
+        )
+        if self._enrichment:
+            self._enrichment.start()
 
         LOGGER.debug("async_init: starting publish timer")
         self._start_publish_timer()
@@ -158,33 +264,293 @@ class DocumentPublisher:
         if self.remove_hass_close_listener:
             self.remove_hass_close_listener()
 
+        if self.remove_recovery_listener:
+            self.remove_recovery_listener()
+            self.remove_recovery_listener = None
+
+        if self._enrichment:
+            self._enrichment.stop()
+
         LOGGER.debug("Publisher stopped")
 
+    @property
+    def sinks(self) -> list[PublishSink]:
+        """Return the sinks documents are published to."""
+        return [self.primary_sink, *self._additional_sinks]
+
+    @property
+    def circuit_breaker(self):
+        """Return the circuit breaker of the primary cluster."""
+        return self.primary_sink.circuit_breaker
+
+    @property
+    def chunk_sizer(self):
+        """Return the chunk sizer of the primary cluster."""
+        return self.primary_sink.chunk_sizer
+
+    @property
+    def oversized_documents(self) -> int:
+        """Return the number of documents skipped for exceeding the primary cluster's bulk size limit."""
+        return self.primary_sink.oversized_documents
+
+    def _create_additional_sink(self, config: dict, cluster: dict) -> PublishSink:
+        """Create a sink for an additional cluster, which shares all but the connection settings."""
+        sink_config = {
+            key: value
+            for key, value in config.items()
+            if key not in CLUSTER_CONNECTION_KEYS
+        }
+        sink_config.update(cluster)
+
+        gateway = ElasticsearchGateway(
+            raw_config=sink_config, config_entry=self._config_entry, hass=self._hass
+        )
+        sink = PublishSink(
+            sink_config.get(CONF_URL),
+            sink_config,
+            gateway,
+            self._hass,
+            config_entry=self._config_entry,
+            index_manager=IndexManager(self._hass, sink_config, gateway),
+            privilege_check=ESPrivilegeCheck(gateway, config=sink_config),
+        )
+        gateway.add_recovery_listener(sink.schedule_flush)
+        return sink
+
+    async def _async_init_sink(self, sink: PublishSink):
+        """Prepare a cluster for publishing, once its index templates are in place."""
+        steps = [sink.async_init()]
+        if self._enrichment:
+            steps.append(self._enrichment.async_setup(sink.gateway))
+        if self._destination_type == INDEX_MODE_DATASTREAM:
+            steps.append(
+                sink.index_manager.async_create_datastreams(self._expected_datastreams())
+            )
+        # The guard tracks the mappings of the primary cluster.
+        if sink is self.primary_sink and self._guards_attributes():
+            steps.append(
+                self.attribute_guard.async_load(sink.gateway, self._guarded_index())
+            )
+        await async_gather_all(*steps)
+
+    def _guards_attributes(self) -> bool:
+        """Determine if the attributes of published documents are mapped as fields of their own."""
+        if not self.attribute_guard.enabled:
+            return False
+        return not (
+            self._destination_type == INDEX_MODE_DATASTREAM
+            and self._flattened_attributes
+        )
+
+    def _guarded_index(self) -> str:
+        """Return the alias or datastream pattern which receives documents with attributes."""
+        if self._destination_type == INDEX_MODE_LEGACY:
+            return self.legacy_index_name
+        return f"{self.datastream_prefix}.*-{self.datastream_suffix}"
+
+    def _expected_datastreams(self) -> set[str]:
+        """Derive the datastreams which will receive documents from the current states and filters."""
+        # (domain, numeric, rollup)
+        destinations = set()
+        for state in self._hass.states.async_all():
+            if not self._should_publish_entity_state(state.domain, state.entity_id):
+                continue
+
+            if (
+                self.rollups.enabled
+                and self.rollups.rolls_up(state)
+                and self._document_creator.state_as_metric(state) is not None
+            ):
+                destinations.add((state.domain, True, True))
+                if not self.rollups.passes_through(state):
+                    continue
+
+            destinations.add(
+                (state.domain, self._state_as_metric(state) is not None, False)
+            )
+
+        names = set()
+        for domain, numeric, rollup in destinations:
+            try:
+                names.add(self._datastream_name(domain, numeric=numeric, rollup=rollup))
+            except ElasticException as err:
+                LOGGER.debug("Not creating a datastream for %s: %s", domain, err)
+        return names
+
+    async def _async_init_additional_sinks(self):
+        """Connect to the additional clusters concurrently."""
+        await asyncio.gather(
+            *(
+                self._async_init_additional_sink(sink)
+                for sink in list(self._additional_sinks)
+            )
+        )
+
+    async def _async_init_additional_sink(self, sink: PublishSink):
+        """Connect to an additional cluster. A cluster which fails to initialize is not published to."""
+        try:
+            await sink.gateway.async_init()
+            await async_gather_all(
+                sink.privilege_check.enforce_privileges(),
+                sink.index_manager.async_setup(),
+            )
+            await self._async_init_sink(sink)
+        except Exception as err:
+            LOGGER.exception(
+                "Unable to initialize additional cluster [%s], it will not be published to: %s",
+                sink.name,
+                err,
+            )
+            self._additional_sinks.remove(sink)
+            if self._enrichment:
+                self._enrichment.remove_cluster(sink.gateway)
+            await sink.gateway.async_stop_gateway()
+
+    async def async_stop_sinks(self):
+        """Disconnect from the additional clusters."""
+        if not self.publish_enabled:
+            return
+
+        for sink in self._additional_sinks:
+            sink.stop()
+            await sink.gateway.async_stop_gateway()
+        self._additional_sinks = []
+
+    def _on_connection_restored(self):
+        """Flush the documents queued during the outage without waiting for the next interval."""
+        self._publish_now = True
+
+    def set_entity_filters(self, config: dict):
+        """Apply the include/exclude filters from the provided config."""
+        self._excluded_domains = config.get(CONF_EXCLUDED_DOMAINS)
+        self._excluded_entities = config.get(CONF_EXCLUDED_ENTITIES)
+        self._included_domains = config.get(CONF_INCLUDED_DOMAINS)
+        self._included_entities = config.get(CONF_INCLUDED_ENTITIES)
+
+        if self._excluded_domains:
+            LOGGER.debug(
+                "Excluding the following domains: %s", str(self._excluded_domains)
+            )
+
+        if self._excluded_entities:
+            LOGGER.debug(
+                "Excluding the following entities: %s", str(self._excluded_entities)
+            )
+
+        if self._included_domains:
+            LOGGER.debug(
+                "Including the following domains: %s", str(self._included_domains)
+            )
+
+        if self._included_entities:
+            LOGGER.debug(
+                "Including the following entities: %s", str(self._included_entities)
+            )
+
+        if self._publish_mode == PUBLISH_MODE_ALL:
+            self._rebuild_eligible_entities()
+
+    def _rebuild_eligible_entities(self):
+        """Rebuild the index of entities which are published on every cycle."""
+        self._eligible_entities = {}
+        self._snapshot_shard_members = [{} for _ in range(self._snapshot_shards)]
+        self._published_since_snapshot.clear()
+
+        for state in self._hass.states.async_all():
+            if self._should_publish_entity_state(state.domain, state.entity_id):
+                self._add_eligible_entity(state.entity_id)
+
+        LOGGER.debug(
+            "Tracking %i entities eligible for publishing, in %i snapshot shard(s)",
+            len(self._eligible_entities),
+            self._snapshot_shards,
+        )
+
+    def _update_eligible_entity(self, entity_id: str, state: State | None):
+        """Track an entity being added to, or removed from the state machine."""
+        if state is None:
+            shard = self._eligible_entities.pop(entity_id, None)
+            if shard is not None:
+                self._snapshot_shard_members[shard].pop(entity_id, None)
+            self._published_since_snapshot.discard(entity_id)
+        elif self._should_publish_entity_state(state.domain, entity_id):
+            self._add_eligible_entity(entity_id)
+
+    def _add_eligible_entity(self, entity_id: str):
+        shard = self._snapshot_shard_of(entity_id)
+        self._eligible_entities[entity_id] = shard
+        self._snapshot_shard_members[shard][entity_id] = None
+
+    def _snapshot_shard_of(self, entity_id: str) -> int:
+        """Return the snapshot shard of an entity, which is stable across restarts."""
+        if self._snapshot_shards == 1:
+            return 0
+        return zlib.crc32(entity_id.encode()) % self._snapshot_shards
+
     def queue_size(self):
         """Return the approximate queue size."""
         return self.publish_queue.qsize()
 
-    def enqueue_state(self, state: State, event: EventType):
+    def enqueue_state(self, state: State, event: EventType, trace: bool = False):
         """Queue up the provided state change."""
 
         domain = state.domain
         entity_id = state.entity_id
 
-        if self._should_publish_entity_state(domain, entity_id):
-            self.publish_queue.put((state, event))
+        if self._publish_mode == PUBLISH_MODE_ALL:
+            if entity_id not in self._eligible_entities:
+                if trace:
+                    LOGGER.debug("Skipping %s: this entity is not eligible for publishing", entity_id)
+                return
+        elif not self._should_publish_entity_state(domain, entity_id, trace=trace):
+            return
+
+        if self.rollups.enabled and self.rollups.rolls_up(state):
+            value = self._document_creator.state_as_metric(state)
+            if value is not None:
+                self.rollups.add(state, value, event.time_fired)
+                if not self.rollups.passes_through(state):
+                    if trace:
+                        LOGGER.debug("Rolling up %s: %s", entity_id, state.state)
+                    return
+
+        if self.rate_limiter.enabled and not self.rate_limiter.allow(state, event):
+            if trace:
+                LOGGER.debug("Rate limiting %s", entity_id)
+            return
+
+        if trace:
+            LOGGER.debug("Queueing state change for %s: %s", entity_id, state.state)
+
+        self.publish_queue.put((state, event))
 
     async def async_do_publish(self):
         """Publish all queued documents to the Elasticsearch cluster."""
-        from elasticsearch7.exceptions import ElasticsearchException
-
         publish_all_states = self._publish_mode == PUBLISH_MODE_ALL
 
-        if self.publish_queue.empty() and not publish_all_states:
+        # Pick up log level changes once per cycle, rather than on every event.
+        self._tracer.refresh()
+
+        for state, event in self.rate_limiter.release_pending():
+            self.publish_queue.put((state, event))
+
+        suppressed = self.rate_limiter.reset_publish_stats()
+        if suppressed:
+            LOGGER.info(
+                "Rate limiting suppressed %i state changes since the last publish (%i in total)",
+                suppressed,
+                self.rate_limiter.total_suppressed,
+            )
+
+        rollups = self.rollups.collect()
+
+        if self.publish_queue.empty() and not publish_all_states and not rollups:
             LOGGER.debug("Skipping publish because queue is empty")
+            await self._async_flush_sinks()
             return
 
         LOGGER.debug("Collecting queued documents for publish")
-        actions = []
+        actions = [self._rollup_to_bulk_action(rollup) for rollup in rollups]
         entity_counts = {}
         self._last_publish_time = datetime.now()
 
@@ -199,38 +565,66 @@ class DocumentPublisher:
             actions.append(self._state_to_bulk_action(state, event.time_fired))
 
         if publish_all_states:
-            all_states = self._hass.states.async_all()
-            for state in all_states:
-                if state.entity_id not in entity_counts and self._should_publish_entity_state(state.domain, state.entity_id):
-                    actions.append(
-                        self._state_to_bulk_action(state, self._last_publish_time)
+            self._published_since_snapshot.update(entity_counts)
+
+            shard = self._next_snapshot_shard
+            self._next_snapshot_shard = (shard + 1) % self._snapshot_shards
+
+            for entity_id in self._snapshot_shard_members[shard]:
+                # Entities which were published since their last slot already have
+                # a document for this interval.
+                if entity_id in self._published_since_snapshot:
+                    self._published_since_snapshot.discard(entity_id)
+                    continue
+
+                state = self._hass.states.get(entity_id)
+                if state is None:
+                    continue
+
+                # Rolled up entities are only published through their windows, so idle ones get an empty window.
+                if self._is_only_rolled_up(state):
+                    rollup = self.rollups.carry_forward(
+                        state, self._document_creator.state_as_metric(state)
                     )
+                    if rollup is not None:
+                        actions.append(self._rollup_to_bulk_action(rollup))
+                    continue
+
+                actions.append(
+                    self._state_to_bulk_action(state, self._last_publish_time)
+                )
 
         LOGGER.info("Publishing %i documents to Elasticsearch", len(actions))
 
+        for sink in self.sinks:
+            sink.enqueue(actions)
+        await self._async_flush_sinks()
+
+    async def _async_flush_sinks(self):
+        """Send the queued documents to each cluster.
+
+        The primary cluster is flushed inline, additional clusters are flushed in the
+        background so that a slow cluster does not hold back the others.
+        """
+        from elasticsearch7.exceptions import ElasticsearchException
+
+        for sink in self._additional_sinks:
+            sink.schedule_flush()
+
         try:
-            await self.async_bulk_sync_wrapper(actions)
+            await self.primary_sink.async_flush()
         except ElasticsearchException as err:
             LOGGER.exception("Error publishing documents to Elasticsearch: %s", err)
-        return
 
     async def async_bulk_sync_wrapper(self, actions):
         """Wrap event publishing.
 
         Workaround for elasticsearch_async not supporting bulk operations.
         """
+        self.primary_sink.enqueue(actions)
+        await self.primary_sink.async_flush()
 
-        from elasticsearch7.exceptions import ElasticsearchException
-        from elasticsearch7.helpers import async_bulk
-
-        try:
-            bulk_response = await async_bulk(self._gateway.get_client(), actions)
-            LOGGER.debug("Elasticsearch bulk response: %s", str(bulk_response))
-            LOGGER.info("Publish Succeeded")
-        except ElasticsearchException as err:
-            LOGGER.exception("Error publishing documents to Elasticsearch: %s", err)
-
-    def _should_publish_entity_state(self, domain: str, entity_id: str):
+    def _should_publish_entity_state(self, domain: str, entity_id: str, trace: bool = False):
         """Determine if a state change should be published."""
         if not self.publish_enabled:
             LOGGER.warning(
@@ -247,29 +641,33 @@ class DocumentPublisher:
         is_entity_excluded = self._excluded_entities and entity_id in self._excluded_entities
 
         if is_entity_excluded:
-            message_suffix = ''
-            if is_domain_included:
-                message_suffix += ', which supersedes the configured domain inclusion.'
+            if trace:
+                message_suffix = ''
+                if is_domain_included:
+                    message_suffix += ', which supersedes the configured domain inclusion.'
 
-            LOGGER.debug("Skipping %s: this entity is explicitly excluded%s", entity_id, message_suffix)
+                LOGGER.debug("Skipping %s: this entity is explicitly excluded%s", entity_id, message_suffix)
             return False
 
         if is_entity_included:
-            message_suffix = ''
-            if is_domain_excluded:
-                message_suffix += ', which supersedes the configured domain exclusion.'
+            if trace:
+                message_suffix = ''
+                if is_domain_excluded:
+                    message_suffix += ', which supersedes the configured domain exclusion.'
 
-            LOGGER.debug("Including %s: this entity is explicitly included%s", entity_id, message_suffix)
+                LOGGER.debug("Including %s: this entity is explicitly included%s", entity_id, message_suffix)
             return True
 
         if is_domain_included:
-            LOGGER.debug("Including %s: this entity belongs to an included domain (%s)", entity_id, domain)
+            if trace:
+                LOGGER.debug("Including %s: this entity belongs to an included domain (%s)", entity_id, domain)
             return True
 
         if is_domain_excluded:
-            LOGGER.debug(
-                "Skipping %s: it belongs to an excluded domain (%s)", entity_id, domain
-            )
+            if trace:
+                LOGGER.debug(
+                    "Skipping %s: it belongs to an excluded domain (%s)", entity_id, domain
+                )
             return False
 
         # At this point, neither the domain nor entity belong to an explicit include/exclude list.
@@ -280,26 +678,42 @@ class DocumentPublisher:
 
 
         if self._destination_type == INDEX_MODE_DATASTREAM:
-            document = self._document_creator.state_to_document(state, time, version=2)
+            metric = self._state_as_metric(state)
+            if metric is not None:
+                document = self._document_creator.state_to_metric_document(
+                    state, time, metric
+                )
+            else:
+                document = self._document_creator.state_to_document(
+                    state, time, version=2
+                )
             # <type>-<name>-<namespace>
             # <datastream_prefix>.<domain>-<suffix>
             # metrics-homeassistant.device_tracker-default
-            destination_data_stream = self._sanitize_datastream_name(
-                self.datastream_prefix
-                + "."
-                + state.domain
-                + "-"
-                + self.datastream_suffix
+            destination_data_stream = self._datastream_name(
+                state.domain, numeric=metric is not None
             )
+            # A flattened field does not grow the mapping, whatever the attributes.
+            if metric is None and not self._flattened_attributes:
+                self.attribute_guard.apply(
+                    destination_data_stream, document["hass.entity"]["attributes"]
+                )
 
-            return {
+            action = {
                 "_op_type": "create",
                 "_index": destination_data_stream,
                 "_source": document,
             }
+            if self._enrichment:
+                action["pipeline"] = ENRICHMENT_PIPELINE_NAME
+            return action
 
         if self._destination_type == INDEX_MODE_LEGACY:
             document = self._document_creator.state_to_document(state, time, version=1)
+            # Also guards hass.attributes, which is the same dictionary.
+            self.attribute_guard.apply(
+                self.legacy_index_name, document["hass.entity"]["attributes"]
+            )
 
             return {
                 "_op_type": "index",
@@ -312,6 +726,19 @@ class DocumentPublisher:
 
 
 
+    def _rollup_to_bulk_action(self, rollup: Rollup):
+        """Create a bulk action from a closed rollup window."""
+        action = {
+            "_op_type": "create",
+            "_index": self._datastream_name(rollup.state.domain, rollup=True),
+            "_source": self._document_creator.rollup_to_document(
+                rollup, self.rollups.window
+            ),
+        }
+        if self._enrichment:
+            action["pipeline"] = ENRICHMENT_PIPELINE_NAME
+        return action
+
     def _start_publish_timer(self):
         """Initialize the publish timer."""
         if self._config_entry:
@@ -321,14 +748,55 @@ class DocumentPublisher:
         self.publish_active = True
 
 
+    def _has_available_sink(self):
+        """Determine if any cluster is currently accepting documents."""
+        return any(sink.available for sink in self.sinks)
+
     def _has_entries_to_publish(self):
         """Determine if now is a good time to publish documents."""
-        if self.publish_queue.empty():
+        # Publishing all entities always produces a snapshot.
+        if self._publish_mode == PUBLISH_MODE_ALL:
+            return True
+
+        if (
+            self.publish_queue.empty()
+            and not self.rate_limiter.has_pending()
+            and not self.rollups.has_closed_windows()
+            and not any(sink.queue_size() for sink in self.sinks)
+        ):
             LOGGER.debug("Nothing to publish")
             return False
 
         return True
 
+    def _is_only_rolled_up(self, state: State) -> bool:
+        """Determine if the numeric state of a rolled up entity is not published individually."""
+        return (
+            self.rollups.enabled
+            and self.rollups.rolls_up(state)
+            and not self.rollups.passes_through(state)
+            and self._document_creator.state_as_metric(state) is not None
+        )
+
+    def _state_as_metric(self, state: State) -> float | None:
+        """Return the numeric value of a state which is published to a numeric datastream."""
+        if not self._numeric_datastream:
+            return None
+        return self._document_creator.state_as_metric(state)
+
+    def _datastream_name(
+        self, domain: str, numeric: bool = False, rollup: bool = False
+    ) -> str:
+        """Return the datastream which receives the (numeric or rollup) documents of a domain."""
+        dataset = self.datastream_prefix
+        if rollup:
+            dataset += DATASTREAM_ROLLUP_DATASET_SUFFIX
+        elif numeric:
+            dataset += DATASTREAM_NUMERIC_DATASET_SUFFIX
+        return self._sanitize_datastream_name(
+            dataset + "." + domain + "-" + self.datastream_suffix
+        )
+
     def _sanitize_datastream_name(self, name: str):
         """Sanitize a datastream name."""
 
@@ -399,25 +867,40 @@ class DocumentPublisher:
         """Publish queue timer."""
         from elasticsearch7 import TransportError
         LOGGER.debug(
-            "Starting publish timer: executes every %i seconds.",
-            self._publish_frequency,
+            "Starting publish timer: executes every %.1f seconds.",
+            self._publish_interval,
         )
-        next_publish = time.monotonic() + self._publish_frequency
+        # Slots are fixed relative to the start, so that each snapshot shard is published once per publish frequency.
+        next_publish = time.monotonic() + self._publish_interval
         while self.publish_active:
             try:
-                can_publish = next_publish <= time.monotonic()
-                if can_publish and not self._gateway.active_connection_error and self._has_entries_to_publish():
+                can_publish = self._publish_now or next_publish <= time.monotonic()
+                if can_publish and self._has_available_sink() and self._has_entries_to_publish():
+                    self._publish_now = False
                     try:
                         await self.async_do_publish()
                     finally:
-                        next_publish = time.monotonic() + self._publish_frequency
+                        next_publish = self._next_publish_slot(next_publish, time.monotonic())
             except TransportError as transport_error:
                 # Do not spam the logs with connection errors if we already know there is a problem.
                 if not self._gateway.active_connection_error:
                     LOGGER.exception("Connection error during publish queue handling. Publishing will be paused until connection is fixed. %s", transport_error)
-                    self._gateway.notify_of_connection_error()
+                    self._gateway.notify_of_connection_error(transport_error)
             except Exception as err:
                 LOGGER.exception("Error during publish queue handling %s", err)
             finally:
                 if self.publish_active:
-                    await asyncio.sleep(1)
+                    # Wake up for the next slot, or check again in a second while waiting for documents or a cluster.
+                    delay = next_publish - time.monotonic()
+                    await asyncio.sleep(delay if 0 < delay < 1 else 1)
+
+    def _next_publish_slot(self, scheduled: float, now: float) -> float:
+        """Return the first slot after the scheduled one which has not passed yet, skipping the slots which were missed."""
+        if scheduled > now:
+            # Published ahead of its slot, e.g. right after the connection was restored.
+            return scheduled
+
+        missed = int((now - scheduled) // self._publish_interval)
+        if missed:
+            LOGGER.debug("Publishing is behind schedule, skipping %i slots", missed)
+        return scheduled + (missed + 1) * self._publish_interval
@@ -0,0 +1,337 @@
+"""Server-side enrichment of documents with entity metadata."""
+
+import asyncio
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers import area_registry, device_registry, entity_registry
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.storage import Store
+
+from custom_components.elasticsearch.errors import convert_es_error
+from custom_components.elasticsearch.es_cluster_facts import fingerprint
+from custom_components.elasticsearch.es_doc_creator import DocumentCreator
+from custom_components.elasticsearch.es_gateway import ElasticsearchGateway
+
+from .const import (
+    ENRICHMENT_PIPELINE_NAME,
+    ENTITY_METADATA_ENRICH_POLICY_NAME,
+    ENTITY_METADATA_INDEX_NAME,
+    ENTITY_METADATA_STORAGE_KEY,
+    ENTITY_METADATA_STORAGE_VERSION,
+    ENTITY_METADATA_SYNC_DELAY,
+)
+from .logger import LOGGER
+
+ENTITY_METADATA_FIELDS = ["device", "area", "platform", "name"]
+
+_AREA_PROPERTIES = {"id": {"type": "keyword"}, "name": {"type": "keyword"}}
+
+ENTITY_METADATA_INDEX = {
+    "settings": {
+        "index.hidden": True,
+        "number_of_shards": 1,
+        "auto_expand_replicas": "0-1",
+    },
+    "mappings": {
+        "dynamic": False,
+        "properties": {
+            "id": {"type": "keyword"},
+            "name": {"type": "keyword"},
+            "platform": {"type": "keyword"},
+            "area": {"properties": _AREA_PROPERTIES},
+            "device": {
+                "properties": {
+                    "id": {"type": "keyword"},
+                    "name": {"type": "keyword"},
+                    "area": {"properties": _AREA_PROPERTIES},
+                }
+            },
+        },
+    },
+}
+
+ENTITY_METADATA_ENRICH_POLICY = {
+    "match": {
+        "indices": ENTITY_METADATA_INDEX_NAME,
+        "match_field": "id",
+        "enrich_fields": ENTITY_METADATA_FIELDS,
+    }
+}
+
+# Merges the entity metadata into the entity, and falls back to the location of
+# Home Assistant for entities without a location of their own.
+ENRICHMENT_SCRIPT = """
+Map entity = ctx.hass.entity;
+Map metadata = ctx.remove('_entity_metadata');
+if (metadata != null) {
+  metadata.remove('id');
+  entity.putAll(metadata);
+}
+if (!entity.containsKey('geo.location')) {
+  entity['geo.location'] = params.location;
+}
+"""
+
+
+class EntityEnrichment:
+    """Keep entity metadata in Elasticsearch, so that documents can be enriched by an ingest pipeline.
+
+    The device, area, platform and name of every entity are written to a small
+    metadata index, which backs an enrich policy. The ingest pipeline looks up the
+    metadata of each document's entity, and adds the static agent and host
+    properties. The metadata index is only written to when the registries change:
+    fingerprints of the written metadata are kept in Home Assistant storage, by
+    cluster UUID, so that a restart does not write the metadata again.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        document_creator: DocumentCreator,
+        config_entry: ConfigEntry | None = None,
+    ):
+        """Initialize the enrichment."""
+        self._hass = hass
+        self._document_creator = document_creator
+        self._config_entry = config_entry
+
+        # Fingerprints of the metadata last written to each cluster, by entity ID.
+        self._written_metadata: dict[ElasticsearchGateway, dict[str, str]] = {}
+        self._store = Store(
+            hass, ENTITY_METADATA_STORAGE_VERSION, ENTITY_METADATA_STORAGE_KEY
+        )
+        # Fingerprints of the metadata written to each cluster, by cluster UUID.
+        self._stored: dict | None = None
+        self._store_lock = asyncio.Lock()
+        self._remove_listeners: list[CALLBACK_TYPE] = []
+        self._cancel_scheduled_sync: CALLBACK_TYPE | None = None
+
+    async def async_setup(self, gateway: ElasticsearchGateway):
+        """Install the metadata index, enrich policy and ingest pipeline on a cluster."""
+        from elasticsearch7.exceptions import ElasticsearchException
+
+        client = gateway.get_client()
+
+        try:
+            created = await client.indices.create(
+                index=ENTITY_METADATA_INDEX_NAME,
+                body=ENTITY_METADATA_INDEX,
+                ignore=[400],
+            )
+            # A new (or recreated) index holds none of the metadata written before.
+            index_created = bool(created.get("acknowledged"))
+
+            # Enrich policies cannot be updated, only replaced while no pipeline uses them.
+            existing_policy = await client.enrich.get_policy(
+                name=ENTITY_METADATA_ENRICH_POLICY_NAME
+            )
+            policy_created = not existing_policy.get("policies")
+            if policy_created:
+                LOGGER.debug("Creating enrich policy for entity metadata")
+                await client.enrich.put_policy(
+                    name=ENTITY_METADATA_ENRICH_POLICY_NAME,
+                    body=ENTITY_METADATA_ENRICH_POLICY,
+                )
+
+            written = {} if index_created else await self._async_load_written(gateway)
+            self._written_metadata[gateway] = written
+
+            # The enrich index must exist before the pipeline can use it.
+            if not await self._async_write_metadata(
+                gateway, self._build_metadata()
+            ) and (index_created or policy_created or not written):
+                await client.enrich.execute_policy(
+                    name=ENTITY_METADATA_ENRICH_POLICY_NAME
+                )
+
+            await client.ingest.put_pipeline(
+                id=ENRICHMENT_PIPELINE_NAME, body=self._build_pipeline()
+            )
+        except ElasticsearchException as err:
+            raise convert_es_error(
+                "Failed to set up server-side enrichment", err
+            ) from err
+
+        LOGGER.debug("Server-side enrichment initialized")
+
+    def start(self):
+        """Update the entity metadata whenever the registries change."""
+        for event_type in (
+            entity_registry.EVENT_ENTITY_REGISTRY_UPDATED,
+            device_registry.EVENT_DEVICE_REGISTRY_UPDATED,
+            area_registry.EVENT_AREA_REGISTRY_UPDATED,
+        ):
+            self._remove_listeners.append(
+                self._hass.bus.async_listen(event_type, self._on_registry_updated)
+            )
+
+    def stop(self):
+        """Stop listening for registry changes."""
+        for remove_listener in self._remove_listeners:
+            remove_listener()
+        self._remove_listeners = []
+
+        if self._cancel_scheduled_sync is not None:
+            self._cancel_scheduled_sync()
+            self._cancel_scheduled_sync = None
+
+    def remove_cluster(self, gateway: ElasticsearchGateway):
+        """Stop writing entity metadata to a cluster."""
+        self._written_metadata.pop(gateway, None)
+
+    @callback
+    def _on_registry_updated(self, event):
+        """Update the entity metadata once the registries have settled."""
+        if self._cancel_scheduled_sync is not None:
+            self._cancel_scheduled_sync()
+
+        self._cancel_scheduled_sync = async_call_later(
+            self._hass, ENTITY_METADATA_SYNC_DELAY, self._schedule_sync
+        )
+
+    @callback
+    def _schedule_sync(self, _now):
+        self._cancel_scheduled_sync = None
+
+        if self._config_entry:
+            self._config_entry.async_create_background_task(
+                self._hass, self.async_sync(), "elasticsearch_entity_metadata_sync"
+            )
+        else:
+            self._hass.async_create_background_task(
+                self.async_sync(), "elasticsearch_entity_metadata_sync"
+            )
+
+    async def async_sync(self):
+        """Write changed entity metadata to every cluster."""
+        from elasticsearch7.exceptions import ElasticsearchException
+
+        metadata = self._build_metadata()
+        for gateway in list(self._written_metadata):
+            try:
+                await self._async_write_metadata(gateway, metadata)
+            except ElasticsearchException as err:
+                LOGGER.warning(
+                    "Unable to update entity metadata, documents may be enriched with outdated details: %s",
+                    err,
+                )
+
+    async def _async_write_metadata(
+        self, gateway: ElasticsearchGateway, metadata: dict[str, dict]
+    ) -> bool:
+        """Write the metadata which changed since it was last written, returning True if anything was written."""
+        from elasticsearch7.helpers import async_bulk
+
+        written = self._written_metadata.get(gateway, {})
+        fingerprints = {
+            entity_id: fingerprint(document) for entity_id, document in metadata.items()
+        }
+
+        actions = [
+            {
+                "_op_type": "index",
+                "_index": ENTITY_METADATA_INDEX_NAME,
+                "_id": entity_id,
+                "_source": document,
+            }
+            for entity_id, document in metadata.items()
+            if written.get(entity_id) != fingerprints[entity_id]
+        ]
+        actions.extend(
+            {
+                "_op_type": "delete",
+                "_index": ENTITY_METADATA_INDEX_NAME,
+                "_id": entity_id,
+            }
+            for entity_id in written
+            if entity_id not in metadata
+        )
+
+        if actions:
+            LOGGER.debug("Writing metadata of %i entities", len(actions))
+            client = gateway.get_client()
+            # The enrich policy only sees documents which have been refreshed.
+            await async_bulk(client, actions, refresh=True)
+            await client.enrich.execute_policy(name=ENTITY_METADATA_ENRICH_POLICY_NAME)
+
+        self._written_metadata[gateway] = fingerprints
+        if actions:
+            await self._async_save_written(gateway, fingerprints)
+        return bool(actions)
+
+    async def _async_load_written(self, gateway: ElasticsearchGateway) -> dict[str, str]:
+        """Return the fingerprints of the metadata which was written to the cluster before."""
+        cluster_uuid = gateway.es_version.cluster_uuid
+        if cluster_uuid is None:
+            return {}
+
+        stored = await self._async_load_stored()
+        return dict(stored.get(cluster_uuid, {}))
+
+    async def _async_save_written(
+        self, gateway: ElasticsearchGateway, fingerprints: dict[str, str]
+    ):
+        """Remember the fingerprints of the metadata written to the cluster."""
+        cluster_uuid = gateway.es_version.cluster_uuid
+        if cluster_uuid is None:
+            return
+
+        stored = await self._async_load_stored()
+        stored[cluster_uuid] = fingerprints
+        await self._store.async_save(stored)
+
+    async def _async_load_stored(self) -> dict:
+        async with self._store_lock:
+            if self._stored is None:
+                self._stored = await self._store.async_load() or {}
+        return self._stored
+
+    def _build_metadata(self) -> dict[str, dict]:
+        """Build the metadata document of every registered entity."""
+        return {
+            entity_id: {
+                "id": entity_id,
+                **self._document_creator.entity_details_to_document(entity_id),
+            }
+            for entity_id in entity_registry.async_get(self._hass).entities
+        }
+
+    def _build_pipeline(self) -> dict:
+        """Build the ingest pipeline, which adds the entity metadata and static properties to documents."""
+        processors = [
+            # Documents use dotted field names, which processors cannot address.
+            {"dot_expander": {"field": "hass.entity"}},
+            {
+                "enrich": {
+                    "policy_name": ENTITY_METADATA_ENRICH_POLICY_NAME,
+                    "field": "hass.entity.id",
+                    "target_field": "_entity_metadata",
+                    "ignore_missing": True,
+                }
+            },
+            {
+                "script": {
+                    "lang": "painless",
+                    "source": ENRICHMENT_SCRIPT,
+                    "params": {
+                        "location": {
+                            "lat": self._hass.config.latitude,
+                            "lon": self._hass.config.longitude,
+                        }
+                    },
+                }
+            },
+        ]
+
+        static_properties = self._document_creator.static_doc_properties or {}
+        processors.extend(
+            {"set": {"field": field, "value": value}}
+            for field, value in static_properties.items()
+            if value is not None
+        )
+
+        return {
+            "description": "Adds entity metadata and static properties to documents published by Home Assistant",
+            "processors": processors,
+        }
@@ -1,5 +1,6 @@
 """Encapsulates Elasticsearch operations."""
 import asyncio
+import random
 import time
 
 from homeassistant.config_entries import ConfigEntry
@@ -13,13 +14,29 @@ from homeassistant.const import (
 )
 from homeassistant.core import HomeAssistant
 
-from custom_components.elasticsearch.utils import get_merged_config
-
-from .const import CONF_SSL_CA_PATH
+from custom_components.elasticsearch.utils import get_merged_config, parse_byte_size
+
+from .const import (
+    CONF_CONNECTION_KEEPALIVE,
+    CONF_CONNECTION_POOL_SIZE,
+    CONF_NODE_URLS,
+    CONF_PREWARM_CONNECTIONS,
+    CONF_SNIFF_NODES,
+    CONF_SSL_CA_PATH,
+    DEFAULT_CONNECTION_KEEPALIVE,
+    DEFAULT_CONNECTION_POOL_SIZE,
+    DEFAULT_PREWARM_CONNECTIONS,
+    DEFAULT_SNIFF_NODES,
+    PROBE_BACKOFF_INITIAL,
+    PROBE_BACKOFF_MAX,
+    PROBE_INTERVAL,
+    SNIFFER_TIMEOUT,
+)
 from .errors import (
     UnsupportedVersion,
     convert_es_error,
 )
+from .es_connection import create_ssl_context, get_connection_class
 from .es_serializer import get_serializer
 from .es_version import ElasticsearchVersion
 from .logger import LOGGER
@@ -34,12 +51,27 @@ class ElasticsearchGateway:
         self._hass = hass
         self._config_entry = config_entry
         self._url = config.get(CONF_URL)
+        # The primary URL comes first, followed by any additional nodes of the cluster.
+        self._hosts = list(
+            dict.fromkeys([self._url] + list(config.get(CONF_NODE_URLS) or []))
+        )
+        self._sniff_nodes = config.get(CONF_SNIFF_NODES, DEFAULT_SNIFF_NODES)
         self._timeout = config.get(CONF_TIMEOUT)
         self._username = config.get(CONF_USERNAME)
         self._password = config.get(CONF_PASSWORD)
         self._api_key = config.get(CONF_API_KEY)
         self._verify_certs = config.get(CONF_VERIFY_SSL, True)
         self._ca_certs = config.get(CONF_SSL_CA_PATH)
+        self._pool_size = config.get(
+            CONF_CONNECTION_POOL_SIZE, DEFAULT_CONNECTION_POOL_SIZE
+        )
+        self._keepalive = config.get(
+            CONF_CONNECTION_KEEPALIVE, DEFAULT_CONNECTION_KEEPALIVE
+        )
+        self._prewarm_connections = min(
+            config.get(CONF_PREWARM_CONNECTIONS, DEFAULT_PREWARM_CONNECTIONS),
+            self._pool_size,
+        )
 
         self.client = None
         self.es_version = None
@@ -47,11 +79,17 @@ class ElasticsearchGateway:
         self._connection_monitor_ref = None
         self._active_connection_error = False
         self._connection_monitor_active = False
+        self._recovery_listeners = []
+        self._last_success = 0.0
+        self._last_probe = 0.0
+        self._failed_probes = 0
+        self._next_failure_probe = 0.0
+        self._last_healthy_nodes = len(self._hosts)
 
     async def async_init(self):
         """I/O bound init."""
 
-        LOGGER.debug("Creating Elasticsearch client for %s", self._url)
+        LOGGER.debug("Creating Elasticsearch client for %s", ", ".join(self._hosts))
         try:
             self.client = self._create_es_client()
 
@@ -67,6 +105,10 @@ class ElasticsearchGateway:
             )
             raise UnsupportedVersion()
 
+        await self._async_prewarm_connections()
+
+        self._last_probe = time.monotonic()
+
         if self._hass and self._config_entry:
             self._start_connection_monitor_task()
 
@@ -83,6 +125,13 @@ class ElasticsearchGateway:
             self._connection_monitor_ref = None
 
         if self.client:
+            # The client only closes live connections. Close connections to nodes
+            # which are currently marked as dead as well.
+            pool = self.client.transport.connection_pool
+            for connection in getattr(pool, "orig_connections", ()):
+                if connection not in pool.connections:
+                    await connection.close()
+
             await self.client.close()
             self.client = None
 
@@ -97,9 +146,114 @@ class ElasticsearchGateway:
         """Returns if there is a known connection error."""
         return self._active_connection_error
 
-    def notify_of_connection_error(self):
+    @property
+    def node_count(self) -> int:
+        """Return the number of known Elasticsearch nodes."""
+        if self.client is None:
+            return len(self._hosts)
+        pool = self.client.transport.connection_pool
+        return len(getattr(pool, "orig_connections", pool.connections))
+
+    @property
+    def healthy_node_count(self) -> int:
+        """Return the number of nodes which are not currently marked as dead."""
+        if self.client is None:
+            return 0
+        return len(self.client.transport.connection_pool.connections)
+
+    async def async_get_max_content_length(self) -> int | None:
+        """Return the smallest http.max_content_length of the cluster's nodes, in bytes.
+
+        Returns None if the limit could not be determined.
+        """
+        from elasticsearch7 import ElasticsearchException
+
+        limits = []
+        try:
+            # Only contains the setting for nodes which set it explicitly.
+            nodes = await self.client.nodes.info(
+                metric="settings",
+                filter_path="nodes.*.settings.http.max_content_length",
+            )
+            for node in nodes.get("nodes", {}).values():
+                limits.append(node["settings"]["http"]["max_content_length"])
+
+            if len(limits) < self.node_count:
+                defaults = await self.client.cluster.get_settings(
+                    include_defaults=True,
+                    flat_settings=True,
+                    filter_path="defaults.http.max_content_length",
+                )
+                default = defaults.get("defaults", {}).get("http.max_content_length")
+                if default is not None:
+                    limits.append(default)
+        except ElasticsearchException as err:
+            LOGGER.warning("Unable to determine http.max_content_length: %s", err)
+            return None
+
+        if not limits:
+            return None
+
+        return min(parse_byte_size(limit) for limit in limits)
+
+    def notify_of_connection_error(self, err=None):
         """Notify the gateway of a connection error."""
-        self._active_connection_error = True
+        if not self._active_connection_error:
+            self._record_connection_failure(err)
+
+    def notify_of_request_success(self):
+        """Notify the gateway of a successful request, which proves the connection is healthy."""
+        self._last_success = time.monotonic()
+
+        healthy_nodes = self.healthy_node_count
+        if healthy_nodes != self._last_healthy_nodes:
+            LOGGER.info(
+                "%s of %s Elasticsearch nodes are healthy",
+                healthy_nodes,
+                self.node_count,
+            )
+            self._last_healthy_nodes = healthy_nodes
+
+        if self._active_connection_error:
+            self._active_connection_error = False
+            LOGGER.info(
+                "Connection to [%s] has been reestablished. Operations will resume.",
+                ", ".join(self._hosts),
+            )
+            for listener in list(self._recovery_listeners):
+                listener()
+
+    def add_recovery_listener(self, listener):
+        """Register a callback which is invoked when the connection is reestablished.
+
+        Returns a function which removes the listener.
+        """
+        self._recovery_listeners.append(listener)
+        return lambda: self._recovery_listeners.remove(listener)
+
+    async def _async_prewarm_connections(self):
+        """Open pooled connections up front, so the first publish does not pay for the TLS handshakes."""
+        if self._prewarm_connections <= 0:
+            return
+
+        start = time.monotonic()
+        # Concurrent requests force the pool to open a connection for each of them.
+        results = await asyncio.gather(
+            *[self.client.info() for _ in range(self._prewarm_connections)],
+            return_exceptions=True,
+        )
+        warmed = sum(1 for result in results if not isinstance(result, Exception))
+
+        if warmed < self._prewarm_connections:
+            LOGGER.warning(
+                "Only pre-warmed %s of %s connections", warmed, self._prewarm_connections
+            )
+        else:
+            LOGGER.debug(
+                "Pre-warmed %s connections in %.3f seconds",
+                warmed,
+                time.monotonic() - start,
+            )
 
     def _start_connection_monitor_task(self):
         """Initialize connection monitor task."""
@@ -109,36 +263,66 @@ class ElasticsearchGateway:
         self._connection_monitor_active = True
 
     async def _connection_monitor_task(self):
-        from elasticsearch7 import TransportError
-        next_test = time.monotonic() + 30
         while self._connection_monitor_active:
             try:
-                can_test = next_test <= time.monotonic()
-                if can_test:
-                    LOGGER.debug("Starting connection test.")
-                    next_test = time.monotonic() + 30
-                    had_error = self._active_connection_error
-
-                    await self.client.info()
-
-                    self._active_connection_error = False
-                    LOGGER.debug("Finished connection test.")
-
-                    if had_error:
-                        LOGGER.info("Connection to [%s] has been reestablished. Operations will resume.")
-            except TransportError as transport_err:
-                LOGGER.debug("Finished connection test with TransportError")
-                ignorable_error = isinstance(transport_err.status_code, int) and transport_err.status_code <= 403
-                # Do not spam the logs with connection errors if we already know there is a problem.
-                if not ignorable_error and not self.active_connection_error:
-                    LOGGER.exception("Connection error. Operations will be paused until connection is reestablished. %s", transport_err)
-                    self._active_connection_error = True
+                if self._next_probe_time() <= time.monotonic():
+                    await self._async_probe_connection()
             except Exception as err:
                 LOGGER.exception("Error during connection monitoring task %s", err)
             finally:
                 if self._connection_monitor_active:
                     await asyncio.sleep(1)
 
+    def _next_probe_time(self) -> float:
+        """Return when the connection should be probed next.
+
+        While requests are succeeding there is no need to probe. Once idle, the
+        connection is probed every PROBE_INTERVAL seconds. While failing, the
+        probe is scheduled by the backoff.
+        """
+        if self._active_connection_error:
+            return self._next_failure_probe
+        return max(self._last_success, self._last_probe) + PROBE_INTERVAL
+
+    async def _async_probe_connection(self):
+        """Actively test the connection to the cluster."""
+        from elasticsearch7 import TransportError
+
+        LOGGER.debug("Starting connection test.")
+        self._last_probe = time.monotonic()
+        try:
+            await self.client.info()
+        except TransportError as transport_err:
+            LOGGER.debug("Finished connection test with TransportError")
+            ignorable_error = isinstance(transport_err.status_code, int) and transport_err.status_code <= 403
+            if not ignorable_error:
+                self._record_connection_failure(transport_err)
+            return
+
+        LOGGER.debug("Finished connection test.")
+        self.notify_of_request_success()
+
+    def _record_connection_failure(self, err=None):
+        """Pause operations, and schedule the next probe with exponential backoff and jitter."""
+        # Do not spam the logs with connection errors if we already know there is a problem.
+        if not self._active_connection_error:
+            LOGGER.error(
+                "Connection error. Operations will be paused until connection is reestablished. %s",
+                err,
+            )
+            self._active_connection_error = True
+            self._failed_probes = 0
+        else:
+            self._failed_probes += 1
+
+        backoff = min(
+            PROBE_BACKOFF_MAX, PROBE_BACKOFF_INITIAL * 2**self._failed_probes
+        )
+        self._next_failure_probe = time.monotonic() + random.uniform(
+            backoff / 2, backoff
+        )
+        LOGGER.debug("Next connection test in at most %s seconds", backoff)
+
     def _create_es_client(self):
         """Construct an instance of the Elasticsearch client."""
         from elasticsearch7._async.client import AsyncElasticsearch
@@ -146,36 +330,35 @@ class ElasticsearchGateway:
         use_basic_auth = self._username is not None and self._password is not None
         use_api_key = self._api_key is not None
 
-        serializer = get_serializer()
+        client_kwargs = {
+            "serializer": get_serializer(),
+            "connection_class": get_connection_class(),
+            "maxsize": self._pool_size,
+            "keepalive_timeout": self._keepalive,
+            "ssl_context": create_ssl_context(self._verify_certs, self._ca_certs),
+            "timeout": self._timeout,
+        }
+
+        if len(self._hosts) > 1:
+            # Requests which fail on one node are retried on the next healthy node.
+            # The failing node is marked as dead, and is only retried after a backoff.
+            client_kwargs["max_retries"] = len(self._hosts)
+            client_kwargs["retry_on_timeout"] = True
+
+        if self._sniff_nodes:
+            client_kwargs["sniff_on_start"] = True
+            client_kwargs["sniff_on_connection_fail"] = True
+            client_kwargs["sniffer_timeout"] = SNIFFER_TIMEOUT
 
         if use_basic_auth:
             auth = (self._username, self._password)
-            return AsyncElasticsearch(
-                [self._url],
-                http_auth=auth,
-                serializer=serializer,
-                verify_certs=self._verify_certs,
-                ssl_show_warn=self._verify_certs,
-                ca_certs=self._ca_certs,
-                timeout=self._timeout,
-            )
+            return AsyncElasticsearch(self._hosts, http_auth=auth, **client_kwargs)
 
         if use_api_key:
             return AsyncElasticsearch(
-                [self._url],
+                self._hosts,
                 headers={"Authorization": f"ApiKey {self._api_key}"},
-                serializer=serializer,
-                verify_certs=self._verify_certs,
-                ssl_show_warn=self._verify_certs,
-                ca_certs=self._ca_certs,
-                timeout=self._timeout,
+                **client_kwargs,
             )
 
-        return AsyncElasticsearch(
-            [self._url],
-            serializer=serializer,
-            verify_certs=self._verify_certs,
-            ssl_show_warn=self._verify_certs,
-            ca_certs=self._ca_certs,
-            timeout=self._timeout,
-        )
+        return AsyncElasticsearch(self._hosts, **client_kwargs)
@@ -1,32 +1,94 @@
 """Index management facilities."""
 
+import asyncio
+import copy
 import json
 import os
+from collections.abc import Iterable
 
-from elasticsearch7 import ElasticsearchException
 from homeassistant.const import CONF_ALIAS
 
 from custom_components.elasticsearch.errors import ElasticException, convert_es_error
+from custom_components.elasticsearch.es_cluster_facts import (
+    fingerprint,
+    get_cluster_facts,
+)
 from custom_components.elasticsearch.es_gateway import ElasticsearchGateway
+from custom_components.elasticsearch.es_storage_profile import STORAGE_PROFILES
 
 from .const import (
     CONF_DATASTREAM_NAME_PREFIX,
     CONF_DATASTREAM_NAMESPACE,
     CONF_DATASTREAM_TYPE,
+    CONF_DOWNSAMPLING,
+    CONF_FLATTENED_ATTRIBUTES,
     CONF_ILM_ENABLED,
     CONF_ILM_POLICY_NAME,
     CONF_INDEX_FORMAT,
     CONF_INDEX_MODE,
+    CONF_NUMERIC_DATASTREAM,
     CONF_PUBLISH_ENABLED,
+    CONF_ROLLUP_DOMAINS,
+    CONF_ROLLUP_ENTITIES,
+    CONF_STORAGE_PROFILE,
+    CONF_TSDS_DIMENSIONS,
+    DATASTREAM_CREATION_CONCURRENCY,
+    DATASTREAM_METRICS_DOWNSAMPLING_ILM_POLICY_NAME,
     DATASTREAM_METRICS_ILM_POLICY_NAME,
     DATASTREAM_METRICS_INDEX_TEMPLATE_NAME,
+    DATASTREAM_NUMERIC_DATASET_SUFFIX,
+    DATASTREAM_NUMERIC_INDEX_TEMPLATE_NAME,
+    DATASTREAM_ROLLUP_DATASET_SUFFIX,
+    DATASTREAM_ROLLUP_INDEX_TEMPLATE_NAME,
+    DEFAULT_DOWNSAMPLING,
+    DEFAULT_FLATTENED_ATTRIBUTES,
+    DEFAULT_NUMERIC_DATASTREAM,
+    DEFAULT_STORAGE_PROFILE,
+    DEFAULT_TSDS_DIMENSIONS,
+    DOWNSAMPLING_ROUNDS,
     INDEX_MODE_DATASTREAM,
     INDEX_MODE_LEGACY,
     LEGACY_TEMPLATE_NAME,
+    TSDS_DIMENSION_ENTITY_ID,
+    TSDS_DIMENSION_FIELDS,
+    TSDS_IDENTIFYING_DIMENSIONS,
     VERSION_SUFFIX,
 )
 from .logger import LOGGER
 
+# Parsed template assets by file name. The files ship with the integration and never
+# change, so they are read once; callers receive copies which they are free to modify.
+_TEMPLATE_ASSETS: dict[str, dict] = {}
+
+
+def _load_template_asset(file_name: str) -> dict:
+    """Read and parse a template asset from disk."""
+    with open(
+        os.path.join(os.path.dirname(__file__), file_name), encoding="utf-8"
+    ) as json_file:
+        return json.load(json_file)
+
+
+async def async_get_template_asset(hass, file_name: str) -> dict:
+    """Return a copy of a template asset, reading it in the executor the first time."""
+    asset = _TEMPLATE_ASSETS.get(file_name)
+    if asset is None:
+        asset = await hass.async_add_executor_job(_load_template_asset, file_name)
+        _TEMPLATE_ASSETS[file_name] = asset
+    return copy.deepcopy(asset)
+
+
+def _get_field_mapping(mappings: dict, field: str) -> dict:
+    """Return the mapping of a field, by its dotted path."""
+    mapping = mappings
+    for name in field.split("."):
+        mapping = mapping["properties"][name]
+    return mapping
+
+
+# Key in the _meta of the index template holding the fingerprint of the rendered template.
+TEMPLATE_FINGERPRINT_META_KEY = "homeassistant_fingerprint"
+
 
 class IndexManager:
     """Index management facilities."""
@@ -40,9 +102,15 @@ class IndexManager:
             return
 
         self._hass = hass
+        self._cluster_facts = get_cluster_facts(hass)
 
         self._gateway: ElasticsearchGateway = gateway
 
+        storage_profile = config.get(CONF_STORAGE_PROFILE, DEFAULT_STORAGE_PROFILE)
+        if storage_profile not in STORAGE_PROFILES:
+            raise ElasticException("Unexpected storage_profile: %s", storage_profile)
+        self._storage_profile = STORAGE_PROFILES[storage_profile]
+
         # Differentiate between index and datastream
 
         self.index_mode = config.get(CONF_INDEX_MODE)
@@ -56,6 +124,35 @@ class IndexManager:
             self.datastream_type = config.get(CONF_DATASTREAM_TYPE)
             self.datastream_name_prefix = config.get(CONF_DATASTREAM_NAME_PREFIX)
             self.datastream_namespace = config.get(CONF_DATASTREAM_NAMESPACE)
+            self._tsds_dimensions = [
+                dimension
+                for dimension in config.get(CONF_TSDS_DIMENSIONS)
+                or DEFAULT_TSDS_DIMENSIONS
+                if dimension in TSDS_DIMENSION_FIELDS
+            ]
+            if not any(
+                dimension in TSDS_IDENTIFYING_DIMENSIONS
+                for dimension in self._tsds_dimensions
+            ):
+                # Without one, documents of different entities are rejected as duplicates, or cannot be routed.
+                LOGGER.warning(
+                    "Time series dimensions %s do not identify the entity, adding [%s]",
+                    self._tsds_dimensions,
+                    TSDS_DIMENSION_ENTITY_ID,
+                )
+                self._tsds_dimensions.insert(0, TSDS_DIMENSION_ENTITY_ID)
+            self.numeric_datastream = config.get(
+                CONF_NUMERIC_DATASTREAM, DEFAULT_NUMERIC_DATASTREAM
+            )
+            self.flattened_attributes = config.get(
+                CONF_FLATTENED_ATTRIBUTES, DEFAULT_FLATTENED_ATTRIBUTES
+            )
+            self.downsampling = config.get(CONF_DOWNSAMPLING, DEFAULT_DOWNSAMPLING)
+            self.rollup_datastream = bool(
+                config.get(CONF_ROLLUP_DOMAINS) or config.get(CONF_ROLLUP_ENTITIES)
+            )
+            # Datastreams which are known to exist on the cluster.
+            self.existing_datastreams: set[str] = set()
         else:
             raise ElasticException("Unexpected index_mode: %s", self.index_mode)
 
@@ -70,83 +167,252 @@ class IndexManager:
             await self._create_legacy_template()
 
         else:
-            await self._create_index_template()
+            await self._create_index_template(
+                DATASTREAM_METRICS_INDEX_TEMPLATE_NAME,
+                os.path.join("datastreams", "index_template.json"),
+                metric_fields={
+                    "hass.entity.valueas.float": "gauge",
+                    "hass.entity.valueas.counter": "counter",
+                },
+                flattened_fields=["hass.entity.attributes"]
+                if self.flattened_attributes
+                else None,
+            )
+
+            if self.numeric_datastream:
+                await self._create_index_template(
+                    DATASTREAM_NUMERIC_INDEX_TEMPLATE_NAME,
+                    os.path.join("datastreams", "numeric_index_template.json"),
+                    metric_fields={
+                        "hass.entity.valueas.float": "gauge",
+                        "hass.entity.valueas.counter": "counter",
+                    },
+                )
+
+            if self.rollup_datastream:
+                await self._create_index_template(
+                    DATASTREAM_ROLLUP_INDEX_TEMPLATE_NAME,
+                    os.path.join("datastreams", "rollup_index_template.json"),
+                    metric_fields={
+                        "hass.entity.valueas.float": "gauge",
+                        "hass.entity.valueas.counter": "counter",
+                        "hass.rollup.count": "gauge",
+                        "hass.rollup.min": "gauge",
+                        "hass.rollup.max": "gauge",
+                        "hass.rollup.avg": "gauge",
+                    },
+                )
 
         LOGGER.debug("Index Manager initialized")
 
-    async def _create_index_template(self):
-        """Initialize the Elasticsearch cluster with an index template, initial index, and alias."""
-        LOGGER.debug("Initializing modern index templates")
+    async def async_create_datastreams(self, names: Iterable[str]):
+        """Create the datastreams which do not exist yet, so that the first documents do not have to."""
+        from elasticsearch7.exceptions import ElasticsearchException
+
+        missing = set(names) - self.existing_datastreams
+        if not missing:
+            return
 
         client = self._gateway.get_client()
 
-        # Open datastreams/index_template.json and load the ES modern index template
-        with open(
-            os.path.join(
-                os.path.dirname(__file__), "datastreams", "index_template.json"
-            ),
-            encoding="utf-8",
-        ) as json_file:
-            index_template = json.load(json_file)
+        datasets = [self.datastream_name_prefix]
+        if self.numeric_datastream:
+            datasets.append(self.datastream_name_prefix + DATASTREAM_NUMERIC_DATASET_SUFFIX)
+        if self.rollup_datastream:
+            datasets.append(self.datastream_name_prefix + DATASTREAM_ROLLUP_DATASET_SUFFIX)
 
-        # Check if the index template already exists
-        matching_templates = await client.indices.get_index_template(
-            name=DATASTREAM_METRICS_INDEX_TEMPLATE_NAME, ignore=[404]
+        try:
+            response = await client.indices.get_data_stream(
+                name=",".join(
+                    f"{self.datastream_type}-{dataset}.*-{self.datastream_namespace}"
+                    for dataset in datasets
+                ),
+                ignore=[404],
+                filter_path="data_streams.name",
+            )
+        except ElasticsearchException as err:
+            LOGGER.warning(
+                "Unable to list datastreams, they will be created by the first documents: %s",
+                err,
+            )
+            return
+
+        self.existing_datastreams.update(
+            datastream["name"] for datastream in (response or {}).get("data_streams", [])
         )
-        matching_templates_count = len(matching_templates.get("index_templates", []))
+        missing -= self.existing_datastreams
+        if not missing:
+            return
 
-        template_exists = matching_templates and matching_templates_count > 0
+        LOGGER.debug("Creating %i datastreams", len(missing))
+        semaphore = asyncio.Semaphore(DATASTREAM_CREATION_CONCURRENCY)
 
-        LOGGER.debug("got template response: " + str(template_exists))
+        async def create_datastream(name: str):
+            async with semaphore:
+                await self._create_datastream(name)
 
-        if template_exists:
-            LOGGER.debug("Updating index template")
-        else:
-            LOGGER.debug("Creating index template")
+        await asyncio.gather(*(create_datastream(name) for name in sorted(missing)))
+
+    async def _create_datastream(self, name: str):
+        """Create a single datastream, leaving it to the first document if that fails."""
+        from elasticsearch7.exceptions import ElasticsearchException, TransportError
+
+        client = self._gateway.get_client()
 
-        if self._gateway.es_version.supports_timeseries_datastream():
+        try:
+            await client.indices.create_data_stream(name=name)
+        except TransportError as err:
+            if err.error != "resource_already_exists_exception":
+                LOGGER.warning("Unable to create datastream [%s]: %s", name, err)
+                return
+        except ElasticsearchException as err:
+            LOGGER.warning("Unable to create datastream [%s]: %s", name, err)
+            return
+
+        self.existing_datastreams.add(name)
+
+    async def _create_index_template(
+        self,
+        name: str,
+        asset: str,
+        metric_fields: dict[str, str] | None = None,
+        flattened_fields: list[str] | None = None,
+    ):
+        """Initialize the Elasticsearch cluster with an index template for datastreams.
+
+        Args:
+            name (str): The name of the index template.
+            asset (str): The file, relative to the integration, the index template is loaded from.
+            metric_fields (dict): The time_series_metric type of fields, when the cluster supports time series datastreams.
+            flattened_fields (list): Object fields which are mapped as a single flattened field, rather than dynamically.
+
+        """
+        from elasticsearch7.exceptions import ElasticsearchException
+
+        LOGGER.debug("Initializing modern index template %s", name)
+
+        client = self._gateway.get_client()
+
+        index_template = await async_get_template_asset(self._hass, asset)
+
+        mappings = index_template["template"]["mappings"]
+        for field in flattened_fields or []:
+            mapping = _get_field_mapping(mappings, field)
+            mapping.clear()
+            mapping.update({"type": "flattened", "ignore_above": 1024})
+
+            # The object no longer has dynamically mapped sub-fields.
+            mappings["dynamic_templates"] = [
+                dynamic_template
+                for dynamic_template in mappings.get("dynamic_templates", [])
+                if not any(
+                    rule.get("path_match", "").startswith(field + ".")
+                    for rule in dynamic_template.values()
+                )
+            ]
+
+        time_series = self._gateway.es_version.supports_timeseries_datastream()
+        if time_series:
             LOGGER.debug(
                 "Elasticsearch supports timeseries datastreams, including in template."
             )
 
             index_template["template"]["settings"]["index.mode"] = "time_series"
 
-            mappings = index_template["template"]["mappings"]
-            object_id = mappings["properties"]["hass"]["properties"]["object_id"]
+            # Documents are routed by the same fields which identify their time series.
+            dimension_fields = [
+                TSDS_DIMENSION_FIELDS[dimension] for dimension in self._tsds_dimensions
+            ]
+            for field in dimension_fields:
+                _get_field_mapping(mappings, field)["time_series_dimension"] = True
+
+            index_template["template"]["settings"]["index.routing_path"] = (
+                dimension_fields
+            )
 
-            object_id["time_series_dimension"] = True
+            for field, metric_type in (metric_fields or {}).items():
+                _get_field_mapping(mappings, field)["time_series_metric"] = metric_type
+
+        self._storage_profile.render(
+            index_template["template"]["settings"],
+            mappings,
+            self._gateway.es_version,
+            time_series=time_series,
+        )
 
         if self._gateway.es_version.supports_ignore_missing_component_templates():
             LOGGER.debug(
                 "Elasticsearch supports ignore_missing_component_templates, including in template."
             )
 
-            index_template["composed_of"] = ["metrics-homeassistant@custom"]
-            index_template["ignore_missing_component_templates"] = [
-                "metrics-homeassistant@custom"
-            ]
+            index_template["composed_of"] = [f"{name}@custom"]
+            index_template["ignore_missing_component_templates"] = [f"{name}@custom"]
 
+        # Only time series datastreams can be downsampled.
+        downsampling = self.downsampling and time_series
+
+        ilm_policy = None
+        ilm_policy_name = (
+            DATASTREAM_METRICS_DOWNSAMPLING_ILM_POLICY_NAME
+            if downsampling
+            else DATASTREAM_METRICS_ILM_POLICY_NAME
+        )
         if self._gateway.es_version.supports_datastream_lifecycle_management():
             LOGGER.debug(
                 "Elasticsearch supports Datastream Lifecycle Management, including in template."
             )
             index_template["template"]["lifecycle"] = {"data_retention": "365d"}
+            if downsampling:
+                index_template["template"]["lifecycle"]["downsampling"] = [
+                    {"after": after, "fixed_interval": fixed_interval}
+                    for after, fixed_interval in DOWNSAMPLING_ROUNDS
+                ]
         else:
             LOGGER.debug(
                 "Elasticsearch does not support Datastream Lifecycle Management, falling back to Index Lifecycle Management."
             )
-            await self._create_basic_ilm_policy(
-                ilm_policy_name=DATASTREAM_METRICS_ILM_POLICY_NAME
-            )
+            ilm_policy = self._build_basic_ilm_policy(downsampling=downsampling)
 
             index_template["template"]["settings"]["index.lifecycle.name"] = (
-                DATASTREAM_METRICS_ILM_POLICY_NAME
+                ilm_policy_name
+            )
+
+        # The policy is verified on its own, so that a deleted policy is restored even when the template is up to date.
+        if ilm_policy is not None:
+            await self._create_basic_ilm_policy(
+                ilm_policy_name=ilm_policy_name, policy=ilm_policy
             )
 
+        template_fingerprint = fingerprint(index_template)
+        index_template.setdefault("_meta", {})[TEMPLATE_FINGERPRINT_META_KEY] = (
+            template_fingerprint
+        )
+
+        resource = f"index_template/{name}"
+        es_version = self._gateway.es_version
         try:
-            await client.indices.put_index_template(
-                name=DATASTREAM_METRICS_INDEX_TEMPLATE_NAME, body=index_template
+            installed_fingerprint = await self._get_index_template_fingerprint(name)
+        except ElasticsearchException as err:
+            if await self._was_recently_verified(resource, template_fingerprint, err):
+                return
+            raise
+
+        template_exists = installed_fingerprint is not None
+
+        if installed_fingerprint == template_fingerprint:
+            LOGGER.debug("Index template is up to date")
+            await self._cluster_facts.async_record(
+                es_version, resource, template_fingerprint
             )
+            return
+
+        if template_exists:
+            LOGGER.debug("Updating index template")
+        else:
+            LOGGER.debug("Creating index template")
+
+        try:
+            await client.indices.put_index_template(name=name, body=index_template)
 
         except ElasticsearchException as err:
             LOGGER.exception("Error creating/updating index template: %s", err)
@@ -154,9 +420,51 @@ class IndexManager:
             # will result in the user having to clean-up indices with improper mappings.
             if not template_exists:
                 raise err
+            return
+
+        await self._cluster_facts.async_record(
+            es_version, resource, template_fingerprint
+        )
+
+    async def _get_index_template_fingerprint(self, name: str) -> str | None:
+        """Return the fingerprint of the installed index template, an empty string if it has none, or None if it does not exist."""
+        client = self._gateway.get_client()
+
+        # Only the name and _meta are needed, rather than the whole template.
+        matching_templates = await client.indices.get_index_template(
+            name=name,
+            ignore=[404],
+            filter_path="index_templates.name,index_templates.index_template._meta",
+        )
+        templates = (matching_templates or {}).get("index_templates", [])
+
+        LOGGER.debug("got template response: " + str(bool(templates)))
+
+        if not templates:
+            return None
+
+        meta = templates[0].get("index_template", {}).get("_meta") or {}
+        return meta.get(TEMPLATE_FINGERPRINT_META_KEY, "")
+
+    async def _was_recently_verified(
+        self, resource: str, resource_fingerprint: str, err: Exception
+    ) -> bool:
+        """Determine if a resource which could not be verified is known to be installed from the cached cluster facts."""
+        if not await self._cluster_facts.async_is_current(
+            self._gateway.es_version, resource, resource_fingerprint
+        ):
+            return False
+
+        LOGGER.warning(
+            "Unable to verify [%s], relying on it being installed when last verified: %s",
+            resource,
+            err,
+        )
+        return True
 
     async def _create_legacy_template(self):
         """Initialize the Elasticsearch cluster with an index template, initial index, and alias."""
+        from elasticsearch7.exceptions import ElasticsearchException
 
         LOGGER.debug("Initializing legacy index templates")
 
@@ -168,13 +476,12 @@ class IndexManager:
         client = self._gateway.get_client()
 
         # For Legacy mode we offer flexible configuration of the ILM policy
-        await self._create_basic_ilm_policy(ilm_policy_name=self._ilm_policy_name)
+        await self._create_basic_ilm_policy(
+            ilm_policy_name=self._ilm_policy_name,
+            policy=self._build_basic_ilm_policy(),
+        )
 
-        with open(
-            os.path.join(os.path.dirname(__file__), "index_mapping.json"),
-            encoding="utf-8",
-        ) as json_file:
-            mapping = json.load(json_file)
+        mapping = await async_get_template_asset(self._hass, "index_mapping.json")
 
         LOGGER.debug("checking if template exists")
 
@@ -198,6 +505,9 @@ class IndexManager:
                 "mappings": mapping,
                 "aliases": {"all-hass-events": {}},
             }
+            self._storage_profile.render(
+                index_template["settings"], mapping, self._gateway.es_version
+            )
             if self._using_ilm:
                 index_template["settings"]["index.lifecycle.name"] = (
                     self._ilm_policy_name
@@ -228,30 +538,52 @@ class IndexManager:
             except ElasticsearchException as err:
                 LOGGER.exception("Error creating initial index/alias: %s", err)
 
-    async def _create_basic_ilm_policy(self, ilm_policy_name):
-        """Create the index lifecycle management policy."""
-        from elasticsearch7.exceptions import TransportError
+    async def _create_basic_ilm_policy(self, ilm_policy_name, policy):
+        """Create the index lifecycle management policy, unless it already exists."""
+        from elasticsearch7.exceptions import ElasticsearchException, TransportError
 
         client = self._gateway.get_client()
+        resource = f"ilm_policy/{ilm_policy_name}"
+        policy_fingerprint = fingerprint(policy)
 
         try:
             existing_policy = await client.ilm.get_lifecycle(ilm_policy_name)
         except TransportError as err:
             if err.status_code == 404:
                 existing_policy = None
+            elif await self._was_recently_verified(resource, policy_fingerprint, err):
+                return
             else:
                 raise convert_es_error(
                     "Unexpected return code when checking for existing ILM policy", err
                 ) from err
         except ElasticsearchException as err:
+            if await self._was_recently_verified(resource, policy_fingerprint, err):
+                return
             raise convert_es_error(
                 "Error checking for existing ILM policy", err
             ) from err
 
         if existing_policy:
             LOGGER.info("Found existing ILM Policy, do nothing '%s'", ilm_policy_name)
-            return
+        else:
+            LOGGER.info("Creating ILM Policy '%s'", ilm_policy_name)
+            try:
+                await client.ilm.put_lifecycle(ilm_policy_name, policy)
+            except ElasticsearchException as err:
+                raise convert_es_error("Error creating initial ILM policy", err) from err
+
+        await self._cluster_facts.async_record(
+            self._gateway.es_version, resource, policy_fingerprint
+        )
 
+    def _build_basic_ilm_policy(self, downsampling: bool = False) -> dict:
+        """Build the body of the index lifecycle management policy.
+
+        Args:
+            downsampling (bool): Downsample the indices in the warm and cold phases, see DOWNSAMPLING_ROUNDS.
+
+        """
         policy = {
             "policy": {
                 "phases": {
@@ -276,8 +608,13 @@ class IndexManager:
                 "max_primary_shard_size"
             ] = "50gb"
 
-        LOGGER.info("Creating ILM Policy '%s'", ilm_policy_name)
-        try:
-            await client.ilm.put_lifecycle(ilm_policy_name, policy)
-        except ElasticsearchException as err:
-            raise convert_es_error("Error creating initial ILM policy", err) from err
+        if downsampling:
+            for phase, (min_age, fixed_interval) in zip(
+                ("warm", "cold"), DOWNSAMPLING_ROUNDS, strict=False
+            ):
+                policy["policy"]["phases"][phase] = {
+                    "min_age": min_age,
+                    "actions": {"downsample": {"fixed_interval": fixed_interval}},
+                }
+
+        return policy
@@ -1,5 +1,6 @@
 """Support for sending event data to an Elasticsearch cluster."""
 
+import time
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.helpers.typing import HomeAssistantType
@@ -11,7 +12,7 @@ from custom_components.elasticsearch.logger import LOGGER
 from .es_doc_publisher import DocumentPublisher
 from .es_gateway import ElasticsearchGateway
 from .es_index_manager import IndexManager
-from .utils import get_merged_config
+from .utils import async_gather_all, get_merged_config
 
 
 class ElasticIntegration:
@@ -32,13 +33,21 @@ class ElasticIntegration:
         """Async init procedure."""
 
         try:
-            await self.gateway.async_init()
-            await self.privilege_check.enforce_privileges()
-            await self.index_manager.async_setup()
-            await self.publisher.async_init()
+            # System information is gathered while connecting.
+            await self._async_run_phase(
+                "connect", self.gateway.async_init(), self.publisher.async_prepare()
+            )
+            # Privilege errors take precedence over index setup errors.
+            await self._async_run_phase(
+                "setup",
+                self.privilege_check.enforce_privileges(),
+                self.index_manager.async_setup(),
+            )
+            await self._async_run_phase("publisher", self.publisher.async_init())
         except Exception as err:
             try:
                 self.publisher.stop_publisher()
+                await self.publisher.async_stop_sinks()
                 await self.gateway.async_stop_gateway()
             except Exception as shutdown_err:
                 LOGGER.error("Error shutting down gateway following failed initialization", shutdown_err)
@@ -47,10 +56,21 @@ class ElasticIntegration:
 
 
 
+    async def _async_run_phase(self, name: str, *steps):
+        """Run the independent steps of a startup phase concurrently."""
+        start = time.monotonic()
+        try:
+            await async_gather_all(*steps)
+        finally:
+            LOGGER.debug(
+                "Startup phase [%s] took %.3f seconds", name, time.monotonic() - start
+            )
+
     async def async_shutdown(self, config_entry: ConfigEntry): # pylint disable=unused-argument
         """Async shutdown procedure."""
         LOGGER.debug("async_shutdown: starting shutdown")
         self.publisher.stop_publisher()
+        await self.publisher.async_stop_sinks()
         await self.gateway.async_stop_gateway()
         LOGGER.debug("async_shutdown: shutdown complete")
         return True
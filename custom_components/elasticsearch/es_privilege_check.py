@@ -8,6 +8,15 @@ from homeassistant.const import CONF_ALIAS, CONF_API_KEY, CONF_USERNAME
 from custom_components.elasticsearch.const import (
     CONF_INDEX_FORMAT,
     CONF_INDEX_MODE,
+    CONF_NUMERIC_DATASTREAM,
+    CONF_ROLLUP_DOMAINS,
+    CONF_ROLLUP_ENTITIES,
+    CONF_SERVER_SIDE_ENRICHMENT,
+    DATASTREAM_NUMERIC_INDEX_TEMPLATE_NAME,
+    DATASTREAM_ROLLUP_INDEX_TEMPLATE_NAME,
+    DEFAULT_NUMERIC_DATASTREAM,
+    DEFAULT_SERVER_SIDE_ENRICHMENT,
+    ENTITY_METADATA_INDEX_NAME,
     INDEX_MODE_DATASTREAM,
 )
 from custom_components.elasticsearch.errors import (
@@ -73,6 +82,30 @@ class ESPrivilegeCheck:
                     "privileges": ["manage", "index", "create_index", "create"],
                 }
             ]
+
+            if config.get(CONF_NUMERIC_DATASTREAM, DEFAULT_NUMERIC_DATASTREAM):
+                required_index_privileges[0]["names"].append(
+                    f"{DATASTREAM_NUMERIC_INDEX_TEMPLATE_NAME}.*"
+                )
+
+            if config.get(CONF_ROLLUP_DOMAINS) or config.get(CONF_ROLLUP_ENTITIES):
+                required_index_privileges[0]["names"].append(
+                    f"{DATASTREAM_ROLLUP_INDEX_TEMPLATE_NAME}.*"
+                )
+
+            if config.get(
+                CONF_SERVER_SIDE_ENRICHMENT, DEFAULT_SERVER_SIDE_ENRICHMENT
+            ):
+                required_cluster_privileges += [
+                    "manage_enrich",
+                    "manage_ingest_pipelines",
+                ]
+                required_index_privileges.append(
+                    {
+                        "names": [ENTITY_METADATA_INDEX_NAME],
+                        "privileges": ["manage", "index", "create_index", "read"],
+                    }
+                )
         else:
             required_index_privileges = [
                 {
@@ -0,0 +1,369 @@
+"""Sends bulk actions to a single Elasticsearch cluster."""
+
+import logging
+import time
+from collections import deque
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+
+from .const import (
+    CONF_BULK_DISCOVER_MAX_BYTES,
+    CONF_BULK_MAX_BYTES,
+    CONF_SINK_QUEUE_SIZE,
+    DEFAULT_BULK_DISCOVER_MAX_BYTES,
+    DEFAULT_BULK_MAX_BYTES,
+    DEFAULT_SINK_QUEUE_SIZE,
+    EVENT_CIRCUIT_BREAKER_STATE_CHANGED,
+)
+from .es_chunk_sizer import AdaptiveChunkSizer
+from .es_circuit_breaker import CircuitBreaker
+from .es_gateway import ElasticsearchGateway
+from .es_index_manager import IndexManager
+from .es_privilege_check import ESPrivilegeCheck
+from .logger import LOGGER
+
+# Only ask for the outcome of failed items, rather than a result for every document.
+# This leaves out the status of each item, so rejections are recognized by their error type.
+BULK_FILTER_PATH = "errors,items.*.error"
+
+# Error types of bulk items which were rejected with HTTP 429 because the cluster is overloaded.
+REJECTED_ERROR_TYPES = ("es_rejected_execution_exception", "circuit_breaking_exception")
+
+
+class PublishSink:
+    """Sends bulk actions to a single Elasticsearch cluster.
+
+    Each sink has its own queue, circuit breaker and chunk sizing, so that a slow or
+    unavailable cluster does not hold back the others. Actions which could not be
+    sent because of a connection error or a rejection are kept in the queue, and
+    retried on the next flush. The queue is bounded; the oldest actions are dropped
+    once it is full.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        config: dict,
+        gateway: ElasticsearchGateway,
+        hass: HomeAssistant,
+        config_entry: ConfigEntry | None = None,
+        index_manager: IndexManager | None = None,
+        privilege_check: ESPrivilegeCheck | None = None,
+    ):
+        """Initialize the sink."""
+        self.name = name
+        self.gateway = gateway
+        self.index_manager = index_manager
+        # Only set for additional clusters, the integration checks the primary cluster itself.
+        self.privilege_check = privilege_check
+        self._hass = hass
+        self._config_entry = config_entry
+
+        self.circuit_breaker = CircuitBreaker(
+            config, on_state_change=self._on_circuit_breaker_state_change
+        )
+        self.chunk_sizer = AdaptiveChunkSizer(config)
+        self._max_bulk_bytes = (
+            config.get(CONF_BULK_MAX_BYTES, DEFAULT_BULK_MAX_BYTES)
+            or DEFAULT_BULK_MAX_BYTES
+        )
+        self._discover_max_bulk_bytes = config.get(
+            CONF_BULK_DISCOVER_MAX_BYTES, DEFAULT_BULK_DISCOVER_MAX_BYTES
+        )
+
+        self._queue = deque(
+            maxlen=config.get(CONF_SINK_QUEUE_SIZE, DEFAULT_SINK_QUEUE_SIZE)
+        )
+        self._flushing = False
+        self.flush_task = None
+
+        self.oversized_documents = 0
+        self.dropped_documents = 0
+
+    async def async_init(self):
+        """Perform async initialization for the sink."""
+        if self._discover_max_bulk_bytes:
+            max_content_length = await self.gateway.async_get_max_content_length()
+            if max_content_length and max_content_length < self._max_bulk_bytes:
+                self._max_bulk_bytes = max_content_length
+        LOGGER.debug(
+            "[%s] Limiting bulk requests to %i bytes", self.name, self._max_bulk_bytes
+        )
+
+    @property
+    def available(self) -> bool:
+        """Return if bulk requests may currently be sent to this sink."""
+        return (
+            not self.gateway.active_connection_error
+            and self.circuit_breaker.allow_request()
+        )
+
+    def queue_size(self) -> int:
+        """Return the number of actions waiting to be sent."""
+        return len(self._queue)
+
+    def enqueue(self, actions: list):
+        """Queue bulk actions to be sent on the next flush."""
+        self._record_overflow(len(actions))
+        self._queue.extend(actions)
+
+    def _requeue(self, actions: list):
+        """Queue actions for a retry, ahead of anything queued since they were taken."""
+        # The retried actions are the oldest, so they are the ones to drop.
+        overflow = self._record_overflow(len(actions))
+        self._queue.extendleft(reversed(actions[max(0, overflow) :]))
+
+    def _record_overflow(self, count: int) -> int:
+        """Account for the oldest actions which do not fit, once count actions are added to the queue."""
+        overflow = len(self._queue) + count - self._queue.maxlen
+        if overflow > 0:
+            self.dropped_documents += overflow
+            LOGGER.warning(
+                "[%s] Queue is full, dropping the %i oldest documents",
+                self.name,
+                overflow,
+            )
+        return overflow
+
+    def schedule_flush(self):
+        """Flush the queue in the background, unless a flush is already running."""
+        if self._flushing or not self._queue:
+            return
+
+        coro = self.async_flush()
+        if self._config_entry:
+            self.flush_task = self._config_entry.async_create_background_task(
+                self._hass, coro, f"elasticsearch_sink_flush_{self.name}"
+            )
+        else:
+            self.flush_task = self._hass.async_create_background_task(
+                coro, f"elasticsearch_sink_flush_{self.name}"
+            )
+
+    def stop(self):
+        """Cancel a running background flush."""
+        if self.flush_task is not None and not self.flush_task.done():
+            self.flush_task.cancel()
+        self.flush_task = None
+
+    async def async_flush(self):
+        """Send queued actions while the sink is available."""
+        if self._flushing:
+            return
+
+        self._flushing = True
+        try:
+            while self._queue and self.available:
+                # Only a small probe batch is sent while the circuit breaker is half-open.
+                probe_size = self.circuit_breaker.max_batch_size
+                max_actions = probe_size or len(self._queue)
+                actions = [
+                    self._queue.popleft()
+                    for _ in range(min(max_actions, len(self._queue)))
+                ]
+
+                LOGGER.debug(
+                    "[%s] Publishing %i documents to Elasticsearch",
+                    self.name,
+                    len(actions),
+                )
+                unsent = await self.async_send(actions)
+                if unsent:
+                    # Retry on the next flush, ahead of anything queued since.
+                    self._requeue(unsent)
+                    return
+
+                if probe_size is not None:
+                    return
+        finally:
+            self._flushing = False
+
+    async def async_send(self, actions: list) -> list:
+        """Send the provided actions in chunks, sized by the adaptive chunk sizer and bounded by the maximum bulk request size.
+
+        Returns the actions which should be retried.
+        """
+        client = self.gateway.get_client()
+        lines = self._serialize_actions(client, actions)
+        sizes = [len(line.encode("utf-8")) for line in lines]
+        position = 0
+        failed = 0
+        oversized = self.oversized_documents
+        while position < len(actions):
+            if position > 0 and not self.circuit_breaker.allow_request():
+                LOGGER.warning(
+                    "[%s] Circuit breaker opened, postponing %i documents",
+                    self.name,
+                    len(actions) - position,
+                )
+                return actions[position:]
+
+            chunk, body, position = self._next_bulk_chunk(
+                actions, lines, sizes, position
+            )
+            if not chunk:
+                continue
+
+            chunk_failed = await self._async_send_bulk_chunk(client, chunk, body)
+            if chunk_failed is None:
+                return chunk + actions[position:]
+            failed += chunk_failed
+
+        skipped = self.oversized_documents - oversized
+        if failed or skipped:
+            LOGGER.warning(
+                "[%s] Published %i of %i documents, %i failed to index and %i exceeded the maximum bulk request size",
+                self.name,
+                len(actions) - failed - skipped,
+                len(actions),
+                failed,
+                skipped,
+            )
+        else:
+            LOGGER.info("[%s] Publish Succeeded", self.name)
+        return []
+
+    async def _async_send_bulk_chunk(
+        self, client, chunk: list, body: str
+    ) -> int | None:
+        """Send a single bulk request, returning the number of documents which failed to index, or None if it should be retried."""
+        from elasticsearch7.exceptions import ConnectionError as ESConnectionError
+        from elasticsearch7.exceptions import (
+            ConnectionTimeout,
+            ElasticsearchException,
+            TransportError,
+        )
+
+        start = time.monotonic()
+        try:
+            # Only failed items are returned, so successful requests come back as {"errors": false}.
+            bulk_response = await client.bulk(body=body, filter_path=BULK_FILTER_PATH)
+            latency = time.monotonic() - start
+            if LOGGER.isEnabledFor(logging.DEBUG):
+                LOGGER.debug("Elasticsearch bulk response: %s", bulk_response)
+        except ESConnectionError as err:
+            LOGGER.exception("Error publishing documents to Elasticsearch: %s", err)
+            self.gateway.notify_of_connection_error(err)
+            self.circuit_breaker.record_failure()
+            if isinstance(err, ConnectionTimeout):
+                self.chunk_sizer.record_overload("bulk request timed out")
+            return None
+        except TransportError as err:
+            LOGGER.exception("Error publishing documents to Elasticsearch: %s", err)
+            # The cluster responded, so the connection itself is healthy.
+            self.gateway.notify_of_request_success()
+            if err.status_code == 429:
+                self.chunk_sizer.record_overload("bulk request rejected")
+                self.circuit_breaker.record_failure()
+                return None
+            if isinstance(err.status_code, int) and err.status_code >= 500:
+                self.circuit_breaker.record_failure()
+            else:
+                self.circuit_breaker.record_success(time.monotonic() - start)
+            return len(chunk)
+        except ElasticsearchException as err:
+            LOGGER.exception("Error publishing documents to Elasticsearch: %s", err)
+            self.gateway.notify_of_request_success()
+            self.circuit_breaker.record_success(time.monotonic() - start)
+            return len(chunk)
+
+        self.gateway.notify_of_request_success()
+        self.circuit_breaker.record_success(latency)
+
+        if not bulk_response.get("errors"):
+            self.chunk_sizer.record_success(latency, len(chunk))
+            return 0
+
+        failed_items = bulk_response.get("items", [])
+        LOGGER.error(
+            "[%s] %i of %i documents failed to index, e.g.: %s",
+            self.name,
+            len(failed_items),
+            len(chunk),
+            failed_items[0] if failed_items else None,
+        )
+        if self._has_rejected_items(failed_items):
+            self.chunk_sizer.record_overload("documents rejected")
+
+        return len(failed_items)
+
+    def _next_bulk_chunk(
+        self, actions: list, lines: list[str], sizes: list[int], position: int
+    ) -> tuple[list, str, int]:
+        """Collect the next chunk of actions and its request body, returning them with the position of the following action."""
+        max_actions = self.chunk_sizer.chunk_size
+        chunk = []
+        chunk_lines = []
+        chunk_bytes = 0
+        while position < len(actions) and len(chunk) < max_actions:
+            size = sizes[position]
+            if size > self._max_bulk_bytes:
+                self._report_oversized_document(actions[position], size)
+                position += 1
+                continue
+            if chunk and chunk_bytes + size > self._max_bulk_bytes:
+                break
+            chunk_bytes += size
+
+            chunk.append(actions[position])
+            chunk_lines.append(lines[position])
+            position += 1
+
+        return chunk, "".join(chunk_lines), position
+
+    @staticmethod
+    def _serialize_actions(client, actions: list) -> list[str]:
+        """Serialize each action into its lines of the bulk request body."""
+        from elasticsearch7.helpers.actions import expand_action
+
+        serializer = client.transport.serializer
+        lines = []
+        for action in actions:
+            header, source = expand_action(action)
+            # Each line is terminated by a newline
+            line = serializer.dumps(header) + "\n"
+            if source is not None:
+                line += serializer.dumps(source) + "\n"
+            lines.append(line)
+        return lines
+
+    def _report_oversized_document(self, action: dict, size: int):
+        """Report a document which can never fit in a bulk request."""
+        self.oversized_documents += 1
+        source = action.get("_source", {})
+        entity_id = source.get("hass.entity_id") or source.get("hass.entity", {}).get(
+            "id"
+        )
+        LOGGER.warning(
+            "[%s] Skipping document for [%s]: its size (%i bytes) exceeds the maximum bulk request size (%i bytes)",
+            self.name,
+            entity_id,
+            size,
+            self._max_bulk_bytes,
+        )
+
+    @staticmethod
+    def _has_rejected_items(items: list) -> bool:
+        """Determine if any bulk item was rejected because the cluster is overloaded (HTTP 429)."""
+        for item in items:
+            for result in item.values():
+                if not isinstance(result, dict):
+                    continue
+                error = result.get("error")
+                if isinstance(error, dict) and error.get("type") in REJECTED_ERROR_TYPES:
+                    return True
+        return False
+
+    @callback
+    def _on_circuit_breaker_state_change(self, previous: str, state: str, reason: str):
+        """Make circuit breaker state changes visible to Home Assistant."""
+        self._hass.bus.async_fire(
+            EVENT_CIRCUIT_BREAKER_STATE_CHANGED,
+            {
+                "sink": self.name,
+                "previous_state": previous,
+                "state": state,
+                "reason": reason,
+            },
+        )
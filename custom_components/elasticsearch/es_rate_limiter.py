@@ -0,0 +1,181 @@
+"""Per-entity rate limiting of published state changes."""
+
+import time
+
+from homeassistant.core import State
+from homeassistant.helpers.typing import EventType
+
+from .const import (
+    CONF_RATE_LIMIT_BURST,
+    CONF_RATE_LIMIT_DOMAINS,
+    CONF_RATE_LIMIT_ENTITIES,
+    CONF_RATE_LIMIT_PER_ENTITY,
+    CONF_RATE_LIMIT_STRATEGY,
+    DEFAULT_RATE_LIMIT_BURST,
+    DEFAULT_RATE_LIMIT_PER_ENTITY,
+    DEFAULT_RATE_LIMIT_STRATEGY,
+    RATE_LIMIT_STRATEGY_DROP,
+    RATE_LIMIT_STRATEGY_LATEST,
+)
+from .errors import ElasticException
+from .logger import LOGGER
+
+
+class TokenBucket:
+    """Token bucket which refills continuously at a fixed rate."""
+
+    def __init__(self, rate_per_minute: float, capacity: float, now: float):
+        """Initialize a full bucket."""
+        self._refill_per_second = rate_per_minute / 60
+        self._capacity = capacity
+        self._tokens = capacity
+        self._updated = now
+
+    def try_consume(self, now: float) -> bool:
+        """Take a token from the bucket, returning False if none are available."""
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(
+                self._capacity, self._tokens + elapsed * self._refill_per_second
+            )
+            self._updated = now
+
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+
+        return False
+
+
+class EntityRateLimiter:
+    """Enforce maximum publish rates for individual entities.
+
+    Each entity gets its own token bucket. The rate for an entity is resolved from
+    the entity overrides, then the domain overrides, then the per-entity default.
+    Domain rates apply to each entity of that domain individually.
+    """
+
+    def __init__(self, config: dict):
+        """Initialize the rate limiter."""
+        self._default_rate = config.get(
+            CONF_RATE_LIMIT_PER_ENTITY, DEFAULT_RATE_LIMIT_PER_ENTITY
+        )
+        self._domain_rates: dict = config.get(CONF_RATE_LIMIT_DOMAINS) or {}
+        self._entity_rates: dict = config.get(CONF_RATE_LIMIT_ENTITIES) or {}
+        self._burst = max(
+            1, config.get(CONF_RATE_LIMIT_BURST, DEFAULT_RATE_LIMIT_BURST)
+        )
+        self._strategy = config.get(
+            CONF_RATE_LIMIT_STRATEGY, DEFAULT_RATE_LIMIT_STRATEGY
+        )
+
+        if self._strategy not in (RATE_LIMIT_STRATEGY_DROP, RATE_LIMIT_STRATEGY_LATEST):
+            raise ElasticException(
+                "Unexpected rate limit strategy: %s", self._strategy
+            )
+
+        self._buckets: dict[str, TokenBucket] = {}
+        self._pending: dict[str, tuple[State, EventType]] = {}
+
+        self.suppressed_counts: dict[str, int] = {}
+        self.suppressed_since_publish = 0
+
+        if self.enabled:
+            LOGGER.debug(
+                "Rate limiting state changes (default: %s/min, domains: %s, entities: %s, strategy: %s)",
+                self._default_rate,
+                str(self._domain_rates),
+                str(self._entity_rates),
+                self._strategy,
+            )
+
+    @property
+    def enabled(self) -> bool:
+        """Return if any rate limit is configured."""
+        return bool(self._default_rate or self._domain_rates or self._entity_rates)
+
+    @property
+    def total_suppressed(self) -> int:
+        """Return the total number of suppressed state changes."""
+        return sum(self.suppressed_counts.values())
+
+    def has_pending(self) -> bool:
+        """Return if there are held back state changes waiting for a token."""
+        return len(self._pending) > 0
+
+    def allow(self, state: State, event: EventType, now: float | None = None) -> bool:
+        """Determine if the provided state change may be published right away.
+
+        When the "latest" strategy is in use, a suppressed state change is held back
+        and replaces any older held back state change for the same entity.
+        """
+        bucket = self._get_bucket(state.domain, state.entity_id, now)
+        if bucket is None:
+            return True
+
+        entity_id = state.entity_id
+        now = time.monotonic() if now is None else now
+
+        if bucket.try_consume(now):
+            # A newer value supersedes anything which was still held back.
+            if self._pending.pop(entity_id, None) is not None:
+                self._record_suppressed(entity_id)
+            return True
+
+        if self._strategy == RATE_LIMIT_STRATEGY_LATEST:
+            if entity_id in self._pending:
+                self._record_suppressed(entity_id)
+            self._pending[entity_id] = (state, event)
+        else:
+            self._record_suppressed(entity_id)
+
+        return False
+
+    def release_pending(self, now: float | None = None) -> list[tuple[State, EventType]]:
+        """Return held back state changes whose entity has a token available again."""
+        if not self._pending:
+            return []
+
+        now = time.monotonic() if now is None else now
+        released = []
+        for entity_id, (state, event) in list(self._pending.items()):
+            if self._buckets[entity_id].try_consume(now):
+                released.append((state, event))
+                del self._pending[entity_id]
+
+        return released
+
+    def reset_publish_stats(self) -> int:
+        """Return the number of suppressed state changes since the last call, and reset it."""
+        suppressed = self.suppressed_since_publish
+        self.suppressed_since_publish = 0
+        return suppressed
+
+    def _record_suppressed(self, entity_id: str):
+        if entity_id not in self.suppressed_counts:
+            LOGGER.warning(
+                "[%s] exceeds its rate limit. Suppressed state changes are %s.",
+                entity_id,
+                "held back"
+                if self._strategy == RATE_LIMIT_STRATEGY_LATEST
+                else "dropped",
+            )
+        self.suppressed_counts[entity_id] = self.suppressed_counts.get(entity_id, 0) + 1
+        self.suppressed_since_publish += 1
+
+    def _get_bucket(self, domain: str, entity_id: str, now: float | None) -> TokenBucket | None:
+        bucket = self._buckets.get(entity_id)
+        if bucket is not None:
+            return bucket
+
+        rate = self._entity_rates.get(
+            entity_id, self._domain_rates.get(domain, self._default_rate)
+        )
+        if not rate:
+            return None
+
+        bucket = TokenBucket(
+            rate, self._burst, time.monotonic() if now is None else now
+        )
+        self._buckets[entity_id] = bucket
+        return bucket
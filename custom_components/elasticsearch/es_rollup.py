@@ -0,0 +1,180 @@
+"""Pre-aggregation of numeric state changes into rollup documents."""
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from homeassistant.core import State
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    CONF_ROLLUP_DOMAINS,
+    CONF_ROLLUP_ENTITIES,
+    CONF_ROLLUP_PASSTHROUGH_DOMAINS,
+    CONF_ROLLUP_PASSTHROUGH_ENTITIES,
+    CONF_ROLLUP_WINDOW,
+    DEFAULT_ROLLUP_WINDOW,
+)
+from .logger import LOGGER
+
+
+@dataclass
+class Rollup:
+    """Running aggregate of the numeric states of an entity within a window."""
+
+    state: State
+    start: datetime
+    count: int
+    min: float
+    max: float
+    sum: float
+    last: float
+
+    @property
+    def avg(self) -> float:
+        """Return the average of the aggregated values, or the carried forward value of an empty window."""
+        return self.sum / self.count if self.count else self.last
+
+    def add(self, state: State, value: float):
+        """Fold a value into the aggregate."""
+        self.state = state
+        self.count += 1
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self.sum += value
+        self.last = value
+
+
+class RollupAggregator:
+    """Aggregate the numeric states of selected entities into fixed windows.
+
+    Windows are aligned to the clock, and an entity has at most one open window. A
+    window is closed once a state change falls into a later window, or once its end
+    has passed. Raw state changes of rolled up entities are only published when they
+    pass through, per domain or entity. Idle entities can carry their value forward
+    into an empty window, so that they are published when publishing all entities.
+    """
+
+    def __init__(self, config: dict):
+        """Initialize the aggregator."""
+        self._domains = set(config.get(CONF_ROLLUP_DOMAINS) or [])
+        self._entities = set(config.get(CONF_ROLLUP_ENTITIES) or [])
+        self._passthrough_domains = set(
+            config.get(CONF_ROLLUP_PASSTHROUGH_DOMAINS) or []
+        )
+        self._passthrough_entities = set(
+            config.get(CONF_ROLLUP_PASSTHROUGH_ENTITIES) or []
+        )
+        self.window = timedelta(
+            seconds=max(1, config.get(CONF_ROLLUP_WINDOW, DEFAULT_ROLLUP_WINDOW))
+        )
+
+        self._open: dict[str, Rollup] = {}
+        self._closed: list[Rollup] = []
+        # Start of the last window collected for each entity.
+        self._collected: dict[str, datetime] = {}
+
+        if self.enabled:
+            LOGGER.debug(
+                "Rolling up numeric states into %s windows (domains: %s, entities: %s)",
+                self.window,
+                str(self._domains),
+                str(self._entities),
+            )
+
+    @property
+    def enabled(self) -> bool:
+        """Return if any entity is rolled up."""
+        return bool(self._domains or self._entities)
+
+    def has_closed_windows(self, now: datetime | None = None) -> bool:
+        """Return if any window has closed, and is waiting to be published."""
+        if self._closed:
+            return True
+
+        now = dt_util.utcnow() if now is None else now
+        current_start = self._window_start(now)
+        return any(rollup.start < current_start for rollup in self._open.values())
+
+    def rolls_up(self, state: State) -> bool:
+        """Determine if the numeric states of the entity are rolled up."""
+        return state.entity_id in self._entities or state.domain in self._domains
+
+    def passes_through(self, state: State) -> bool:
+        """Determine if the raw state changes of a rolled up entity are published as well."""
+        return (
+            state.entity_id in self._passthrough_entities
+            or state.domain in self._passthrough_domains
+        )
+
+    def add(self, state: State, value: float, time: datetime):
+        """Fold a numeric state into the window of its entity."""
+        start = self._window_start(time)
+        rollup = self._open.get(state.entity_id)
+
+        # A late state change is folded into the open window, rather than reopening a published one.
+        if rollup is not None and start <= rollup.start:
+            rollup.add(state, value)
+            return
+
+        if rollup is not None:
+            self._closed.append(rollup)
+
+        self._open[state.entity_id] = Rollup(
+            state=state,
+            start=start,
+            count=1,
+            min=value,
+            max=value,
+            sum=value,
+            last=value,
+        )
+
+    def collect(self, now: datetime | None = None) -> list[Rollup]:
+        """Close the windows which have ended, and return all closed windows."""
+        now = dt_util.utcnow() if now is None else now
+        current_start = self._window_start(now)
+
+        for entity_id, rollup in list(self._open.items()):
+            if rollup.start < current_start:
+                self._closed.append(self._open.pop(entity_id))
+
+        closed, self._closed = self._closed, []
+        for rollup in closed:
+            self._collected[rollup.state.entity_id] = rollup.start
+        return closed
+
+    def carry_forward(
+        self, state: State, value: float, now: datetime | None = None
+    ) -> Rollup | None:
+        """Return an empty window for an idle entity, which carries its value forward.
+
+        The window is the last one which has ended. Entities with an open window, or
+        which were already collected for that window, are not idle and get none.
+        """
+        now = dt_util.utcnow() if now is None else now
+        start = self._window_start(now) - self.window
+
+        if state.entity_id in self._open:
+            return None
+        collected = self._collected.get(state.entity_id)
+        if collected is not None and collected >= start:
+            return None
+
+        self._collected[state.entity_id] = start
+        return Rollup(
+            state=state,
+            start=start,
+            count=0,
+            min=value,
+            max=value,
+            sum=0,
+            last=value,
+        )
+
+    def _window_start(self, time: datetime) -> datetime:
+        """Return the start of the window the time falls into."""
+        time = dt_util.as_utc(time)
+        window = self.window.total_seconds()
+        return datetime.fromtimestamp(
+            time.timestamp() // window * window, tz=dt_util.UTC
+        )
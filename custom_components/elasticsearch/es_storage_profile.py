@@ -0,0 +1,99 @@
+"""Storage profiles, which trade storage against indexing and query speed."""
+
+from dataclasses import dataclass
+
+from .const import (
+    STORAGE_PROFILE_BALANCED,
+    STORAGE_PROFILE_MINIMAL_STORAGE,
+    STORAGE_PROFILE_QUERY_OPTIMIZED,
+)
+from .es_version import ElasticsearchVersion
+
+
+@dataclass(frozen=True)
+class StorageProfile:
+    """Index settings and mapping options which are rendered into the index templates."""
+
+    codec: str = "best_compression"
+    # Rebuild _source from doc values, rather than storing it.
+    synthetic_source: bool = False
+    # Fields and orders the index is sorted by, which time series indices ignore.
+    sort: tuple[tuple[str, str], ...] = ()
+    # Text fields are only used for matching, so they do not need scoring factors.
+    text_norms: bool = True
+    refresh_interval: str | None = None
+    number_of_replicas: int | None = None
+
+    def render(
+        self,
+        settings: dict,
+        mappings: dict,
+        es_version: ElasticsearchVersion,
+        time_series: bool = False,
+    ):
+        """Apply the profile to the settings and mappings of an index template, in place.
+
+        Args:
+            settings (dict): The index settings of the template.
+            mappings (dict): The mappings of the template.
+            es_version (ElasticsearchVersion): The version of the cluster the template is installed on.
+            time_series (bool): Whether the template creates time series indices.
+
+        """
+        settings["codec"] = self.codec
+
+        if self.synthetic_source and es_version.supports_synthetic_source():
+            settings["index.mapping.source.mode"] = "synthetic"
+
+        if not self.text_norms:
+            _disable_text_norms(mappings)
+
+        # Serverless manages sorting, refreshes and replicas itself.
+        if es_version.is_serverless():
+            return
+
+        # Time series indices are always sorted by their dimensions and timestamp.
+        if self.sort and not time_series:
+            settings["index.sort.field"] = [field for field, _ in self.sort]
+            settings["index.sort.order"] = [order for _, order in self.sort]
+
+        if self.refresh_interval is not None:
+            settings["index.refresh_interval"] = self.refresh_interval
+
+        if self.number_of_replicas is not None:
+            settings["index.number_of_replicas"] = self.number_of_replicas
+
+
+def _disable_text_norms(mapping: dict):
+    """Disable norms of every text field in the mapping, including dynamic templates and multi-fields."""
+    if mapping.get("type") == "text":
+        mapping["norms"] = False
+
+    for value in mapping.values():
+        if isinstance(value, dict):
+            _disable_text_norms(value)
+        elif isinstance(value, list):
+            for item in value:
+                if isinstance(item, dict):
+                    _disable_text_norms(item)
+
+
+STORAGE_PROFILES = {
+    STORAGE_PROFILE_BALANCED: StorageProfile(),
+    # Documents of an entity are stored together, which compresses best, and
+    # become searchable less often. Without replicas, a lost node loses data.
+    STORAGE_PROFILE_MINIMAL_STORAGE: StorageProfile(
+        synthetic_source=True,
+        sort=(("hass.entity.id", "asc"), ("@timestamp", "desc")),
+        text_norms=False,
+        refresh_interval="30s",
+        number_of_replicas=0,
+    ),
+    # Recent documents are found first, and the index is refreshed every second,
+    # even while it is not searched.
+    STORAGE_PROFILE_QUERY_OPTIMIZED: StorageProfile(
+        codec="default",
+        sort=(("@timestamp", "desc"),),
+        refresh_interval="1s",
+    ),
+}
@@ -11,15 +11,18 @@ class ElasticsearchVersion:
         self.major = None
         self.minor = None
         self.build_flavor = None
+        self.cluster_uuid = None
 
     async def async_init(self):
         """I/O bound init."""
-        version = (await self._client.info())["version"]
+        info = await self._client.info()
+        version = info["version"]
         version_number_parts = version["number"].split(".")
         self._version_number_str = version["number"]
         self.major = int(version_number_parts[0])
         self.minor = int(version_number_parts[1])
         self.build_flavor = version.get("build_flavor", "unknown")
+        self.cluster_uuid = info.get("cluster_uuid")
 
     def is_supported_version(self):
         """Determine if this version of ES is supported by this component."""
@@ -53,6 +56,11 @@ class ElasticsearchVersion:
         # https://www.elastic.co/guide/en/elasticsearch/reference/current/data-stream-lifecycle.html
         return self.meets_minimum_version(major=7, minor=13)
 
+    def supports_synthetic_source(self):
+        """Determine if this version of ES supports the index.mapping.source.mode setting, for synthetic _source."""
+        # https://www.elastic.co/guide/en/elasticsearch/reference/current/mapping-source-field.html#synthetic-source
+        return self.meets_minimum_version(major=8, minor=18)
+
     def to_string(self):
         """Return a string representation of the current ES version."""
         return self._version_number_str
@@ -3,3 +3,45 @@
 import logging
 
 LOGGER = logging.getLogger("custom_components.elasticsearch")
+
+
+class EventTracer:
+    """Decide which state change events are traced at debug level.
+
+    Per-event logging is opt-in: events are traced when debug logging is enabled and
+    the event is either sampled (1 in `sample_rate` events), or belongs to one of the
+    traced entities. The log level is only checked when `refresh` is called.
+    """
+
+    def __init__(self, sample_rate: int = 0, entities: list[str] | None = None):
+        """Initialize the tracer."""
+        self._sample_rate = sample_rate or 0
+        self._entities = frozenset(entities or [])
+        self._counter = 0
+        self.debug_enabled = False
+        # True if any event may be traced
+        self.active = False
+        self.refresh()
+
+    def refresh(self):
+        """Pick up changes to the configured log level."""
+        self.debug_enabled = LOGGER.isEnabledFor(logging.DEBUG)
+        self.active = self.debug_enabled and (
+            self._sample_rate > 0 or len(self._entities) > 0
+        )
+
+    def should_trace(self, entity_id: str) -> bool:
+        """Determine if the next event for the provided entity should be traced."""
+        if not self.active:
+            return False
+
+        if entity_id in self._entities:
+            return True
+
+        if self._sample_rate:
+            self._counter += 1
+            if self._counter >= self._sample_rate:
+                self._counter = 0
+                return True
+
+        return False
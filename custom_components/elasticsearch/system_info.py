@@ -3,8 +3,13 @@ import socket
 
 from homeassistant.core import HomeAssistant
 
+from .const import DOMAIN
 from .logger import LOGGER
 
+# System information does not change while Home Assistant is running, so it is
+# only retrieved once, rather than on every reload of the integration.
+DATA_SYSTEM_INFO = f"{DOMAIN}_system_info"
+
 
 class SystemInfo:
     """Retrieve system information."""
@@ -15,6 +20,16 @@ class SystemInfo:
 
     async def async_get_system_info(self):
         """Retrieve system information from HASS."""
+        cached = self._hass.data.get(DATA_SYSTEM_INFO)
+        if cached is not None:
+            return dict(cached)
+
+        system_info = await self._async_get_system_info()
+        if system_info:
+            self._hass.data[DATA_SYSTEM_INFO] = dict(system_info)
+        return system_info
+
+    async def _async_get_system_info(self):
         try:
             system_info = await self._hass.helpers.system_info.async_get_system_info()
 
@@ -1,4 +1,7 @@
 """Utilities."""
+import asyncio
+from collections.abc import Awaitable
+
 from homeassistant.config_entries import ConfigEntry
 
 
@@ -7,3 +10,32 @@ def get_merged_config(config_entry: ConfigEntry) -> dict:
 
     conf = {**config_entry.data, **config_entry.options}
     return conf
+
+
+BYTE_SIZE_UNITS = {
+    "b": 1,
+    "kb": 1024,
+    "mb": 1024**2,
+    "gb": 1024**3,
+    "tb": 1024**4,
+    "pb": 1024**5,
+}
+
+
+def parse_byte_size(value: str) -> int:
+    """Convert an Elasticsearch byte size value (i.e. "100mb") to a number of bytes."""
+    value = str(value).strip().lower()
+    number = value.rstrip("bkmgtp")
+    unit = value[len(number) :] or "b"
+    if unit not in BYTE_SIZE_UNITS:
+        raise ValueError(f"Unexpected byte size unit: {value}")
+    return int(float(number) * BYTE_SIZE_UNITS[unit])
+
+
+async def async_gather_all(*aws: Awaitable) -> list:
+    """Run the awaitables concurrently, and raise the first error (in argument order) once all of them are done."""
+    results = await asyncio.gather(*aws, return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return results
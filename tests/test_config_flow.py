@@ -19,12 +19,22 @@ from pytest_homeassistant_custom_component.common import MockConfigEntry
 from pytest_homeassistant_custom_component.test_util.aiohttp import AiohttpClientMocker
 
 from custom_components.elasticsearch.const import (
+    CONF_ADDITIONAL_CLUSTERS,
+    CONF_CIRCUIT_BREAKER_PROBE_SIZE,
+    CONF_CONNECTION_POOL_SIZE,
     CONF_INDEX_FORMAT,
     CONF_INDEX_MODE,
     CONF_PUBLISH_MODE,
+    CONF_RATE_LIMIT_BURST,
+    CONF_RATE_LIMIT_DOMAINS,
+    CONF_RATE_LIMIT_ENTITIES,
+    CONF_TSDS_DIMENSIONS,
     DOMAIN,
     INDEX_MODE_LEGACY,
     PUBLISH_MODE_ALL,
+    TSDS_DIMENSION_DEVICE_ID,
+    TSDS_DIMENSION_DOMAIN,
+    TSDS_DIMENSION_OBJECT_ID,
 )
 from tests.conftest import mock_config_entry
 from tests.test_util.es_startup_mocks import mock_es_initialization
@@ -726,3 +736,95 @@ async def test_legacy_options_flow(hass: HomeAssistant, es_aioclient_mock) -> No
     )
 
     assert options_result["type"] == data_entry_flow.RESULT_TYPE_CREATE_ENTRY
+
+
+@pytest.mark.asyncio
+async def test_advanced_options_flow(hass: HomeAssistant, es_aioclient_mock) -> None:
+    """Test connection options are offered to advanced users."""
+
+    es_url = "http://localhost:9200"
+
+    mock_es_initialization(es_aioclient_mock, url=es_url)
+
+    result = await hass.config_entries.flow.async_init(
+        DOMAIN, context={"source": SOURCE_USER}, data={}
+    )
+    result = await hass.config_entries.flow.async_configure(
+        result["flow_id"], user_input={"next_step_id": "no_auth"}
+    )
+    result = await hass.config_entries.flow.async_configure(
+        result["flow_id"], user_input={"url": es_url}
+    )
+
+    assert result["type"] == data_entry_flow.RESULT_TYPE_CREATE_ENTRY
+    entry = result["result"]
+
+    options_result = await hass.config_entries.options.async_init(
+        entry.entry_id, context={"show_advanced_options": True}
+    )
+
+    assert options_result["type"] == data_entry_flow.RESULT_TYPE_FORM
+    assert options_result["step_id"] == "publish_options"
+
+    # Rate limit overrides map a domain or entity to a rate
+    options_result = await hass.config_entries.options.async_configure(
+        options_result["flow_id"],
+        user_input={
+            CONF_RATE_LIMIT_DOMAINS: {"sensor": "fast"},
+            CONF_RATE_LIMIT_ENTITIES: ["sensor.power"],
+        },
+    )
+
+    assert options_result["type"] == data_entry_flow.RESULT_TYPE_FORM
+    assert options_result["errors"] == {
+        CONF_RATE_LIMIT_DOMAINS: "invalid_rate_limits",
+        CONF_RATE_LIMIT_ENTITIES: "invalid_rate_limits",
+    }
+
+    # Time series dimensions have to tell the entities apart
+    options_result = await hass.config_entries.options.async_configure(
+        options_result["flow_id"],
+        user_input={CONF_TSDS_DIMENSIONS: [TSDS_DIMENSION_DEVICE_ID]},
+    )
+
+    assert options_result["type"] == data_entry_flow.RESULT_TYPE_FORM
+    assert options_result["errors"] == {CONF_TSDS_DIMENSIONS: "invalid_tsds_dimensions"}
+
+    options_result = await hass.config_entries.options.async_configure(
+        options_result["flow_id"],
+        user_input={
+            CONF_RATE_LIMIT_DOMAINS: {"sensor": 6},
+            CONF_RATE_LIMIT_ENTITIES: {"sensor.power": 0.5},
+            CONF_RATE_LIMIT_BURST: 3,
+            CONF_TSDS_DIMENSIONS: [TSDS_DIMENSION_OBJECT_ID, TSDS_DIMENSION_DOMAIN],
+        },
+    )
+
+    assert options_result["type"] == data_entry_flow.RESULT_TYPE_FORM
+    assert options_result["step_id"] == "connection_options"
+
+    # Each additional cluster needs a URL
+    options_result = await hass.config_entries.options.async_configure(
+        options_result["flow_id"],
+        user_input={CONF_ADDITIONAL_CLUSTERS: [{"username": "elastic"}]},
+    )
+
+    assert options_result["type"] == data_entry_flow.RESULT_TYPE_FORM
+    assert options_result["errors"] == {
+        CONF_ADDITIONAL_CLUSTERS: "invalid_additional_clusters"
+    }
+
+    options_result = await hass.config_entries.options.async_configure(
+        options_result["flow_id"],
+        user_input={CONF_CONNECTION_POOL_SIZE: 4, CONF_CIRCUIT_BREAKER_PROBE_SIZE: 10},
+    )
+
+    assert options_result["type"] == data_entry_flow.RESULT_TYPE_CREATE_ENTRY
+    assert options_result["data"][CONF_CONNECTION_POOL_SIZE] == 4
+    assert options_result["data"][CONF_CIRCUIT_BREAKER_PROBE_SIZE] == 10
+    assert options_result["data"][CONF_RATE_LIMIT_DOMAINS] == {"sensor": 6}
+    assert options_result["data"][CONF_RATE_LIMIT_BURST] == 3
+    assert options_result["data"][CONF_TSDS_DIMENSIONS] == [
+        TSDS_DIMENSION_OBJECT_ID,
+        TSDS_DIMENSION_DOMAIN,
+    ]
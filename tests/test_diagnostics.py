@@ -0,0 +1,66 @@
+"""Tests for Elastic diagnostics."""
+
+import pytest
+from homeassistant.core import HomeAssistant, State
+from homeassistant.setup import async_setup_component
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+from pytest_homeassistant_custom_component.test_util.aiohttp import AiohttpClientMocker
+
+from custom_components.elasticsearch.config_flow import build_full_config
+from custom_components.elasticsearch.const import (
+    CONF_INDEX_MODE,
+    CONF_RATE_LIMIT_ENTITIES,
+    CONF_RATE_LIMIT_STRATEGY,
+    INDEX_MODE_LEGACY,
+    RATE_LIMIT_STRATEGY_DROP,
+)
+from custom_components.elasticsearch.const import DOMAIN as ELASTIC_DOMAIN
+from custom_components.elasticsearch.diagnostics import (
+    async_get_config_entry_diagnostics,
+)
+from tests.test_util.es_startup_mocks import mock_es_initialization
+
+
+@pytest.mark.asyncio
+async def test_rate_limiting_diagnostics(
+    hass: HomeAssistant, es_aioclient_mock: AiohttpClientMocker
+) -> None:
+    """Test the suppressed state changes of each entity are reported."""
+    es_url = "http://diagnostics:9200"
+
+    mock_es_initialization(
+        es_aioclient_mock, url=es_url, mock_template_setup=True, mock_ilm_setup=True
+    )
+
+    mock_entry = MockConfigEntry(
+        unique_id="test_rate_limiting_diagnostics",
+        domain=ELASTIC_DOMAIN,
+        version=4,
+        data=build_full_config({"url": es_url, CONF_INDEX_MODE: INDEX_MODE_LEGACY}),
+        options={
+            CONF_RATE_LIMIT_ENTITIES: {"sensor.power": 1, "sensor.energy": 1},
+            CONF_RATE_LIMIT_STRATEGY: RATE_LIMIT_STRATEGY_DROP,
+        },
+        title="ES Config",
+    )
+    mock_entry.add_to_hass(hass)
+    assert await async_setup_component(hass, ELASTIC_DOMAIN, {}) is True
+    await hass.async_block_till_done()
+
+    rate_limiter = hass.data[ELASTIC_DOMAIN].publisher.rate_limiter
+    for entity_id, changes in (("sensor.energy", 2), ("sensor.power", 4)):
+        for _ in range(changes):
+            rate_limiter.allow(State(entity_id, "1"), None, now=0)
+
+    diagnostics = await async_get_config_entry_diagnostics(hass, mock_entry)
+
+    assert diagnostics["publish_enabled"] is True
+    assert diagnostics["rate_limiting"] == {
+        "enabled": True,
+        "total_suppressed": 4,
+        "suppressed": {"sensor.power": 3, "sensor.energy": 1},
+    }
+    assert list(diagnostics["rate_limiting"]["suppressed"]) == [
+        "sensor.power",
+        "sensor.energy",
+    ]
@@ -0,0 +1,132 @@
+"""Tests for the attribute field guard."""
+
+import json
+
+import pytest
+from homeassistant.const import CONTENT_TYPE_JSON
+from pytest_homeassistant_custom_component.test_util.aiohttp import AiohttpClientMocker
+
+from custom_components.elasticsearch.config_flow import build_full_config
+from custom_components.elasticsearch.const import (
+    ATTRIBUTE_OVERFLOW_KEY,
+    ATTRIBUTE_OVERFLOW_STRATEGY_DROP,
+    CONF_ATTRIBUTE_FIELD_BUDGET,
+    CONF_ATTRIBUTE_OVERFLOW_STRATEGY,
+    CONF_INDEX_MODE,
+    INDEX_MODE_DATASTREAM,
+    INDEX_MODE_LEGACY,
+)
+from custom_components.elasticsearch.errors import ElasticException
+from custom_components.elasticsearch.es_attribute_guard import AttributeFieldGuard
+from custom_components.elasticsearch.es_gateway import ElasticsearchGateway
+from tests.test_util.es_startup_mocks import mock_es_initialization
+
+
+def test_serialize_strategy():
+    """Verify new attributes beyond the budget are serialized, while introduced ones are kept."""
+    # Two attributes of three fields each, and room for the overflow attribute
+    guard = AttributeFieldGuard({CONF_ATTRIBUTE_FIELD_BUDGET: 9})
+
+    attributes = {"a": 1, "b": "two"}
+    guard.apply("metrics-homeassistant.sensor-default", attributes)
+    assert attributes == {"a": 1, "b": "two"}
+
+    attributes = {"b": "three", "c": [1, 2], "d": True}
+    guard.apply("metrics-homeassistant.sensor-default", attributes)
+    assert attributes.keys() == {"b", ATTRIBUTE_OVERFLOW_KEY}
+    assert json.loads(attributes[ATTRIBUTE_OVERFLOW_KEY]) == {"c": [1, 2], "d": True}
+    assert guard.overflow_counts == {"metrics-homeassistant.sensor-default": 2}
+
+    # Each destination has its own budget
+    attributes = {"c": [1, 2]}
+    guard.apply("metrics-homeassistant.light-default", attributes)
+    assert attributes == {"c": [1, 2]}
+
+
+def test_drop_strategy():
+    """Verify new attributes beyond the budget are dropped."""
+    guard = AttributeFieldGuard(
+        {
+            CONF_ATTRIBUTE_FIELD_BUDGET: 3,
+            CONF_ATTRIBUTE_OVERFLOW_STRATEGY: ATTRIBUTE_OVERFLOW_STRATEGY_DROP,
+        }
+    )
+
+    attributes = {"a": 1, "b": 2}
+    guard.apply("metrics-homeassistant.sensor-default", attributes)
+    assert attributes == {"a": 1}
+    assert guard.overflow_counts == {"metrics-homeassistant.sensor-default": 1}
+
+
+def test_legacy_fields_per_attribute():
+    """Verify legacy attributes count twice, as they are mapped in hass.attributes as well."""
+    guard = AttributeFieldGuard(
+        {
+            CONF_INDEX_MODE: INDEX_MODE_LEGACY,
+            CONF_ATTRIBUTE_FIELD_BUDGET: 11,
+            CONF_ATTRIBUTE_OVERFLOW_STRATEGY: ATTRIBUTE_OVERFLOW_STRATEGY_DROP,
+        }
+    )
+
+    attributes = {"a": 1, "b": 2}
+    guard.apply("hass-events-v4_2", attributes)
+    assert attributes == {"a": 1}
+
+
+def test_disabled_budget():
+    """Verify a budget of 0 does not limit the number of attributes."""
+    guard = AttributeFieldGuard({CONF_ATTRIBUTE_FIELD_BUDGET: 0})
+
+    attributes = {f"attribute_{i}": i for i in range(2000)}
+    guard.apply("hass-events-v4_2", attributes)
+    assert len(attributes) == 2000
+    assert not guard.enabled
+
+
+def test_invalid_strategy():
+    """Verify an unknown overflow strategy is rejected."""
+    with pytest.raises(ElasticException):
+        AttributeFieldGuard({CONF_ATTRIBUTE_OVERFLOW_STRATEGY: "unknown"})
+
+
+@pytest.mark.asyncio
+async def test_load_mapped_attributes(es_aioclient_mock: AiohttpClientMocker):
+    """Verify the attributes already mapped by the backing indices count against the budget."""
+    es_url = "http://localhost:9200"
+
+    es_aioclient_mock.get(
+        f"{es_url}/metrics-homeassistant.*-default/_mapping/field/hass.entity.attributes.*",
+        status=200,
+        headers={"content-type": CONTENT_TYPE_JSON},
+        json={
+            ".ds-metrics-homeassistant.sensor-default-2024.01.01-000001": {
+                "mappings": {
+                    f"hass.entity.attributes.{key}{subfield}": {}
+                    for key in ("a", "b", ATTRIBUTE_OVERFLOW_KEY)
+                    for subfield in ("", ".keyword", ".float")
+                }
+            },
+        },
+    )
+    mock_es_initialization(es_aioclient_mock, es_url, mock_v811_cluster=True)
+
+    config = build_full_config({"url": es_url, CONF_INDEX_MODE: INDEX_MODE_DATASTREAM})
+    config[CONF_ATTRIBUTE_FIELD_BUDGET] = 9
+
+    gateway = ElasticsearchGateway(config)
+    await gateway.async_init()
+
+    guard = AttributeFieldGuard(config)
+    await guard.async_load(gateway, "metrics-homeassistant.*-default")
+
+    # The budget was used up before the restart
+    attributes = {"a": 1, "c": 3}
+    guard.apply("metrics-homeassistant.sensor-default", attributes)
+    assert attributes.keys() == {"a", ATTRIBUTE_OVERFLOW_KEY}
+
+    # Other datastreams have not mapped any attributes yet
+    attributes = {"c": 3}
+    guard.apply("metrics-homeassistant.light-default", attributes)
+    assert attributes == {"c": 3}
+
+    await gateway.async_stop_gateway()
@@ -0,0 +1,46 @@
+"""Tests for the adaptive bulk chunk sizer."""
+
+from custom_components.elasticsearch.const import (
+    CONF_BULK_CHUNK_SIZE_MAX,
+    CONF_BULK_CHUNK_SIZE_MIN,
+    CONF_BULK_TARGET_LATENCY,
+    DEFAULT_BULK_CHUNK_SIZE,
+)
+from custom_components.elasticsearch.es_chunk_sizer import AdaptiveChunkSizer
+
+
+def test_additive_increase():
+    """Verify the chunk size grows while requests are fast, up to the maximum."""
+    sizer = AdaptiveChunkSizer(
+        {CONF_BULK_CHUNK_SIZE_MAX: 700, CONF_BULK_TARGET_LATENCY: 1}
+    )
+    assert sizer.chunk_size == DEFAULT_BULK_CHUNK_SIZE
+
+    sizer.record_success(0.1, 500)
+    assert sizer.chunk_size == 600
+
+    # Slow requests and partially filled chunks hold the size steady
+    sizer.record_success(5, 600)
+    sizer.record_success(0.1, 10)
+    assert sizer.chunk_size == 600
+
+    sizer.record_success(0.1, 600)
+    sizer.record_success(0.1, 700)
+    assert sizer.chunk_size == 700
+
+
+def test_multiplicative_decrease():
+    """Verify the chunk size is halved on overload, down to the minimum."""
+    sizer = AdaptiveChunkSizer({CONF_BULK_CHUNK_SIZE_MIN: 200})
+
+    sizer.record_overload("rejected")
+    assert sizer.chunk_size == 250
+
+    sizer.record_overload("rejected")
+    assert sizer.chunk_size == 200
+
+
+def test_initial_size_within_bounds():
+    """Verify the initial chunk size respects the configured bounds."""
+    assert AdaptiveChunkSizer({CONF_BULK_CHUNK_SIZE_MAX: 100}).chunk_size == 100
+    assert AdaptiveChunkSizer({CONF_BULK_CHUNK_SIZE_MIN: 1000}).chunk_size == 1000
@@ -0,0 +1,91 @@
+"""Tests for the bulk publishing circuit breaker."""
+
+from custom_components.elasticsearch.const import (
+    CIRCUIT_STATE_CLOSED,
+    CIRCUIT_STATE_HALF_OPEN,
+    CIRCUIT_STATE_OPEN,
+    CONF_CIRCUIT_BREAKER_LATENCY,
+    CONF_CIRCUIT_BREAKER_OPEN_DURATION,
+    CONF_CIRCUIT_BREAKER_PROBE_SIZE,
+)
+from custom_components.elasticsearch.es_circuit_breaker import CircuitBreaker
+
+CONFIG = {
+    CONF_CIRCUIT_BREAKER_LATENCY: 5,
+    CONF_CIRCUIT_BREAKER_OPEN_DURATION: 60,
+    CONF_CIRCUIT_BREAKER_PROBE_SIZE: 10,
+}
+
+
+def test_trips_on_error_rate():
+    """Verify the breaker opens once enough requests fail."""
+    transitions = []
+    breaker = CircuitBreaker(
+        CONFIG, on_state_change=lambda *args: transitions.append(args[:2]), now=0
+    )
+
+    breaker.record_success(1, now=0)
+    breaker.record_failure(now=1)
+    assert breaker.state == CIRCUIT_STATE_CLOSED
+
+    breaker.record_failure(now=2)
+    assert breaker.state == CIRCUIT_STATE_OPEN
+    assert transitions == [(CIRCUIT_STATE_CLOSED, CIRCUIT_STATE_OPEN)]
+    assert not breaker.allow_request(now=30)
+
+
+def test_trips_on_latency():
+    """Verify slow requests count as failures."""
+    breaker = CircuitBreaker(CONFIG, now=0)
+
+    for i in range(3):
+        breaker.record_success(30, now=i)
+
+    assert breaker.state == CIRCUIT_STATE_OPEN
+
+
+def test_half_open_probe():
+    """Verify only a small probe is sent after the open duration, and its outcome decides the state."""
+    breaker = CircuitBreaker(CONFIG, now=0)
+    for i in range(3):
+        breaker.record_failure(now=i)
+
+    assert breaker.max_batch_size is None
+    assert not breaker.allow_request(now=61)
+    assert breaker.allow_request(now=62)
+    assert breaker.state == CIRCUIT_STATE_HALF_OPEN
+    assert breaker.max_batch_size == 10
+
+    # A failed probe opens the breaker again
+    breaker.record_failure(now=63)
+    assert breaker.state == CIRCUIT_STATE_OPEN
+    assert not breaker.allow_request(now=100)
+
+    assert breaker.allow_request(now=123)
+    breaker.record_success(1, now=124)
+    assert breaker.state == CIRCUIT_STATE_CLOSED
+    assert breaker.max_batch_size is None
+
+    # History from before the breaker closed is forgotten
+    breaker.record_failure(now=125)
+    assert breaker.state == CIRCUIT_STATE_CLOSED
+
+
+def test_state_change_reasons():
+    """Verify the reason of each transition describes the request which caused it."""
+    transitions = []
+    breaker = CircuitBreaker(
+        CONFIG, on_state_change=lambda *args: transitions.append(args), now=0
+    )
+
+    breaker.record_success(1, now=0)
+    breaker.record_success(30, now=1)
+    breaker.record_failure(now=2)
+    assert breaker.allow_request(now=70)
+    breaker.record_success(2, now=71)
+
+    assert [reason for _, _, reason in transitions] == [
+        "2 of the last 3 requests failed or were too slow",
+        "open duration elapsed",
+        "probe succeeded: request took 2.0s",
+    ]
@@ -18,6 +18,7 @@ from pytest_homeassistant_custom_component.common import MockConfigEntry
 from custom_components.elasticsearch.config_flow import build_full_config
 from custom_components.elasticsearch.const import (
     CONF_INDEX_MODE,
+    CONF_SERVER_SIDE_ENRICHMENT,
     DOMAIN,
     INDEX_MODE_LEGACY,
 )
@@ -378,6 +379,29 @@ async def test_state_to_attributes(
     assert diff(attributes, expected) == {}
 
 
+@pytest.mark.asyncio
+async def test_state_to_attributes_unserialized(
+    hass: HomeAssistant, document_creator: DocumentCreator
+):
+    """Test objects are kept as-is when they do not have to be serialized, e.g. for flattened fields."""
+
+    testAttributes = {
+        "dict": {"string": "abc123", "int": 123},
+        "list_of_dicts": [{"int": 1}, {"int": 2}],
+        "set": {5, 5},
+    }
+
+    state = await create_and_return_state(hass, value="2", attributes=testAttributes)
+
+    attributes = document_creator._state_to_attributes(state, serialize_objects=False)
+
+    assert attributes == {
+        "dict": {"string": "abc123", "int": 123},
+        "list_of_dicts": [{"int": 1}, {"int": 2}],
+        "set": [5],
+    }
+
+
 @pytest.mark.asyncio
 async def test_state_to_value_v1(
     hass: HomeAssistant, document_creator: DocumentCreator
@@ -421,6 +445,13 @@ async def test_state_to_value_v2(
         "valueas": {"float": 2.0},
     }
 
+    assert document_creator._state_to_value_v2(
+        State("sensor.test_1", "2.0", {"state_class": "total_increasing"})
+    ) == {
+        "value": "2.0",
+        "valueas": {"float": 2.0, "counter": 2.0},
+    }
+
     assert document_creator._state_to_value_v2(State("sensor.test_1", "off")) == {
         "value": "off",
         "valueas": {"boolean": False},
@@ -797,6 +828,37 @@ async def test_v2_doc_creation_geolocation(
     assert diff(document, expected) == {}
 
 
+@pytest.mark.asyncio
+async def test_v2_doc_creation_server_side_enrichment(hass: HomeAssistant):
+    """Test v2 documents leave entity details and static properties to the ingest pipeline."""
+
+    creator = DocumentCreator(hass, {CONF_SERVER_SIDE_ENRICHMENT: True})
+    await creator.async_init()
+
+    document = await create_and_return_document(
+        hass,
+        value="2",
+        attributes={},
+        document_creator=creator,
+        version=2,
+    )
+
+    expected = {
+        "@timestamp": dt_util.parse_datetime(MOCK_NOON_APRIL_12TH_2023),
+        "hass.entity": {
+            "attributes": {},
+            "domain": "sensor",
+            "id": "sensor.test_1",
+            "value": "2",
+            "valueas": {"float": 2.0},
+        },
+        "hass.object_id": "test_1",
+    }
+
+    assert diff(document, expected) == {}
+    assert creator.static_doc_properties["agent.name"] == "My Home Assistant"
+
+
 @pytest.mark.asyncio
 async def test_v2_doc_creation_geolocation_from_attributes(
     hass: HomeAssistant, document_creator: DocumentCreator
@@ -1,8 +1,10 @@
 """Tests for the DocumentPublisher class."""
 
+import logging
 from datetime import datetime
 from unittest import mock
 
+import aiohttp
 import pytest
 from freezegun.api import FrozenDateTimeFactory
 from homeassistant.components import (
@@ -19,20 +21,42 @@ from jsondiff import diff
 from pytest_homeassistant_custom_component.common import MockConfigEntry
 from pytest_homeassistant_custom_component.test_util.aiohttp import AiohttpClientMocker
 
+from custom_components.elasticsearch import es_doc_publisher
 from custom_components.elasticsearch.config_flow import build_full_config
 from custom_components.elasticsearch.const import (
+    CIRCUIT_STATE_CLOSED,
+    CIRCUIT_STATE_HALF_OPEN,
+    CIRCUIT_STATE_OPEN,
+    CONF_ADDITIONAL_CLUSTERS,
+    CONF_BULK_CHUNK_SIZE_MAX,
+    CONF_BULK_CHUNK_SIZE_MIN,
+    CONF_BULK_MAX_BYTES,
+    CONF_CIRCUIT_BREAKER_PROBE_SIZE,
     CONF_EXCLUDED_DOMAINS,
     CONF_EXCLUDED_ENTITIES,
     CONF_INCLUDED_DOMAINS,
     CONF_INCLUDED_ENTITIES,
     CONF_INDEX_MODE,
+    CONF_NUMERIC_DATASTREAM,
+    CONF_PUBLISH_FREQUENCY,
     CONF_PUBLISH_MODE,
+    CONF_RATE_LIMIT_PER_ENTITY,
+    CONF_RATE_LIMIT_STRATEGY,
+    CONF_ROLLUP_ENTITIES,
+    CONF_ROLLUP_PASSTHROUGH_ENTITIES,
+    CONF_SERVER_SIDE_ENRICHMENT,
+    CONF_SNAPSHOT_SHARDS,
+    CONF_TRACE_ENTITIES,
     DOMAIN,
+    ENRICHMENT_PIPELINE_NAME,
+    EVENT_CIRCUIT_BREAKER_STATE_CHANGED,
     INDEX_MODE_DATASTREAM,
     INDEX_MODE_LEGACY,
     PUBLISH_MODE_ALL,
     PUBLISH_MODE_ANY_CHANGES,
     PUBLISH_MODE_STATE_CHANGES,
+    RATE_LIMIT_STRATEGY_DROP,
+    RATE_LIMIT_STRATEGY_LATEST,
 )
 from custom_components.elasticsearch.errors import ElasticException
 from custom_components.elasticsearch.es_doc_publisher import DocumentPublisher
@@ -42,7 +66,10 @@ from custom_components.elasticsearch.es_serializer import get_serializer
 from tests.conftest import mock_config_entry
 from tests.const import MOCK_LOCATION_SERVER
 from tests.test_util.aioclient_mock_utils import extract_es_bulk_requests
-from tests.test_util.es_startup_mocks import mock_es_initialization
+from tests.test_util.es_startup_mocks import (
+    mock_es_enrichment_setup,
+    mock_es_initialization,
+)
 
 
 @pytest.fixture(autouse=True)
@@ -1059,6 +1086,377 @@ async def test_publish_modes(
     await gateway.async_stop_gateway()
 
 
+@pytest.mark.asyncio
+async def test_publish_all_eligible_entity_index(
+    hass: HomeAssistant, es_aioclient_mock: AiohttpClientMocker
+):
+    """Test the eligible entity index follows entity additions and removals."""
+
+    counter_config = {counter.DOMAIN: {"test_1": {}, "test_2": {}}}
+    assert await async_setup_component(hass, counter.DOMAIN, counter_config)
+    await hass.async_block_till_done()
+
+    es_url = "http://localhost:9200"
+
+    mock_es_initialization(es_aioclient_mock, es_url)
+
+    config = build_full_config(
+        {
+            "url": es_url,
+            CONF_PUBLISH_MODE: PUBLISH_MODE_ALL,
+            CONF_INDEX_MODE: INDEX_MODE_LEGACY,
+            CONF_EXCLUDED_ENTITIES: ["counter.test_2", "counter.excluded"],
+        }
+    )
+
+    mock_entry = MockConfigEntry(
+        unique_id="test_publish_all_eligible_entity_index",
+        domain=DOMAIN,
+        version=3,
+        data=config,
+        title="ES Config",
+    )
+
+    entry = await _setup_config_entry(hass, mock_entry)
+
+    gateway = ElasticsearchGateway(config)
+    index_manager = IndexManager(hass, config, gateway)
+    publisher = DocumentPublisher(
+        config, gateway, index_manager, hass, config_entry=entry
+    )
+
+    await gateway.async_init()
+    await publisher.async_init()
+
+    assert list(publisher._eligible_entities) == ["counter.test_1"]
+
+    hass.states.async_set("counter.added", "5")
+    hass.states.async_set("counter.excluded", "5")
+    await hass.async_block_till_done()
+
+    assert list(publisher._eligible_entities) == ["counter.test_1", "counter.added"]
+    assert publisher.queue_size() == 1
+
+    hass.states.async_remove("counter.added")
+    await hass.async_block_till_done()
+
+    assert list(publisher._eligible_entities) == ["counter.test_1"]
+
+    # Snapshots must not rescan the state machine
+    with mock.patch(
+        "homeassistant.core.StateMachine.async_all",
+        side_effect=AssertionError("full rescan"),
+    ):
+        await publisher.async_do_publish()
+
+    bulk_requests = extract_es_bulk_requests(es_aioclient_mock)
+    assert len(bulk_requests) == 1
+
+    # The queued state change for the removed entity, followed by the snapshot
+    published_entities = [doc["hass.entity_id"] for doc in bulk_requests[0].data[1::2]]
+    assert published_entities == ["counter.added", "counter.test_1"]
+
+    publisher.set_entity_filters({CONF_EXCLUDED_ENTITIES: ["counter.test_1"]})
+    assert list(publisher._eligible_entities) == ["counter.test_2", "counter.excluded"]
+
+    await gateway.async_stop_gateway()
+
+
+@pytest.mark.asyncio
+async def test_publish_all_staggered_snapshots(
+    hass: HomeAssistant, es_aioclient_mock: AiohttpClientMocker
+):
+    """Test snapshots are spread across shards, covering each entity once per interval."""
+
+    entity_ids = [f"counter.test_{i}" for i in range(1, 7)]
+    counter_config = {counter.DOMAIN: {f"test_{i}": {} for i in range(1, 7)}}
+    assert await async_setup_component(hass, counter.DOMAIN, counter_config)
+    await hass.async_block_till_done()
+
+    es_url = "http://localhost:9200"
+
+    mock_es_initialization(es_aioclient_mock, es_url)
+
+    config = build_full_config(
+        {
+            "url": es_url,
+            CONF_PUBLISH_MODE: PUBLISH_MODE_ALL,
+            CONF_INDEX_MODE: INDEX_MODE_LEGACY,
+        }
+    )
+    config[CONF_SNAPSHOT_SHARDS] = 2
+
+    mock_entry = MockConfigEntry(
+        unique_id="test_publish_all_staggered_snapshots",
+        domain=DOMAIN,
+        version=3,
+        data=config,
+        title="ES Config",
+    )
+
+    entry = await _setup_config_entry(hass, mock_entry)
+
+    gateway = ElasticsearchGateway(config)
+    index_manager = IndexManager(hass, config, gateway)
+    publisher = DocumentPublisher(
+        config, gateway, index_manager, hass, config_entry=entry
+    )
+
+    await gateway.async_init()
+    await publisher.async_init()
+
+    assert publisher._publish_interval == config[CONF_PUBLISH_FREQUENCY] / 2
+    assert publisher._has_entries_to_publish()
+
+    shards = publisher._snapshot_shard_members
+    assert sorted([*shards[0], *shards[1]]) == entity_ids
+    assert not set(shards[0]) & set(shards[1])
+
+    def published_entities(request):
+        return [doc["hass.entity_id"] for doc in request.data[1::2]]
+
+    # counter.test_1 (shard 0) and counter.test_4 (shard 1) change before their slot
+    assert "counter.test_1" in shards[0]
+    assert "counter.test_4" in shards[1]
+    hass.states.async_set("counter.test_1", "1")
+    hass.states.async_set("counter.test_4", "1")
+    await hass.async_block_till_done()
+
+    await publisher.async_do_publish()
+    await publisher.async_do_publish()
+
+    bulk_requests = extract_es_bulk_requests(es_aioclient_mock)
+    assert len(bulk_requests) == 2
+
+    first_slot = published_entities(bulk_requests[0])
+    second_slot = published_entities(bulk_requests[1])
+
+    assert first_slot == [
+        "counter.test_1",
+        "counter.test_4",
+        *[e for e in shards[0] if e != "counter.test_1"],
+    ]
+    assert second_slot == [e for e in shards[1] if e != "counter.test_4"]
+
+    # Next interval: every entity is snapshotted again, in its own slot.
+    await publisher.async_do_publish()
+    await publisher.async_do_publish()
+
+    bulk_requests = extract_es_bulk_requests(es_aioclient_mock)
+    assert published_entities(bulk_requests[2]) == list(shards[0])
+    assert published_entities(bulk_requests[3]) == list(shards[1])
+
+    await gateway.async_stop_gateway()
+
+
+@pytest.mark.asyncio
+async def test_publish_slots_are_fixed(hass: HomeAssistant):
+    """Test publish slots stay fixed relative to the start, regardless of how long publishing takes."""
+
+    config = build_full_config(
+        {
+            "url": "http://localhost:9200",
+            CONF_PUBLISH_MODE: PUBLISH_MODE_ALL,
+            CONF_INDEX_MODE: INDEX_MODE_LEGACY,
+        }
+    )
+    config[CONF_SNAPSHOT_SHARDS] = 2
+
+    gateway = ElasticsearchGateway(config)
+    publisher = DocumentPublisher(
+        config, gateway, IndexManager(hass, config, gateway), hass, config_entry=None
+    )
+    interval = publisher._publish_interval
+    start = 1000.0
+    clock = [start]
+    publish_times = []
+
+    async def fake_sleep(delay):
+        clock[0] += delay
+
+    async def fake_publish():
+        publish_times.append(clock[0])
+        # The second publish takes more than two slots, which are skipped.
+        clock[0] += 2.5 * interval if len(publish_times) == 2 else 0.4 * interval
+        if len(publish_times) == 5:
+            publisher.publish_active = False
+
+    publisher.publish_active = True
+    with mock.patch.object(
+        es_doc_publisher, "time", mock.Mock(monotonic=lambda: clock[0])
+    ), mock.patch.object(
+        es_doc_publisher, "asyncio", mock.Mock(sleep=fake_sleep)
+    ), mock.patch.object(
+        publisher, "_has_available_sink", return_value=True
+    ), mock.patch.object(publisher, "async_do_publish", side_effect=fake_publish):
+        await publisher._publish_queue_timer()
+
+    assert [(time - start) / interval for time in publish_times] == [1, 2, 5, 6, 7]
+
+    publisher.stop_publisher()
+
+
+@pytest.mark.asyncio
+async def test_prepare_runs_once(hass: HomeAssistant):
+    """Test the publisher is prepared once, when the integration prepares it before async_init."""
+
+    config = build_full_config(
+        {"url": "http://localhost:9200", CONF_INDEX_MODE: INDEX_MODE_LEGACY}
+    )
+    gateway = ElasticsearchGateway(config)
+    publisher = DocumentPublisher(
+        config, gateway, IndexManager(hass, config, gateway), hass, config_entry=None
+    )
+
+    with mock.patch.object(
+        publisher._document_creator, "async_init"
+    ) as document_creator_init:
+        await publisher.async_prepare()
+        await publisher.async_prepare()
+
+    document_creator_init.assert_awaited_once()
+
+    publisher.stop_publisher()
+
+
+@pytest.mark.asyncio
+async def test_event_tracing(
+    hass: HomeAssistant,
+    es_aioclient_mock: AiohttpClientMocker,
+    caplog: pytest.LogCaptureFixture,
+):
+    """Test per-event debug logging is limited to traced entities."""
+
+    counter_config = {counter.DOMAIN: {"test_1": {}, "test_2": {}}}
+    assert await async_setup_component(hass, counter.DOMAIN, counter_config)
+    await hass.async_block_till_done()
+
+    es_url = "http://localhost:9200"
+
+    mock_es_initialization(es_aioclient_mock, es_url)
+
+    config = build_full_config(
+        {
+            "url": es_url,
+            CONF_INDEX_MODE: INDEX_MODE_LEGACY,
+            CONF_INCLUDED_DOMAINS: [counter.DOMAIN],
+        }
+    )
+    config[CONF_TRACE_ENTITIES] = ["counter.test_2"]
+
+    mock_entry = MockConfigEntry(
+        unique_id="test_event_tracing",
+        domain=DOMAIN,
+        version=3,
+        data=config,
+        title="ES Config",
+    )
+
+    entry = await _setup_config_entry(hass, mock_entry)
+
+    caplog.set_level(logging.DEBUG, logger="custom_components.elasticsearch")
+
+    gateway = ElasticsearchGateway(config)
+    index_manager = IndexManager(hass, config, gateway)
+    publisher = DocumentPublisher(
+        config, gateway, index_manager, hass, config_entry=entry
+    )
+
+    await gateway.async_init()
+    await publisher.async_init()
+
+    hass.states.async_set("counter.test_1", "1")
+    hass.states.async_set("counter.test_2", "1")
+    await hass.async_block_till_done()
+
+    assert publisher.queue_size() == 2
+    assert "Including counter.test_2" in caplog.text
+    assert "Including counter.test_1" not in caplog.text
+
+    await gateway.async_stop_gateway()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "strategy", [RATE_LIMIT_STRATEGY_DROP, RATE_LIMIT_STRATEGY_LATEST]
+)
+async def test_rate_limited_publishing(
+    hass: HomeAssistant, es_aioclient_mock: AiohttpClientMocker, strategy
+):
+    """Test chatty entities are rate limited."""
+
+    counter_config = {counter.DOMAIN: {"test_1": {}}}
+    assert await async_setup_component(hass, counter.DOMAIN, counter_config)
+    await hass.async_block_till_done()
+
+    es_url = "http://localhost:9200"
+
+    mock_es_initialization(es_aioclient_mock, es_url)
+
+    config = build_full_config(
+        {
+            "url": es_url,
+            CONF_PUBLISH_MODE: PUBLISH_MODE_ANY_CHANGES,
+            CONF_INDEX_MODE: INDEX_MODE_LEGACY,
+        }
+    )
+    config[CONF_RATE_LIMIT_PER_ENTITY] = 1
+    config[CONF_RATE_LIMIT_STRATEGY] = strategy
+
+    mock_entry = MockConfigEntry(
+        unique_id="test_rate_limited_publishing",
+        domain=DOMAIN,
+        version=3,
+        data=config,
+        title="ES Config",
+    )
+
+    entry = await _setup_config_entry(hass, mock_entry)
+
+    gateway = ElasticsearchGateway(config)
+    index_manager = IndexManager(hass, config, gateway)
+    publisher = DocumentPublisher(
+        config, gateway, index_manager, hass, config_entry=entry
+    )
+
+    await gateway.async_init()
+    await publisher.async_init()
+
+    hass.states.async_set("counter.test_1", "1")
+    hass.states.async_set("counter.test_1", "2")
+    hass.states.async_set("counter.test_1", "3")
+    await hass.async_block_till_done()
+
+    assert publisher.queue_size() == 1
+    assert publisher.rate_limiter.has_pending() == (
+        strategy == RATE_LIMIT_STRATEGY_LATEST
+    )
+
+    await publisher.async_do_publish()
+
+    bulk_requests = extract_es_bulk_requests(es_aioclient_mock)
+    assert len(bulk_requests) == 1
+
+    events = [
+        {
+            "domain": "counter",
+            "object_id": "test_1",
+            "value": 1.0,
+            "platform": "counter",
+            "attributes": {},
+        }
+    ]
+
+    assert diff(bulk_requests[0].data, _build_expected_payload(events)) == {}
+
+    if strategy == RATE_LIMIT_STRATEGY_DROP:
+        assert publisher.rate_limiter.suppressed_counts == {"counter.test_1": 2}
+    else:
+        assert publisher.rate_limiter.suppressed_counts == {"counter.test_1": 1}
+
+    await gateway.async_stop_gateway()
+
+
 def _build_expected_payload(
     events: list,
     include_entity_details=False,
@@ -1130,3 +1528,689 @@ def _build_expected_payload(
             payload.append(entry)
 
     return payload
+
+
+@pytest.mark.asyncio
+async def test_connection_error_and_recovery(
+    hass: HomeAssistant, es_aioclient_mock: AiohttpClientMocker
+):
+    """Test bulk connection errors pause publishing, and recovery triggers an immediate publish."""
+
+    es_url = "http://localhost:9200"
+
+    es_aioclient_mock.post(es_url + "/_bulk", exc=aiohttp.ClientConnectionError())
+    mock_es_initialization(es_aioclient_mock, es_url)
+
+    config = build_full_config({"url": es_url, CONF_INDEX_MODE: INDEX_MODE_LEGACY})
+
+    mock_entry = MockConfigEntry(
+        unique_id="test_connection_error_and_recovery",
+        domain=DOMAIN,
+        version=3,
+        data=config,
+        title="ES Config",
+    )
+
+    entry = await _setup_config_entry(hass, mock_entry)
+
+    gateway = ElasticsearchGateway(config)
+    index_manager = IndexManager(hass, config, gateway)
+    publisher = DocumentPublisher(
+        config, gateway, index_manager, hass, config_entry=entry
+    )
+
+    await gateway.async_init()
+    await publisher.async_init()
+
+    hass.states.async_set("counter.test_1", "2")
+    await hass.async_block_till_done()
+
+    await publisher.async_do_publish()
+
+    assert gateway.active_connection_error
+    assert not publisher._publish_now
+
+    # The next connection test succeeds
+    await gateway._async_probe_connection()
+
+    assert not gateway.active_connection_error
+    assert publisher._publish_now
+
+    publisher.stop_publisher()
+    await gateway.async_stop_gateway()
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker(
+    hass: HomeAssistant, es_aioclient_mock: AiohttpClientMocker
+):
+    """Test publishing stops while the circuit breaker is open, and only probes while half-open."""
+
+    es_url = "http://localhost:9200"
+
+    es_aioclient_mock.post(es_url + "/_bulk", status=429, json={"error": "rejected"})
+    mock_es_initialization(es_aioclient_mock, es_url)
+
+    config = build_full_config({"url": es_url, CONF_INDEX_MODE: INDEX_MODE_LEGACY})
+    config[CONF_CIRCUIT_BREAKER_PROBE_SIZE] = 2
+
+    mock_entry = MockConfigEntry(
+        unique_id="test_circuit_breaker",
+        domain=DOMAIN,
+        version=3,
+        data=config,
+        title="ES Config",
+    )
+
+    entry = await _setup_config_entry(hass, mock_entry)
+
+    gateway = ElasticsearchGateway(config)
+    index_manager = IndexManager(hass, config, gateway)
+    publisher = DocumentPublisher(
+        config, gateway, index_manager, hass, config_entry=entry
+    )
+
+    await gateway.async_init()
+    await publisher.async_init()
+
+    events = []
+    hass.bus.async_listen(
+        EVENT_CIRCUIT_BREAKER_STATE_CHANGED, lambda event: events.append(event.data)
+    )
+
+    for i in range(3):
+        hass.states.async_set("counter.test_1", str(i))
+        await hass.async_block_till_done()
+        await publisher.async_do_publish()
+
+    await hass.async_block_till_done()
+    assert publisher.circuit_breaker.state == CIRCUIT_STATE_OPEN
+    assert [event["state"] for event in events] == [CIRCUIT_STATE_OPEN]
+    assert len(extract_es_bulk_requests(es_aioclient_mock)) == 3
+    # Rejected documents are kept for the next attempt
+    assert publisher.primary_sink.queue_size() == 3
+
+    # Nothing is sent while the breaker is open
+    for i in range(5):
+        hass.states.async_set("counter.test_1", str(10 + i))
+    await hass.async_block_till_done()
+    await publisher.async_do_publish()
+    assert len(extract_es_bulk_requests(es_aioclient_mock)) == 3
+    assert publisher.queue_size() == 0
+    assert publisher.primary_sink.queue_size() == 8
+
+    # Once the open duration has elapsed, a probe of at most 2 documents is sent
+    es_aioclient_mock.clear_requests()
+    mock_es_initialization(es_aioclient_mock, es_url)
+    publisher.circuit_breaker._opened_at -= 3600
+
+    await publisher.async_do_publish()
+    await hass.async_block_till_done()
+
+    bulk_requests = extract_es_bulk_requests(es_aioclient_mock)
+    assert len(bulk_requests) == 1
+    assert len(bulk_requests[0].data) == 2 * 2
+    assert publisher.primary_sink.queue_size() == 6
+    assert [event["state"] for event in events] == [
+        CIRCUIT_STATE_OPEN,
+        CIRCUIT_STATE_HALF_OPEN,
+        CIRCUIT_STATE_CLOSED,
+    ]
+
+    # The backlog is sent on the next publish
+    es_aioclient_mock.clear_requests()
+    mock_es_initialization(es_aioclient_mock, es_url)
+    await publisher.async_do_publish()
+    assert len(extract_es_bulk_requests(es_aioclient_mock)) == 1
+    assert publisher.primary_sink.queue_size() == 0
+
+    publisher.stop_publisher()
+    await gateway.async_stop_gateway()
+
+
+@pytest.mark.asyncio
+async def test_adaptive_bulk_chunking(
+    hass: HomeAssistant, es_aioclient_mock: AiohttpClientMocker
+):
+    """Test documents are sent in chunks, which shrink when the cluster rejects requests."""
+
+    es_url = "http://localhost:9200"
+
+    mock_es_initialization(es_aioclient_mock, es_url)
+
+    config = build_full_config({"url": es_url, CONF_INDEX_MODE: INDEX_MODE_LEGACY})
+    config[CONF_BULK_CHUNK_SIZE_MIN] = 1
+    config[CONF_BULK_CHUNK_SIZE_MAX] = 2
+
+    mock_entry = MockConfigEntry(
+        unique_id="test_adaptive_bulk_chunking",
+        domain=DOMAIN,
+        version=3,
+        data=config,
+        title="ES Config",
+    )
+
+    entry = await _setup_config_entry(hass, mock_entry)
+
+    gateway = ElasticsearchGateway(config)
+    index_manager = IndexManager(hass, config, gateway)
+    publisher = DocumentPublisher(
+        config, gateway, index_manager, hass, config_entry=entry
+    )
+
+    await gateway.async_init()
+    await publisher.async_init()
+
+    def chunk_lengths():
+        return [
+            len(request.data) // 2
+            for request in extract_es_bulk_requests(es_aioclient_mock)
+        ]
+
+    for i in range(5):
+        hass.states.async_set("counter.test_1", str(i))
+    await hass.async_block_till_done()
+    await publisher.async_do_publish()
+
+    assert chunk_lengths() == [2, 2, 1]
+    assert publisher.chunk_sizer.chunk_size == 2
+
+    es_aioclient_mock.clear_requests()
+    es_aioclient_mock.post(es_url + "/_bulk", status=429, json={"error": "rejected"})
+
+    for i in range(3):
+        hass.states.async_set("counter.test_1", str(10 + i))
+    await hass.async_block_till_done()
+    await publisher.async_do_publish()
+
+    # The rejected request is retried on the next publish, in smaller chunks
+    assert chunk_lengths() == [2]
+    assert publisher.chunk_sizer.chunk_size == 1
+    assert publisher.primary_sink.queue_size() == 3
+
+    publisher.stop_publisher()
+    await gateway.async_stop_gateway()
+
+
+@pytest.mark.asyncio
+async def test_byte_bounded_bulk_requests(
+    hass: HomeAssistant, es_aioclient_mock: AiohttpClientMocker
+):
+    """Test bulk requests respect the maximum body size, and oversized documents are skipped."""
+
+    es_url = "http://localhost:9200"
+
+    mock_es_initialization(es_aioclient_mock, es_url)
+
+    config = build_full_config({"url": es_url, CONF_INDEX_MODE: INDEX_MODE_LEGACY})
+    config[CONF_BULK_MAX_BYTES] = 3000
+
+    mock_entry = MockConfigEntry(
+        unique_id="test_byte_bounded_bulk_requests",
+        domain=DOMAIN,
+        version=3,
+        data=config,
+        title="ES Config",
+    )
+
+    entry = await _setup_config_entry(hass, mock_entry)
+
+    gateway = ElasticsearchGateway(config)
+    index_manager = IndexManager(hass, config, gateway)
+    publisher = DocumentPublisher(
+        config, gateway, index_manager, hass, config_entry=entry
+    )
+
+    await gateway.async_init()
+    await publisher.async_init()
+
+    hass.states.async_set("counter.test_1", "1")
+    hass.states.async_set("sensor.forecast", "sunny", {"forecast": "x" * 5000})
+    for i in range(4):
+        hass.states.async_set("counter.test_2", str(i))
+    await hass.async_block_till_done()
+
+    await publisher.async_do_publish()
+
+    bulk_requests = extract_es_bulk_requests(es_aioclient_mock)
+    published = [
+        doc["hass.entity_id"] for request in bulk_requests for doc in request.data[1::2]
+    ]
+    assert published == ["counter.test_1"] + ["counter.test_2"] * 4
+    assert len(bulk_requests) > 1
+    assert publisher.oversized_documents == 1
+
+    for request in bulk_requests:
+        size = sum(
+            len(get_serializer().dumps(line).encode("utf-8")) + 1
+            for line in request.data
+        )
+        assert size <= 3000
+
+    publisher.stop_publisher()
+    await gateway.async_stop_gateway()
+
+
+@pytest.mark.asyncio
+async def test_publish_to_additional_clusters(
+    hass: HomeAssistant, es_aioclient_mock: AiohttpClientMocker
+):
+    """Test documents are built once and sent to every cluster, without an unavailable cluster holding back the others."""
+
+    es_url = "http://localhost:9200"
+    backup_url = "http://backup:9200"
+
+    es_aioclient_mock.post(backup_url + "/_bulk", exc=aiohttp.ClientConnectionError())
+    mock_es_initialization(es_aioclient_mock, es_url)
+    mock_es_initialization(es_aioclient_mock, backup_url)
+
+    config = build_full_config({"url": es_url, CONF_INDEX_MODE: INDEX_MODE_LEGACY})
+    config[CONF_ADDITIONAL_CLUSTERS] = [{"url": backup_url}]
+
+    mock_entry = MockConfigEntry(
+        unique_id="test_publish_to_additional_clusters",
+        domain=DOMAIN,
+        version=3,
+        data=config,
+        title="ES Config",
+    )
+
+    entry = await _setup_config_entry(hass, mock_entry)
+
+    gateway = ElasticsearchGateway(config)
+    index_manager = IndexManager(hass, config, gateway)
+    publisher = DocumentPublisher(
+        config, gateway, index_manager, hass, config_entry=entry
+    )
+
+    await gateway.async_init()
+    await publisher.async_init()
+
+    [primary, backup] = publisher.sinks
+    assert backup.name == backup_url
+
+    es_aioclient_mock.clear_requests()
+    es_aioclient_mock.post(backup_url + "/_bulk", exc=aiohttp.ClientConnectionError())
+    mock_es_initialization(es_aioclient_mock, es_url)
+
+    with mock.patch.object(
+        publisher._document_creator,
+        "state_to_document",
+        wraps=publisher._document_creator.state_to_document,
+    ) as state_to_document:
+        hass.states.async_set("counter.test_1", "2")
+        await hass.async_block_till_done()
+        await publisher.async_do_publish()
+        await backup.flush_task
+
+    # The document is built once, and sent to both clusters
+    assert state_to_document.call_count == 1
+    bulk_requests = extract_es_bulk_requests(es_aioclient_mock)
+    assert {request.url.host for request in bulk_requests} == {"backup", "localhost"}
+
+    # The unavailable cluster keeps its documents, the primary cluster is unaffected
+    assert primary.queue_size() == 0
+    assert backup.queue_size() == 1
+    assert backup.gateway.active_connection_error
+    assert not gateway.active_connection_error
+    assert publisher._has_available_sink()
+
+    publisher.stop_publisher()
+    await publisher.async_stop_sinks()
+    await gateway.async_stop_gateway()
+
+
+@pytest.mark.asyncio
+async def test_publish_with_server_side_enrichment(
+    hass: HomeAssistant, es_aioclient_mock: AiohttpClientMocker
+):
+    """Test lean documents are sent through the enrichment pipeline."""
+
+    counter_config = {counter.DOMAIN: {"test_1": {}}}
+    assert await async_setup_component(hass, counter.DOMAIN, counter_config)
+    await hass.async_block_till_done()
+
+    es_url = "http://localhost:9200"
+
+    mock_es_initialization(es_aioclient_mock, es_url)
+    mock_es_enrichment_setup(es_aioclient_mock, es_url)
+
+    config = build_full_config({"url": es_url, CONF_INDEX_MODE: INDEX_MODE_DATASTREAM})
+    config[CONF_SERVER_SIDE_ENRICHMENT] = True
+
+    mock_entry = MockConfigEntry(
+        unique_id="test_publish_with_server_side_enrichment",
+        domain=DOMAIN,
+        version=3,
+        data=config,
+        title="ES Config",
+    )
+
+    entry = await _setup_config_entry(hass, mock_entry)
+
+    gateway = ElasticsearchGateway(config)
+    index_manager = IndexManager(hass, config, gateway)
+    publisher = DocumentPublisher(
+        config, gateway, index_manager, hass, config_entry=entry
+    )
+
+    await gateway.async_init()
+    await publisher.async_init()
+
+    es_aioclient_mock.clear_requests()
+    mock_es_initialization(es_aioclient_mock, es_url)
+
+    hass.states.async_set("counter.test_1", "2")
+    await hass.async_block_till_done()
+    await publisher.async_do_publish()
+
+    [bulk_request] = extract_es_bulk_requests(es_aioclient_mock)
+    [header, document] = bulk_request.data
+    assert header["create"]["pipeline"] == ENRICHMENT_PIPELINE_NAME
+    assert "platform" not in document["hass.entity"]
+    assert "agent.name" not in document
+
+    publisher.stop_publisher()
+    await gateway.async_stop_gateway()
+
+
+@pytest.mark.asyncio
+async def test_datastreams_created_on_init(
+    hass: HomeAssistant, es_aioclient_mock: AiohttpClientMocker
+):
+    """Test the datastreams of the domains which will be published are created during init."""
+
+    hass.states.async_set("counter.test_1", "1")
+    hass.states.async_set("input_boolean.test_1", "on")
+    hass.states.async_set("sensor.test_1", "2")
+    await hass.async_block_till_done()
+
+    es_url = "http://localhost:9200"
+
+    mock_es_initialization(es_aioclient_mock, es_url)
+
+    config = build_full_config(
+        {
+            "url": es_url,
+            CONF_INDEX_MODE: INDEX_MODE_DATASTREAM,
+            CONF_EXCLUDED_DOMAINS: [counter.DOMAIN],
+        }
+    )
+
+    mock_entry = MockConfigEntry(
+        unique_id="test_datastreams_created_on_init",
+        domain=DOMAIN,
+        version=3,
+        data=config,
+        title="ES Config",
+    )
+
+    entry = await _setup_config_entry(hass, mock_entry)
+
+    gateway = ElasticsearchGateway(config)
+    index_manager = IndexManager(hass, config, gateway)
+    publisher = DocumentPublisher(
+        config, gateway, index_manager, hass, config_entry=entry
+    )
+
+    await gateway.async_init()
+    await publisher.async_init()
+
+    created = {
+        call[1].path
+        for call in es_aioclient_mock.mock_calls
+        if call[0] == "PUT" and call[1].path.startswith("/_data_stream/")
+    }
+    assert created == {
+        "/_data_stream/metrics-homeassistant.input_boolean-default",
+        "/_data_stream/metrics-homeassistant.sensor-default",
+    }
+    assert index_manager.existing_datastreams == {
+        "metrics-homeassistant.input_boolean-default",
+        "metrics-homeassistant.sensor-default",
+    }
+
+    publisher.stop_publisher()
+    await gateway.async_stop_gateway()
+
+
+@pytest.mark.asyncio
+async def test_numeric_datastream_publishing(
+    hass: HomeAssistant, es_aioclient_mock: AiohttpClientMocker
+):
+    """Test numeric states are published as lean documents to the numeric datastreams."""
+
+    es_url = "http://localhost:9200"
+
+    mock_es_initialization(es_aioclient_mock, es_url)
+
+    config = build_full_config({"url": es_url, CONF_INDEX_MODE: INDEX_MODE_DATASTREAM})
+    config[CONF_NUMERIC_DATASTREAM] = True
+
+    mock_entry = MockConfigEntry(
+        unique_id="test_numeric_datastream_publishing",
+        domain=DOMAIN,
+        version=3,
+        data=config,
+        title="ES Config",
+    )
+
+    entry = await _setup_config_entry(hass, mock_entry)
+
+    gateway = ElasticsearchGateway(config)
+    index_manager = IndexManager(hass, config, gateway)
+    publisher = DocumentPublisher(
+        config, gateway, index_manager, hass, config_entry=entry
+    )
+
+    await gateway.async_init()
+    await publisher.async_init()
+
+    es_aioclient_mock.clear_requests()
+    mock_es_initialization(es_aioclient_mock, es_url)
+
+    hass.states.async_set(
+        "sensor.temperature",
+        "21.5",
+        {"unit_of_measurement": "°C", "friendly_name": "Temperature"},
+    )
+    hass.states.async_set("sensor.status", "idle")
+    await hass.async_block_till_done()
+    await publisher.async_do_publish()
+
+    [bulk_request] = extract_es_bulk_requests(es_aioclient_mock)
+    [numeric_header, numeric_document, text_header, text_document] = bulk_request.data
+
+    assert (
+        numeric_header["create"]["_index"]
+        == "metrics-homeassistant_numeric.sensor-default"
+    )
+    assert numeric_document["hass.entity"]["id"] == "sensor.temperature"
+    assert numeric_document["hass.entity"]["valueas"] == {"float": 21.5}
+    assert numeric_document["hass.entity"]["unit_of_measurement"] == "°C"
+    assert "attributes" not in numeric_document["hass.entity"]
+
+    assert text_header["create"]["_index"] == "metrics-homeassistant.sensor-default"
+    assert text_document["hass.entity"]["value"] == "idle"
+
+    publisher.stop_publisher()
+    await gateway.async_stop_gateway()
+
+
+@pytest.mark.asyncio
+async def test_rollup_publishing(
+    hass: HomeAssistant,
+    es_aioclient_mock: AiohttpClientMocker,
+    freezer: FrozenDateTimeFactory,
+):
+    """Test numeric states of rolled up entities are published as one document per window."""
+
+    es_url = "http://localhost:9200"
+
+    mock_es_initialization(es_aioclient_mock, es_url)
+
+    config = build_full_config({"url": es_url, CONF_INDEX_MODE: INDEX_MODE_DATASTREAM})
+    config[CONF_ROLLUP_ENTITIES] = ["sensor.power", "sensor.energy"]
+    config[CONF_ROLLUP_PASSTHROUGH_ENTITIES] = ["sensor.energy"]
+
+    mock_entry = MockConfigEntry(
+        unique_id="test_rollup_publishing",
+        domain=DOMAIN,
+        version=3,
+        data=config,
+        title="ES Config",
+    )
+
+    entry = await _setup_config_entry(hass, mock_entry)
+
+    gateway = ElasticsearchGateway(config)
+    index_manager = IndexManager(hass, config, gateway)
+    publisher = DocumentPublisher(
+        config, gateway, index_manager, hass, config_entry=entry
+    )
+
+    await gateway.async_init()
+    await publisher.async_init()
+
+    es_aioclient_mock.clear_requests()
+    mock_es_initialization(es_aioclient_mock, es_url)
+
+    for value in ["10", "30", "20"]:
+        hass.states.async_set("sensor.power", value, {"unit_of_measurement": "W"})
+        await hass.async_block_till_done()
+        freezer.tick(10)
+    hass.states.async_set("sensor.energy", "5")
+    await hass.async_block_till_done()
+
+    # The window is still open, so only the passed through state is published
+    await publisher.async_do_publish()
+    [bulk_request] = extract_es_bulk_requests(es_aioclient_mock)
+    [header, document] = bulk_request.data
+    assert header["create"]["_index"] == "metrics-homeassistant.sensor-default"
+    assert document["hass.entity"]["id"] == "sensor.energy"
+
+    # An open window does not trigger a publish
+    assert not publisher._has_entries_to_publish()
+
+    es_aioclient_mock.clear_requests()
+    mock_es_initialization(es_aioclient_mock, es_url)
+
+    freezer.tick(60)
+    assert publisher._has_entries_to_publish()
+    await publisher.async_do_publish()
+
+    [bulk_request] = extract_es_bulk_requests(es_aioclient_mock)
+    documents = {
+        document["hass.entity"]["id"]: (header, document)
+        for header, document in zip(
+            bulk_request.data[::2], bulk_request.data[1::2], strict=True
+        )
+    }
+    assert documents.keys() == {"sensor.power", "sensor.energy"}
+
+    header, document = documents["sensor.power"]
+    assert header["create"]["_index"] == "metrics-homeassistant_rollup.sensor-default"
+    assert document["@timestamp"] == "2023-04-12T12:00:00+00:00"
+    assert document["hass.entity"]["valueas"] == {"float": 20.0}
+    assert document["hass.entity"]["unit_of_measurement"] == "W"
+    assert document["hass.rollup"] == {
+        "count": 3,
+        "min": 10.0,
+        "max": 30.0,
+        "avg": 20.0,
+        "window": 60,
+    }
+
+    publisher.stop_publisher()
+    await gateway.async_stop_gateway()
+
+
+@pytest.mark.asyncio
+async def test_rollup_snapshot_publishing(
+    hass: HomeAssistant,
+    es_aioclient_mock: AiohttpClientMocker,
+    freezer: FrozenDateTimeFactory,
+):
+    """Test the snapshot of all entities publishes idle rolled up entities as empty windows, rather than individually."""
+
+    es_url = "http://localhost:9200"
+
+    mock_es_initialization(es_aioclient_mock, es_url)
+
+    config = build_full_config(
+        {
+            "url": es_url,
+            CONF_INDEX_MODE: INDEX_MODE_DATASTREAM,
+            CONF_PUBLISH_MODE: PUBLISH_MODE_ALL,
+        }
+    )
+    config[CONF_ROLLUP_ENTITIES] = ["sensor.power", "sensor.energy"]
+    config[CONF_ROLLUP_PASSTHROUGH_ENTITIES] = ["sensor.energy"]
+
+    mock_entry = MockConfigEntry(
+        unique_id="test_rollup_snapshot_publishing",
+        domain=DOMAIN,
+        version=3,
+        data=config,
+        title="ES Config",
+    )
+
+    entry = await _setup_config_entry(hass, mock_entry)
+
+    hass.states.async_set("sensor.power", "10")
+    hass.states.async_set("sensor.energy", "5")
+    hass.states.async_set("sensor.temperature", "21")
+    await hass.async_block_till_done()
+
+    gateway = ElasticsearchGateway(config)
+    index_manager = IndexManager(hass, config, gateway)
+    publisher = DocumentPublisher(
+        config, gateway, index_manager, hass, config_entry=entry
+    )
+
+    await gateway.async_init()
+    await publisher.async_init()
+
+    es_aioclient_mock.clear_requests()
+    mock_es_initialization(es_aioclient_mock, es_url)
+
+    await publisher.async_do_publish()
+
+    [bulk_request] = extract_es_bulk_requests(es_aioclient_mock)
+    documents = {
+        document["hass.entity"]["id"]: (header, document)
+        for header, document in zip(
+            bulk_request.data[::2], bulk_request.data[1::2], strict=True
+        )
+    }
+    assert documents.keys() == {"sensor.power", "sensor.energy", "sensor.temperature"}
+
+    # The idle rolled up entity carries its value forward in the last window which ended
+    header, document = documents["sensor.power"]
+    assert header["create"]["_index"] == "metrics-homeassistant_rollup.sensor-default"
+    assert document["@timestamp"] == "2023-04-12T11:59:00+00:00"
+    assert document["hass.entity"]["valueas"] == {"float": 10.0}
+    assert document["hass.rollup"] == {
+        "count": 0,
+        "min": 10.0,
+        "max": 10.0,
+        "avg": 10.0,
+        "window": 60,
+    }
+    assert (
+        documents["sensor.temperature"][0]["create"]["_index"]
+        == "metrics-homeassistant.sensor-default"
+    )
+
+    # The next snapshot in the same window does not publish it again
+    es_aioclient_mock.clear_requests()
+    mock_es_initialization(es_aioclient_mock, es_url)
+
+    await publisher.async_do_publish()
+
+    [bulk_request] = extract_es_bulk_requests(es_aioclient_mock)
+    published = {document["hass.entity"]["id"] for document in bulk_request.data[1::2]}
+    assert published == {"sensor.energy", "sensor.temperature"}
+
+    publisher.stop_publisher()
+    await gateway.async_stop_gateway()
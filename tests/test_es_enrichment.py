@@ -0,0 +1,225 @@
+"""Tests for server-side enrichment."""
+
+import json
+from unittest import mock
+
+import pytest
+from homeassistant.components import counter
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import area_registry, entity_registry
+from homeassistant.setup import async_setup_component
+from pytest_homeassistant_custom_component.test_util.aiohttp import AiohttpClientMocker
+
+from custom_components.elasticsearch.config_flow import build_full_config
+from custom_components.elasticsearch.const import (
+    CONF_SERVER_SIDE_ENRICHMENT,
+    ENRICHMENT_PIPELINE_NAME,
+    ENTITY_METADATA_ENRICH_POLICY_NAME,
+    ENTITY_METADATA_INDEX_NAME,
+)
+from custom_components.elasticsearch.es_doc_creator import DocumentCreator
+from custom_components.elasticsearch.es_enrichment import (
+    ENTITY_METADATA_ENRICH_POLICY,
+    EntityEnrichment,
+)
+from custom_components.elasticsearch.es_gateway import ElasticsearchGateway
+from tests.test_util.aioclient_mock_utils import extract_es_bulk_requests
+from tests.test_util.es_startup_mocks import (
+    mock_es_enrichment_setup,
+    mock_es_initialization,
+)
+
+
+@pytest.fixture(autouse=True)
+def skip_system_info():
+    """Fixture to skip returning system info."""
+
+    async def get_system_info():
+        return {}
+
+    with mock.patch(
+        "custom_components.elasticsearch.system_info.SystemInfo.async_get_system_info",
+        side_effect=get_system_info,
+    ):
+        yield {}
+
+
+def _requests(aioclient_mock: AiohttpClientMocker, method: str, path: str):
+    return [
+        call
+        for call in aioclient_mock.mock_calls
+        if call[0] == method and call[1].path == path
+    ]
+
+
+def _mock_existing_enrichment(aioclient_mock: AiohttpClientMocker, es_url: str):
+    """Mock a cluster on which the metadata index and enrich policy already exist."""
+    aioclient_mock.put(
+        f"{es_url}/{ENTITY_METADATA_INDEX_NAME}",
+        status=400,
+        json={"error": {"type": "resource_already_exists_exception"}},
+    )
+    aioclient_mock.get(
+        f"{es_url}/_enrich/policy/{ENTITY_METADATA_ENRICH_POLICY_NAME}",
+        json={"policies": [{"config": {"match": ENTITY_METADATA_ENRICH_POLICY["match"]}}]},
+    )
+    mock_es_initialization(aioclient_mock, es_url)
+    mock_es_enrichment_setup(aioclient_mock, es_url)
+
+
+async def _setup_enrichment(hass: HomeAssistant, es_url: str):
+    config = build_full_config({"url": es_url})
+    config[CONF_SERVER_SIDE_ENRICHMENT] = True
+
+    gateway = ElasticsearchGateway(config)
+    await gateway.async_init()
+
+    creator = DocumentCreator(hass, config)
+    await creator.async_init()
+
+    enrichment = EntityEnrichment(hass, creator)
+    await enrichment.async_setup(gateway)
+    return gateway, enrichment
+
+
+@pytest.mark.asyncio
+async def test_setup_installs_enrichment(
+    hass: HomeAssistant, es_aioclient_mock: AiohttpClientMocker
+):
+    """Verify the metadata index, enrich policy and pipeline are installed, and the metadata is written."""
+
+    es_url = "http://test_enrichment_setup:9200"
+
+    mock_es_initialization(es_aioclient_mock, es_url)
+    mock_es_enrichment_setup(es_aioclient_mock, es_url)
+
+    assert await async_setup_component(hass, counter.DOMAIN, {counter.DOMAIN: {"test_1": {}}})
+    area = area_registry.async_get(hass).async_create("kitchen")
+    entity_registry.async_get(hass).async_update_entity(
+        "counter.test_1", area_id=area.id
+    )
+
+    gateway, enrichment = await _setup_enrichment(hass, es_url)
+
+    policy_path = f"/_enrich/policy/{ENTITY_METADATA_ENRICH_POLICY_NAME}"
+    [put_policy] = _requests(es_aioclient_mock, "PUT", policy_path)
+    assert json.loads(put_policy[2])["match"]["match_field"] == "id"
+    assert len(_requests(es_aioclient_mock, "PUT", policy_path + "/_execute")) == 1
+
+    [bulk_request] = extract_es_bulk_requests(es_aioclient_mock)
+    assert bulk_request.data == [
+        {"index": {"_index": ENTITY_METADATA_INDEX_NAME, "_id": "counter.test_1"}},
+        {
+            "id": "counter.test_1",
+            "device": {},
+            "area": {"id": area.id, "name": "kitchen"},
+            "platform": "counter",
+        },
+    ]
+
+    [put_pipeline] = _requests(
+        es_aioclient_mock, "PUT", f"/_ingest/pipeline/{ENRICHMENT_PIPELINE_NAME}"
+    )
+    processors = json.loads(put_pipeline[2])["processors"]
+    assert processors[1]["enrich"]["policy_name"] == ENTITY_METADATA_ENRICH_POLICY_NAME
+    assert {"set": {"field": "agent.name", "value": "My Home Assistant"}} in processors
+
+    enrichment.stop()
+    await gateway.async_stop_gateway()
+
+
+@pytest.mark.asyncio
+async def test_sync_writes_changed_metadata(
+    hass: HomeAssistant, es_aioclient_mock: AiohttpClientMocker
+):
+    """Verify only changed metadata is written, and removed entities are deleted."""
+
+    es_url = "http://test_enrichment_sync:9200"
+
+    mock_es_initialization(es_aioclient_mock, es_url)
+    mock_es_enrichment_setup(es_aioclient_mock, es_url)
+
+    assert await async_setup_component(
+        hass, counter.DOMAIN, {counter.DOMAIN: {"test_1": {}, "test_2": {}}}
+    )
+
+    gateway, enrichment = await _setup_enrichment(hass, es_url)
+    execute_path = f"/_enrich/policy/{ENTITY_METADATA_ENRICH_POLICY_NAME}/_execute"
+
+    # Nothing changed, so nothing is written
+    es_aioclient_mock.clear_requests()
+    mock_es_initialization(es_aioclient_mock, es_url)
+    mock_es_enrichment_setup(es_aioclient_mock, es_url)
+    await enrichment.async_sync()
+    assert extract_es_bulk_requests(es_aioclient_mock) == []
+    assert _requests(es_aioclient_mock, "PUT", execute_path) == []
+
+    registry = entity_registry.async_get(hass)
+    registry.async_update_entity("counter.test_1", name="Renamed")
+    registry.async_remove("counter.test_2")
+    await enrichment.async_sync()
+
+    [bulk_request] = extract_es_bulk_requests(es_aioclient_mock)
+    assert bulk_request.data == [
+        {"index": {"_index": ENTITY_METADATA_INDEX_NAME, "_id": "counter.test_1"}},
+        {
+            "id": "counter.test_1",
+            "device": {},
+            "platform": "counter",
+            "name": "Renamed",
+        },
+        {"delete": {"_index": ENTITY_METADATA_INDEX_NAME, "_id": "counter.test_2"}},
+    ]
+    assert len(_requests(es_aioclient_mock, "PUT", execute_path)) == 1
+
+    enrichment.stop()
+    await gateway.async_stop_gateway()
+
+
+@pytest.mark.asyncio
+async def test_restart_skips_unchanged_metadata(
+    hass: HomeAssistant, es_aioclient_mock: AiohttpClientMocker
+):
+    """Verify metadata which was written before a restart is not written again, and the policy is not executed."""
+
+    es_url = "http://test_enrichment_restart:9200"
+
+    mock_es_initialization(es_aioclient_mock, es_url)
+    mock_es_enrichment_setup(es_aioclient_mock, es_url)
+
+    assert await async_setup_component(
+        hass, counter.DOMAIN, {counter.DOMAIN: {"test_1": {}, "test_2": {}}}
+    )
+
+    gateway, enrichment = await _setup_enrichment(hass, es_url)
+    assert len(extract_es_bulk_requests(es_aioclient_mock)) == 1
+    enrichment.stop()
+    await gateway.async_stop_gateway()
+
+    # The metadata index and enrich policy already exist after the restart
+    es_aioclient_mock.clear_requests()
+    _mock_existing_enrichment(es_aioclient_mock, es_url)
+
+    registry = entity_registry.async_get(hass)
+    registry.async_update_entity("counter.test_1", name="Renamed")
+
+    gateway, enrichment = await _setup_enrichment(hass, es_url)
+
+    [bulk_request] = extract_es_bulk_requests(es_aioclient_mock)
+    assert [line["index"]["_id"] for line in bulk_request.data[::2]] == ["counter.test_1"]
+    execute_path = f"/_enrich/policy/{ENTITY_METADATA_ENRICH_POLICY_NAME}/_execute"
+    assert len(_requests(es_aioclient_mock, "PUT", execute_path)) == 1
+
+    # Nothing changed since
+    enrichment.stop()
+    await gateway.async_stop_gateway()
+    es_aioclient_mock.clear_requests()
+    _mock_existing_enrichment(es_aioclient_mock, es_url)
+
+    gateway, enrichment = await _setup_enrichment(hass, es_url)
+
+    assert extract_es_bulk_requests(es_aioclient_mock) == []
+    assert _requests(es_aioclient_mock, "PUT", execute_path) == []
+
+    enrichment.stop()
+    await gateway.async_stop_gateway()
@@ -0,0 +1,275 @@
+"""Test Elasticsearch Gateway."""
+
+import ssl
+import time
+from unittest import mock
+
+import aiohttp
+import pytest
+from homeassistant.const import CONF_VERIFY_SSL
+from homeassistant.helpers.typing import HomeAssistantType
+from pytest_homeassistant_custom_component.test_util.aiohttp import AiohttpClientMocker
+
+from custom_components.elasticsearch.config_flow import build_full_config
+from custom_components.elasticsearch.const import (
+    CONF_CONNECTION_KEEPALIVE,
+    CONF_CONNECTION_POOL_SIZE,
+    CONF_NODE_URLS,
+    CONF_PREWARM_CONNECTIONS,
+    CONF_SNIFF_NODES,
+    PROBE_BACKOFF_INITIAL,
+    PROBE_INTERVAL,
+)
+from custom_components.elasticsearch.es_gateway import ElasticsearchGateway
+from tests.test_util.es_startup_mocks import mock_es_initialization
+
+
+@pytest.mark.asyncio
+async def test_connection_options(
+    hass: HomeAssistantType, es_aioclient_mock: AiohttpClientMocker
+):
+    """Verify connection pool options are passed to the connection."""
+
+    es_url = "http://test_connection_options:9200"
+
+    mock_es_initialization(es_aioclient_mock, es_url)
+    config = build_full_config({"url": es_url})
+    config[CONF_CONNECTION_POOL_SIZE] = 4
+    config[CONF_CONNECTION_KEEPALIVE] = 120
+
+    gateway = ElasticsearchGateway(config)
+    await gateway.async_init()
+
+    [connection] = gateway.client.transport.connection_pool.connections
+
+    with mock.patch("aiohttp.TCPConnector") as tcp_connector:
+        connection._create_connector()
+
+    tcp_connector.assert_called_once_with(
+        limit=4,
+        use_dns_cache=True,
+        ssl=connection.ssl_context,
+        keepalive_timeout=120,
+    )
+    assert connection.ssl_context.verify_mode == ssl.CERT_REQUIRED
+
+    # No connections are pre-warmed by default
+    assert es_aioclient_mock.call_count == 1
+
+    await gateway.async_stop_gateway()
+
+
+@pytest.mark.asyncio
+async def test_unverified_connection(hass: HomeAssistantType):
+    """Verify connections skip certificate verification when it is disabled."""
+
+    config = build_full_config(
+        {"url": "https://test_unverified_connection:9200", CONF_VERIFY_SSL: False}
+    )
+
+    client = ElasticsearchGateway(config)._create_es_client()
+
+    ssl_context = client.transport.kwargs["ssl_context"]
+    assert ssl_context.verify_mode == ssl.CERT_NONE
+    assert not ssl_context.check_hostname
+
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_prewarm_connections(
+    hass: HomeAssistantType, es_aioclient_mock: AiohttpClientMocker
+):
+    """Verify connections are pre-warmed during init, bounded by the pool size."""
+
+    es_url = "http://test_prewarm_connections:9200"
+
+    mock_es_initialization(es_aioclient_mock, es_url)
+
+    config = build_full_config({"url": es_url})
+    config[CONF_CONNECTION_POOL_SIZE] = 3
+    config[CONF_PREWARM_CONNECTIONS] = 5
+
+    gateway = ElasticsearchGateway(config)
+    await gateway.async_init()
+
+    # Version check, followed by one request per pre-warmed connection
+    assert es_aioclient_mock.call_count == 1 + 3
+
+    await gateway.async_stop_gateway()
+
+
+@pytest.mark.asyncio
+async def test_prewarm_failure_is_not_fatal(
+    hass: HomeAssistantType, es_aioclient_mock: AiohttpClientMocker
+):
+    """Verify failing to pre-warm connections does not raise."""
+
+    es_url = "http://test_prewarm_failure:9200"
+
+    mock_es_initialization(es_aioclient_mock, es_url)
+
+    config = build_full_config({"url": es_url})
+    config[CONF_PREWARM_CONNECTIONS] = 2
+
+    gateway = ElasticsearchGateway(config)
+    await gateway.async_init()
+
+    es_aioclient_mock.clear_requests()
+    es_aioclient_mock.get(es_url, status=503)
+
+    await gateway._async_prewarm_connections()
+
+    assert es_aioclient_mock.call_count >= 2
+
+    await gateway.async_stop_gateway()
+
+
+@pytest.mark.asyncio
+async def test_multi_node_failover(
+    hass: HomeAssistantType, es_aioclient_mock: AiohttpClientMocker
+):
+    """Verify requests fail over to a healthy node, and the failing node is marked as dead."""
+
+    es_url = "http://test_multi_node_1:9200"
+    failing_url = "http://test_multi_node_2:9200"
+
+    mock_es_initialization(es_aioclient_mock, es_url)
+    es_aioclient_mock.get(failing_url, exc=aiohttp.ClientConnectionError())
+
+    config = build_full_config({"url": es_url})
+    config[CONF_NODE_URLS] = [failing_url, es_url]
+
+    gateway = ElasticsearchGateway(config)
+    await gateway.async_init()
+
+    assert gateway.node_count == 2
+
+    # Round-robin guarantees the failing node is tried by one of these requests
+    await gateway.get_client().info()
+    await gateway.get_client().info()
+
+    assert gateway.healthy_node_count == 1
+    assert not gateway.active_connection_error
+
+    await gateway.async_stop_gateway()
+
+
+@pytest.mark.asyncio
+async def test_sniff_nodes(hass: HomeAssistantType):
+    """Verify sniffing is only enabled on request."""
+
+    config = build_full_config({"url": "http://test_sniff_nodes:9200"})
+
+    gateway = ElasticsearchGateway(config)
+    client = gateway._create_es_client()
+    assert client.transport.sniff_on_connection_fail is False
+    await client.close()
+
+    config[CONF_SNIFF_NODES] = True
+    gateway = ElasticsearchGateway(config)
+    client = gateway._create_es_client()
+    assert client.transport.sniff_on_connection_fail is True
+    assert client.transport.sniffer_timeout == 60
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_passive_health_tracking(
+    hass: HomeAssistantType, es_aioclient_mock: AiohttpClientMocker
+):
+    """Verify the connection is only probed when idle."""
+
+    es_url = "http://test_passive_health:9200"
+
+    mock_es_initialization(es_aioclient_mock, es_url)
+
+    gateway = ElasticsearchGateway(build_full_config({"url": es_url}))
+    await gateway.async_init()
+
+    assert gateway._next_probe_time() >= time.monotonic() + PROBE_INTERVAL - 1
+
+    # Successful requests postpone the next probe
+    gateway._last_probe = 0
+    gateway.notify_of_request_success()
+    assert gateway._next_probe_time() >= time.monotonic() + PROBE_INTERVAL - 1
+
+    await gateway.async_stop_gateway()
+
+
+@pytest.mark.asyncio
+async def test_probe_backoff_and_recovery(
+    hass: HomeAssistantType, es_aioclient_mock: AiohttpClientMocker
+):
+    """Verify failed probes back off exponentially, and recovery notifies listeners."""
+
+    es_url = "http://test_probe_backoff:9200"
+
+    mock_es_initialization(es_aioclient_mock, es_url)
+
+    gateway = ElasticsearchGateway(build_full_config({"url": es_url}))
+    await gateway.async_init()
+
+    recoveries = []
+    remove_listener = gateway.add_recovery_listener(lambda: recoveries.append(True))
+
+    es_aioclient_mock.clear_requests()
+    es_aioclient_mock.get(es_url, exc=aiohttp.ClientConnectionError())
+
+    for attempt in range(3):
+        await gateway._async_probe_connection()
+        assert gateway.active_connection_error
+
+        delay = gateway._next_probe_time() - time.monotonic()
+        backoff = PROBE_BACKOFF_INITIAL * 2**attempt
+        assert backoff / 2 - 1 <= delay <= backoff
+
+    assert recoveries == []
+
+    es_aioclient_mock.clear_requests()
+    mock_es_initialization(es_aioclient_mock, es_url)
+
+    await gateway._async_probe_connection()
+    assert not gateway.active_connection_error
+    assert recoveries == [True]
+
+    remove_listener()
+    gateway.notify_of_connection_error()
+    gateway.notify_of_request_success()
+    assert recoveries == [True]
+
+    await gateway.async_stop_gateway()
+
+
+@pytest.mark.asyncio
+async def test_max_content_length_discovery(
+    hass: HomeAssistantType, es_aioclient_mock: AiohttpClientMocker
+):
+    """Verify http.max_content_length is read from the node settings, falling back to the cluster default."""
+
+    es_url = "http://test_max_content_length:9200"
+
+    mock_es_initialization(es_aioclient_mock, es_url)
+
+    gateway = ElasticsearchGateway(build_full_config({"url": es_url}))
+    await gateway.async_init()
+
+    es_aioclient_mock.get(
+        es_url + "/_nodes/settings",
+        json={"nodes": {"node-1": {"settings": {"http": {"max_content_length": "10mb"}}}}},
+    )
+    assert await gateway.async_get_max_content_length() == 10 * 1024 * 1024
+
+    es_aioclient_mock.clear_requests()
+    es_aioclient_mock.get(es_url + "/_nodes/settings", json={})
+    es_aioclient_mock.get(
+        es_url + "/_cluster/settings",
+        json={"defaults": {"http.max_content_length": "100mb"}},
+    )
+    assert await gateway.async_get_max_content_length() == 100 * 1024 * 1024
+
+    es_aioclient_mock.clear_requests()
+    es_aioclient_mock.get(es_url + "/_nodes/settings", status=403, json={})
+    assert await gateway.async_get_max_content_length() is None
+
+    await gateway.async_stop_gateway()
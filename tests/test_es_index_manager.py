@@ -1,5 +1,7 @@
 """Testing for Elasticsearch Index Manager."""
 
+from unittest import mock
+
 import pytest
 from elasticsearch.utils import get_merged_config
 from elasticsearch7 import ElasticsearchException
@@ -7,19 +9,36 @@ from homeassistant.core import HomeAssistant
 from pytest_homeassistant_custom_component.common import MockConfigEntry
 from pytest_homeassistant_custom_component.test_util.aiohttp import AiohttpClientMocker
 
+from custom_components.elasticsearch import es_index_manager
 from custom_components.elasticsearch.config_flow import build_full_config
 from custom_components.elasticsearch.const import (
+    CONF_DOWNSAMPLING,
+    CONF_FLATTENED_ATTRIBUTES,
     CONF_INDEX_MODE,
+    CONF_NUMERIC_DATASTREAM,
+    CONF_ROLLUP_DOMAINS,
+    CONF_STORAGE_PROFILE,
+    CONF_TSDS_DIMENSIONS,
+    DATASTREAM_METRICS_DOWNSAMPLING_ILM_POLICY_NAME,
     DATASTREAM_METRICS_ILM_POLICY_NAME,
     DATASTREAM_METRICS_INDEX_TEMPLATE_NAME,
+    DATASTREAM_NUMERIC_INDEX_TEMPLATE_NAME,
+    DATASTREAM_ROLLUP_INDEX_TEMPLATE_NAME,
     DOMAIN,
     INDEX_MODE_DATASTREAM,
     INDEX_MODE_LEGACY,
     LEGACY_TEMPLATE_NAME,
+    STORAGE_PROFILE_MINIMAL_STORAGE,
+    TSDS_DIMENSION_DEVICE_ID,
+    TSDS_DIMENSION_ENTITY_ID,
 )
 from custom_components.elasticsearch.errors import ElasticException
 from custom_components.elasticsearch.es_gateway import ElasticsearchGateway
-from custom_components.elasticsearch.es_index_manager import IndexManager
+from custom_components.elasticsearch.es_index_manager import (
+    TEMPLATE_FINGERPRINT_META_KEY,
+    IndexManager,
+    async_get_template_asset,
+)
 from tests.test_util.aioclient_mock_utils import (
     extract_es_ilm_template_requests,
     extract_es_legacy_index_template_requests,
@@ -141,6 +160,7 @@ async def test_es811_datastream_setup(
     # Using TSDS
     assert "index.mode" in template_settings
     assert template_settings["index.mode"] == "time_series"
+    assert template_settings["index.routing_path"] == ["hass.entity.id"]
 
     # Not Using ILM
     assert "index.lifecycle.name" not in template_settings
@@ -706,3 +726,559 @@ async def test_legacy_index_mode_error(
 
     # ILM Setup occurs before the index creation fails
     assert len(extract_es_ilm_template_requests(es_aioclient_mock)) == 1
+
+
+@pytest.mark.asyncio
+async def test_modern_index_mode_unchanged_template(
+    hass: HomeAssistant, es_aioclient_mock: AiohttpClientMocker
+):
+    """Test that an unchanged index template is verified with a single request, and not installed again."""
+
+    es_url = "http://localhost:9200"
+    template_url = es_url + "/_index_template/" + DATASTREAM_METRICS_INDEX_TEMPLATE_NAME
+    ilm_url = es_url + "/_ilm/policy/" + DATASTREAM_METRICS_ILM_POLICY_NAME
+
+    mock_es_initialization(
+        es_aioclient_mock,
+        es_url,
+        mock_v88_cluster=True,
+        ilm_policy_name=DATASTREAM_METRICS_ILM_POLICY_NAME,
+    )
+
+    modern_index_manager = await get_index_manager(
+        hass=hass, es_url=es_url, index_mode=INDEX_MODE_DATASTREAM
+    ).__anext__()
+
+    await modern_index_manager.async_setup()
+
+    [template_request] = extract_es_modern_index_template_requests(es_aioclient_mock)
+    template_meta = template_request.data[0]["_meta"]
+    assert TEMPLATE_FINGERPRINT_META_KEY in template_meta
+
+    # The fingerprint of the installed template is verified, and nothing is installed
+    es_aioclient_mock.clear_requests()
+    es_aioclient_mock.get(
+        template_url,
+        json={
+            "index_templates": [
+                {
+                    "name": DATASTREAM_METRICS_INDEX_TEMPLATE_NAME,
+                    "index_template": {"_meta": template_meta},
+                }
+            ]
+        },
+    )
+    es_aioclient_mock.get(
+        ilm_url, json={DATASTREAM_METRICS_ILM_POLICY_NAME: {"policy": {}}}
+    )
+    mock_es_initialization(es_aioclient_mock, es_url, mock_v88_cluster=True)
+
+    await modern_index_manager.async_setup()
+
+    [verification_request] = [
+        call for call in es_aioclient_mock.mock_calls if "/_index_template" in call[1].path
+    ]
+    assert verification_request[0] == "GET"
+    assert "filter_path" in verification_request[1].query
+    assert len(extract_es_modern_index_template_requests(es_aioclient_mock)) == 0
+    assert len(extract_es_ilm_template_requests(es_aioclient_mock)) == 0
+
+    # A deleted template and policy are installed again, despite the cached cluster facts
+    es_aioclient_mock.clear_requests()
+    mock_es_initialization(
+        es_aioclient_mock,
+        es_url,
+        mock_v88_cluster=True,
+        ilm_policy_name=DATASTREAM_METRICS_ILM_POLICY_NAME,
+    )
+
+    await modern_index_manager.async_setup()
+
+    assert len(extract_es_modern_index_template_requests(es_aioclient_mock)) == 1
+    assert len(extract_es_ilm_template_requests(es_aioclient_mock)) == 1
+
+
+@pytest.mark.asyncio
+async def test_modern_index_mode_missing_policy(
+    hass: HomeAssistant, es_aioclient_mock: AiohttpClientMocker
+):
+    """Test that a deleted ILM policy is restored even when the index template is up to date."""
+
+    es_url = "http://localhost:9200"
+
+    mock_es_initialization(
+        es_aioclient_mock,
+        es_url,
+        mock_v88_cluster=True,
+        ilm_policy_name=DATASTREAM_METRICS_ILM_POLICY_NAME,
+    )
+
+    modern_index_manager = await get_index_manager(
+        hass=hass, es_url=es_url, index_mode=INDEX_MODE_DATASTREAM
+    ).__anext__()
+
+    await modern_index_manager.async_setup()
+
+    [template_request] = extract_es_modern_index_template_requests(es_aioclient_mock)
+
+    es_aioclient_mock.clear_requests()
+    es_aioclient_mock.get(
+        es_url + "/_index_template/" + DATASTREAM_METRICS_INDEX_TEMPLATE_NAME,
+        json={
+            "index_templates": [
+                {
+                    "name": DATASTREAM_METRICS_INDEX_TEMPLATE_NAME,
+                    "index_template": {"_meta": template_request.data[0]["_meta"]},
+                }
+            ]
+        },
+    )
+    mock_es_initialization(
+        es_aioclient_mock,
+        es_url,
+        mock_v88_cluster=True,
+        ilm_policy_name=DATASTREAM_METRICS_ILM_POLICY_NAME,
+    )
+
+    await modern_index_manager.async_setup()
+
+    assert len(extract_es_modern_index_template_requests(es_aioclient_mock)) == 0
+    [ilm_request] = extract_es_ilm_template_requests(es_aioclient_mock)
+    assert ilm_request.url.path == "/_ilm/policy/" + DATASTREAM_METRICS_ILM_POLICY_NAME
+
+
+@pytest.mark.asyncio
+async def test_modern_index_mode_unverifiable_template(
+    hass: HomeAssistant, es_aioclient_mock: AiohttpClientMocker
+):
+    """Test that the cached cluster facts are relied upon when the template cannot be verified."""
+
+    es_url = "http://localhost:9200"
+
+    mock_es_initialization(
+        es_aioclient_mock,
+        es_url,
+        mock_v88_cluster=True,
+        ilm_policy_name=DATASTREAM_METRICS_ILM_POLICY_NAME,
+    )
+
+    modern_index_manager = await get_index_manager(
+        hass=hass, es_url=es_url, index_mode=INDEX_MODE_DATASTREAM
+    ).__anext__()
+
+    await modern_index_manager.async_setup()
+
+    es_aioclient_mock.clear_requests()
+    es_aioclient_mock.get(
+        es_url + "/_index_template/" + DATASTREAM_METRICS_INDEX_TEMPLATE_NAME,
+        status=403,
+        json={"error": {"type": "security_exception"}, "status": 403},
+    )
+    es_aioclient_mock.get(
+        es_url + "/_ilm/policy/" + DATASTREAM_METRICS_ILM_POLICY_NAME,
+        status=403,
+        json={"error": {"type": "security_exception"}, "status": 403},
+    )
+    mock_es_initialization(es_aioclient_mock, es_url, mock_v88_cluster=True)
+
+    await modern_index_manager.async_setup()
+
+    assert len(extract_es_modern_index_template_requests(es_aioclient_mock)) == 0
+    assert len(extract_es_ilm_template_requests(es_aioclient_mock)) == 0
+
+    # Without cached facts, the failure to verify is raised
+    with mock.patch(
+        "custom_components.elasticsearch.es_cluster_facts.CLUSTER_FACTS_MAX_AGE", 0
+    ), pytest.raises(ElasticException):
+        await modern_index_manager.async_setup()
+
+
+@pytest.mark.asyncio
+async def test_template_assets_are_cached(hass: HomeAssistant):
+    """Test that template assets are read once, and that callers receive copies."""
+
+    es_index_manager._TEMPLATE_ASSETS.clear()
+
+    with mock.patch.object(
+        es_index_manager,
+        "_load_template_asset",
+        wraps=es_index_manager._load_template_asset,
+    ) as load_template_asset:
+        mapping = await async_get_template_asset(hass, "index_mapping.json")
+        mapping["modified"] = True
+
+        assert "modified" not in await async_get_template_asset(
+            hass, "index_mapping.json"
+        )
+
+    load_template_asset.assert_called_once_with("index_mapping.json")
+
+
+@pytest.mark.asyncio
+async def test_create_datastreams(
+    hass: HomeAssistant, es_aioclient_mock: AiohttpClientMocker
+):
+    """Test that only missing datastreams are created, and that existing datastreams are tracked."""
+
+    es_url = "http://localhost:9200"
+
+    es_aioclient_mock.get(
+        es_url + "/_data_stream/metrics-homeassistant.*-default",
+        json={"data_streams": [{"name": "metrics-homeassistant.sensor-default"}]},
+    )
+    es_aioclient_mock.put(
+        es_url + "/_data_stream/metrics-homeassistant.light-default",
+        status=400,
+        headers={"content-type": "application/json"},
+        json={
+            "error": {
+                "type": "resource_already_exists_exception",
+                "reason": "data_stream [metrics-homeassistant.light-default] already exists",
+            },
+            "status": 400,
+        },
+    )
+    mock_es_initialization(es_aioclient_mock, es_url)
+
+    modern_index_manager = await get_index_manager(
+        hass=hass, es_url=es_url, index_mode=INDEX_MODE_DATASTREAM
+    ).__anext__()
+
+    datastreams = {
+        "metrics-homeassistant.sensor-default",
+        "metrics-homeassistant.light-default",
+        "metrics-homeassistant.switch-default",
+    }
+    await modern_index_manager.async_create_datastreams(datastreams)
+
+    created = [
+        call[1].path
+        for call in es_aioclient_mock.mock_calls
+        if call[0] == "PUT" and call[1].path.startswith("/_data_stream/")
+    ]
+    assert sorted(created) == [
+        "/_data_stream/metrics-homeassistant.light-default",
+        "/_data_stream/metrics-homeassistant.switch-default",
+    ]
+    assert modern_index_manager.existing_datastreams == datastreams
+
+    # Datastreams which are known to exist are not requested again
+    es_aioclient_mock.clear_requests()
+    await modern_index_manager.async_create_datastreams(datastreams)
+    assert es_aioclient_mock.call_count == 0
+
+
+@pytest.mark.asyncio
+async def test_tsds_dimensions(
+    hass: HomeAssistant, es_aioclient_mock: AiohttpClientMocker
+):
+    """Test that the configured dimensions identify time series, and route documents."""
+
+    es_url = "http://localhost:9200"
+
+    mock_es_initialization(es_aioclient_mock, es_url, mock_v811_cluster=True)
+
+    config = build_full_config({"url": es_url, CONF_INDEX_MODE: INDEX_MODE_DATASTREAM})
+    config[CONF_TSDS_DIMENSIONS] = [TSDS_DIMENSION_ENTITY_ID, TSDS_DIMENSION_DEVICE_ID]
+
+    gateway = ElasticsearchGateway(config)
+    await gateway.async_init()
+
+    await IndexManager(hass, config, gateway).async_setup()
+
+    [template_request] = extract_es_modern_index_template_requests(es_aioclient_mock)
+    template = template_request.data[0]["template"]
+
+    assert template["settings"]["index.routing_path"] == [
+        "hass.entity.id",
+        "hass.entity.device.id",
+    ]
+
+    hass_properties = template["mappings"]["properties"]["hass"]["properties"]
+    entity_properties = hass_properties["entity"]["properties"]
+    assert entity_properties["id"]["time_series_dimension"] is True
+    assert (
+        entity_properties["device"]["properties"]["id"]["time_series_dimension"]
+        is True
+    )
+    assert "time_series_dimension" not in entity_properties["domain"]
+    assert "time_series_dimension" not in hass_properties["object_id"]
+
+    await gateway.async_stop_gateway()
+
+
+@pytest.mark.asyncio
+async def test_tsds_dimensions_without_identity(
+    hass: HomeAssistant, es_aioclient_mock: AiohttpClientMocker
+):
+    """Test that the entity ID is added to dimensions which do not tell the entities apart."""
+
+    es_url = "http://localhost:9200"
+
+    mock_es_initialization(es_aioclient_mock, es_url, mock_v811_cluster=True)
+
+    config = build_full_config({"url": es_url, CONF_INDEX_MODE: INDEX_MODE_DATASTREAM})
+    config[CONF_TSDS_DIMENSIONS] = [TSDS_DIMENSION_DEVICE_ID]
+
+    gateway = ElasticsearchGateway(config)
+    await gateway.async_init()
+
+    await IndexManager(hass, config, gateway).async_setup()
+
+    [template_request] = extract_es_modern_index_template_requests(es_aioclient_mock)
+    assert template_request.data[0]["template"]["settings"]["index.routing_path"] == [
+        "hass.entity.id",
+        "hass.entity.device.id",
+    ]
+
+    await gateway.async_stop_gateway()
+
+
+@pytest.mark.asyncio
+async def test_numeric_datastream_template(
+    hass: HomeAssistant, es_aioclient_mock: AiohttpClientMocker
+):
+    """Test that a lean template is installed for numeric datastreams, with the value as a gauge metric."""
+
+    es_url = "http://localhost:9200"
+
+    mock_es_initialization(es_aioclient_mock, es_url, mock_v811_cluster=True)
+
+    config = build_full_config({"url": es_url, CONF_INDEX_MODE: INDEX_MODE_DATASTREAM})
+    config[CONF_NUMERIC_DATASTREAM] = True
+
+    gateway = ElasticsearchGateway(config)
+    await gateway.async_init()
+
+    await IndexManager(hass, config, gateway).async_setup()
+
+    template_requests = extract_es_modern_index_template_requests(es_aioclient_mock)
+    assert [request.url.path for request in template_requests] == [
+        f"/_index_template/{DATASTREAM_METRICS_INDEX_TEMPLATE_NAME}",
+        f"/_index_template/{DATASTREAM_NUMERIC_INDEX_TEMPLATE_NAME}",
+    ]
+
+    numeric_template = template_requests[1].data[0]
+    assert numeric_template["index_patterns"] == [
+        "metrics-homeassistant_numeric.*-default"
+    ]
+    assert numeric_template["composed_of"] == [
+        f"{DATASTREAM_NUMERIC_INDEX_TEMPLATE_NAME}@custom"
+    ]
+
+    template = numeric_template["template"]
+    assert template["settings"]["index.mode"] == "time_series"
+    entity_properties = template["mappings"]["properties"]["hass"]["properties"][
+        "entity"
+    ]["properties"]
+    assert entity_properties["valueas"]["properties"]["float"] == {
+        "type": "double",
+        "time_series_metric": "gauge",
+    }
+    assert "attributes" not in entity_properties
+
+    await gateway.async_stop_gateway()
+
+
+@pytest.mark.asyncio
+async def test_flattened_attributes_template(
+    hass: HomeAssistant, es_aioclient_mock: AiohttpClientMocker
+):
+    """Test that attributes are mapped as a single flattened field, without a dynamic template."""
+
+    es_url = "http://localhost:9200"
+
+    mock_es_initialization(es_aioclient_mock, es_url, mock_v811_cluster=True)
+
+    config = build_full_config({"url": es_url, CONF_INDEX_MODE: INDEX_MODE_DATASTREAM})
+    config[CONF_FLATTENED_ATTRIBUTES] = True
+
+    gateway = ElasticsearchGateway(config)
+    await gateway.async_init()
+
+    await IndexManager(hass, config, gateway).async_setup()
+
+    [template_request] = extract_es_modern_index_template_requests(es_aioclient_mock)
+    mappings = template_request.data[0]["template"]["mappings"]
+
+    entity_properties = mappings["properties"]["hass"]["properties"]["entity"][
+        "properties"
+    ]
+    assert entity_properties["attributes"] == {
+        "type": "flattened",
+        "ignore_above": 1024,
+    }
+    assert mappings["dynamic_templates"] == []
+
+    await gateway.async_stop_gateway()
+
+
+@pytest.mark.asyncio
+async def test_legacy_storage_profile(
+    hass: HomeAssistant, es_aioclient_mock: AiohttpClientMocker
+):
+    """Test that the storage profile is rendered into the legacy template."""
+
+    es_url = "http://localhost:9200"
+
+    mock_es_initialization(
+        es_aioclient_mock, es_url, mock_v88_cluster=True, mock_template_setup=True
+    )
+
+    config = build_full_config({"url": es_url, CONF_INDEX_MODE: INDEX_MODE_LEGACY})
+    config[CONF_STORAGE_PROFILE] = STORAGE_PROFILE_MINIMAL_STORAGE
+
+    gateway = ElasticsearchGateway(config)
+    await gateway.async_init()
+
+    await IndexManager(hass, config, gateway).async_setup()
+
+    [template_request] = extract_es_legacy_index_template_requests(es_aioclient_mock)
+    settings = template_request.data[0]["settings"]
+
+    assert settings["index.sort.field"] == ["hass.entity.id", "@timestamp"]
+    assert settings["index.number_of_replicas"] == 0
+    assert "index.mapping.source.mode" not in settings
+
+    await gateway.async_stop_gateway()
+
+
+@pytest.mark.asyncio
+async def test_invalid_storage_profile(hass: HomeAssistant):
+    """Test that an unknown storage profile is rejected."""
+
+    config = build_full_config(
+        {"url": "http://localhost:9200", CONF_INDEX_MODE: INDEX_MODE_DATASTREAM}
+    )
+    config[CONF_STORAGE_PROFILE] = "unknown"
+
+    with pytest.raises(ElasticException):
+        IndexManager(hass, config, ElasticsearchGateway(config))
+
+
+@pytest.mark.asyncio
+async def test_rollup_datastream_template(
+    hass: HomeAssistant, es_aioclient_mock: AiohttpClientMocker
+):
+    """Test that a template is installed for rollup datastreams once entities are rolled up."""
+
+    es_url = "http://localhost:9200"
+
+    mock_es_initialization(es_aioclient_mock, es_url, mock_v811_cluster=True)
+
+    config = build_full_config({"url": es_url, CONF_INDEX_MODE: INDEX_MODE_DATASTREAM})
+    config[CONF_ROLLUP_DOMAINS] = ["sensor"]
+
+    gateway = ElasticsearchGateway(config)
+    await gateway.async_init()
+
+    await IndexManager(hass, config, gateway).async_setup()
+
+    template_requests = extract_es_modern_index_template_requests(es_aioclient_mock)
+    assert [request.url.path for request in template_requests] == [
+        f"/_index_template/{DATASTREAM_METRICS_INDEX_TEMPLATE_NAME}",
+        f"/_index_template/{DATASTREAM_ROLLUP_INDEX_TEMPLATE_NAME}",
+    ]
+
+    rollup_template = template_requests[1].data[0]
+    assert rollup_template["index_patterns"] == ["metrics-homeassistant_rollup.*-default"]
+    rollup_properties = rollup_template["template"]["mappings"]["properties"]["hass"][
+        "properties"
+    ]["rollup"]["properties"]
+    assert rollup_properties["avg"] == {"type": "double", "time_series_metric": "gauge"}
+    assert rollup_properties["window"] == {"type": "long"}
+
+    await gateway.async_stop_gateway()
+
+
+@pytest.mark.asyncio
+async def test_es811_downsampling(
+    hass: HomeAssistant, es_aioclient_mock: AiohttpClientMocker
+):
+    """Test that counters are marked as counter metrics, and downsampling rounds are added to the datastream lifecycle."""
+
+    es_url = "http://localhost:9200"
+
+    mock_es_initialization(es_aioclient_mock, es_url, mock_v811_cluster=True)
+
+    config = build_full_config({"url": es_url, CONF_INDEX_MODE: INDEX_MODE_DATASTREAM})
+    config[CONF_DOWNSAMPLING] = True
+
+    gateway = ElasticsearchGateway(config)
+    await gateway.async_init()
+
+    await IndexManager(hass, config, gateway).async_setup()
+
+    [template_request] = extract_es_modern_index_template_requests(es_aioclient_mock)
+    template = template_request.data[0]["template"]
+
+    assert template["lifecycle"] == {
+        "data_retention": "365d",
+        "downsampling": [
+            {"after": "7d", "fixed_interval": "1m"},
+            {"after": "90d", "fixed_interval": "1h"},
+        ],
+    }
+
+    valueas_properties = template["mappings"]["properties"]["hass"]["properties"][
+        "entity"
+    ]["properties"]["valueas"]["properties"]
+    assert valueas_properties["float"]["time_series_metric"] == "gauge"
+    assert valueas_properties["counter"] == {
+        "type": "double",
+        "time_series_metric": "counter",
+    }
+
+    assert len(extract_es_ilm_template_requests(es_aioclient_mock)) == 0
+
+    await gateway.async_stop_gateway()
+
+
+@pytest.mark.asyncio
+async def test_es88_downsampling(
+    hass: HomeAssistant, es_aioclient_mock: AiohttpClientMocker
+):
+    """Test that downsampling rounds are added to a separate ILM policy when DLM is not supported."""
+
+    es_url = "http://localhost:9200"
+
+    mock_es_initialization(
+        es_aioclient_mock,
+        es_url,
+        mock_v88_cluster=True,
+        mock_ilm_setup=True,
+        ilm_policy_name=DATASTREAM_METRICS_DOWNSAMPLING_ILM_POLICY_NAME,
+    )
+
+    config = build_full_config({"url": es_url, CONF_INDEX_MODE: INDEX_MODE_DATASTREAM})
+    config[CONF_DOWNSAMPLING] = True
+
+    gateway = ElasticsearchGateway(config)
+    await gateway.async_init()
+
+    await IndexManager(hass, config, gateway).async_setup()
+
+    [template_request] = extract_es_modern_index_template_requests(es_aioclient_mock)
+    template = template_request.data[0]["template"]
+
+    assert "lifecycle" not in template
+    assert (
+        template["settings"]["index.lifecycle.name"]
+        == DATASTREAM_METRICS_DOWNSAMPLING_ILM_POLICY_NAME
+    )
+
+    [ilm_request] = extract_es_ilm_template_requests(es_aioclient_mock)
+    assert ilm_request.url.path == (
+        f"/_ilm/policy/{DATASTREAM_METRICS_DOWNSAMPLING_ILM_POLICY_NAME}"
+    )
+    phases = ilm_request.data[0]["policy"]["phases"]
+    assert phases["warm"] == {
+        "min_age": "7d",
+        "actions": {"downsample": {"fixed_interval": "1m"}},
+    }
+    assert phases["cold"] == {
+        "min_age": "90d",
+        "actions": {"downsample": {"fixed_interval": "1h"}},
+    }
+
+    await gateway.async_stop_gateway()
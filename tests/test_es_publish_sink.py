@@ -0,0 +1,250 @@
+"""Tests for the PublishSink class."""
+
+from unittest import mock
+
+import aiohttp
+import pytest
+from homeassistant.helpers.typing import HomeAssistantType
+from pytest_homeassistant_custom_component.test_util.aiohttp import AiohttpClientMocker
+
+from custom_components.elasticsearch.config_flow import build_full_config
+from custom_components.elasticsearch.const import (
+    CONF_BULK_MAX_BYTES,
+    CONF_SINK_QUEUE_SIZE,
+    DEFAULT_BULK_MAX_BYTES,
+)
+from custom_components.elasticsearch.es_gateway import ElasticsearchGateway
+from custom_components.elasticsearch.es_publish_sink import PublishSink
+from tests.test_util.aioclient_mock_utils import extract_es_bulk_requests
+from tests.test_util.es_startup_mocks import mock_es_initialization
+
+
+def _actions(*values):
+    return [
+        {"_op_type": "index", "_index": "test", "_source": {"value": value}}
+        for value in values
+    ]
+
+
+@pytest.mark.asyncio
+async def test_queue_drops_oldest_documents(hass: HomeAssistantType):
+    """Verify the queue is bounded, and the oldest documents are dropped first."""
+
+    config = build_full_config({"url": "http://test_sink_queue:9200"})
+    config[CONF_SINK_QUEUE_SIZE] = 3
+
+    sink = PublishSink("test", config, ElasticsearchGateway(config), hass)
+
+    sink.enqueue(_actions(1, 2))
+    sink.enqueue(_actions(3, 4))
+
+    assert sink.queue_size() == 3
+    assert sink.dropped_documents == 1
+    assert [action["_source"]["value"] for action in sink._queue] == [2, 3, 4]
+
+
+@pytest.mark.asyncio
+async def test_retry_drops_oldest_documents(hass: HomeAssistantType):
+    """Verify retried documents which no longer fit are dropped and counted, rather than newer ones."""
+
+    config = build_full_config({"url": "http://test_sink_queue:9200"})
+    config[CONF_SINK_QUEUE_SIZE] = 3
+
+    sink = PublishSink("test", config, ElasticsearchGateway(config), hass)
+
+    # Documents 1 and 2 failed to send, while 3 and 4 were queued
+    sink.enqueue(_actions(3, 4))
+    sink._requeue(_actions(1, 2))
+
+    assert sink.dropped_documents == 1
+    assert [action["_source"]["value"] for action in sink._queue] == [2, 3, 4]
+
+
+@pytest.mark.asyncio
+async def test_flush_retries_after_connection_error(
+    hass: HomeAssistantType, es_aioclient_mock: AiohttpClientMocker
+):
+    """Verify documents which could not be sent are kept, and sent in order once the cluster is back."""
+
+    es_url = "http://test_sink_retry:9200"
+
+    es_aioclient_mock.post(es_url + "/_bulk", exc=aiohttp.ClientConnectionError())
+    mock_es_initialization(es_aioclient_mock, es_url)
+
+    config = build_full_config({"url": es_url})
+    gateway = ElasticsearchGateway(config)
+    await gateway.async_init()
+
+    sink = PublishSink("test", config, gateway, hass)
+    sink.enqueue(_actions(1, 2))
+
+    await sink.async_flush()
+
+    assert gateway.active_connection_error
+    assert not sink.available
+    assert sink.queue_size() == 2
+
+    # Documents queued while the cluster is unavailable are sent after the retried ones
+    sink.enqueue(_actions(3))
+    await sink.async_flush()
+    assert sink.queue_size() == 3
+
+    es_aioclient_mock.clear_requests()
+    mock_es_initialization(es_aioclient_mock, es_url)
+    gateway.notify_of_request_success()
+
+    await sink.async_flush()
+
+    assert sink.queue_size() == 0
+    [bulk_request] = extract_es_bulk_requests(es_aioclient_mock)
+    assert [line["value"] for line in bulk_request.data[1::2]] == [1, 2, 3]
+
+    await gateway.async_stop_gateway()
+
+
+@pytest.mark.asyncio
+async def test_bulk_requests_are_bounded_by_default(
+    hass: HomeAssistantType, es_aioclient_mock: AiohttpClientMocker
+):
+    """Verify bulk requests stay below the default http.max_content_length, even when the limit is 0."""
+
+    es_url = "http://test_sink_default_max_bytes:9200"
+
+    mock_es_initialization(es_aioclient_mock, es_url)
+
+    config = build_full_config({"url": es_url})
+    config[CONF_BULK_MAX_BYTES] = 0
+    gateway = ElasticsearchGateway(config)
+    await gateway.async_init()
+
+    sink = PublishSink("test", config, gateway, hass)
+    await sink.async_init()
+
+    assert sink._max_bulk_bytes == DEFAULT_BULK_MAX_BYTES == 100 * 1024 * 1024
+
+    # A large backlog is split into requests below the limit
+    with mock.patch.object(sink, "_max_bulk_bytes", 200):
+        assert await sink.async_send(_actions(*range(10))) == []
+
+    bulk_requests = extract_es_bulk_requests(es_aioclient_mock)
+    assert len(bulk_requests) > 1
+    assert sum(len(request.data) for request in bulk_requests) == 20
+
+    await gateway.async_stop_gateway()
+
+
+@pytest.mark.asyncio
+async def test_bulk_response_only_contains_failed_items(
+    hass: HomeAssistantType, es_aioclient_mock: AiohttpClientMocker
+):
+    """Verify bulk requests only ask for failed items, and rejected items shrink the chunk size."""
+
+    es_url = "http://test_sink_filter_path:9200"
+
+    es_aioclient_mock.post(
+        es_url + "/_bulk",
+        json={
+            "errors": True,
+            "items": [
+                {
+                    "index": {
+                        "error": {
+                            "type": "es_rejected_execution_exception",
+                            "reason": "rejected execution",
+                        }
+                    }
+                }
+            ],
+        },
+    )
+    mock_es_initialization(es_aioclient_mock, es_url)
+
+    config = build_full_config({"url": es_url})
+    gateway = ElasticsearchGateway(config)
+    await gateway.async_init()
+
+    sink = PublishSink("test", config, gateway, hass)
+    chunk_size = sink.chunk_sizer.chunk_size
+
+    assert await sink.async_send(_actions(1, 2)) == []
+
+    [bulk_request] = extract_es_bulk_requests(es_aioclient_mock)
+    assert bulk_request.url.query["filter_path"] == "errors,items.*.error"
+    assert len(bulk_request.data) == 4
+    assert sink.chunk_sizer.chunk_size < chunk_size
+
+    await gateway.async_stop_gateway()
+
+
+@pytest.mark.asyncio
+async def test_filtered_rejected_items_record_overload(
+    hass: HomeAssistantType, es_aioclient_mock: AiohttpClientMocker
+):
+    """Verify items rejected by a circuit breaker are recognized without their status."""
+
+    es_url = "http://test_sink_rejected_items:9200"
+
+    # The filtered response only contains the error of the rejected item, not its 429 status
+    es_aioclient_mock.post(
+        es_url + "/_bulk",
+        json={
+            "errors": True,
+            "items": [
+                {
+                    "index": {
+                        "error": {
+                            "type": "circuit_breaking_exception",
+                            "reason": "[parent] Data too large",
+                        }
+                    }
+                }
+            ],
+        },
+    )
+    mock_es_initialization(es_aioclient_mock, es_url)
+
+    config = build_full_config({"url": es_url})
+    gateway = ElasticsearchGateway(config)
+    await gateway.async_init()
+
+    sink = PublishSink("test", config, gateway, hass)
+
+    with mock.patch.object(sink.chunk_sizer, "record_overload") as record_overload:
+        assert await sink.async_send(_actions(1, 2)) == []
+
+    record_overload.assert_called_once_with("documents rejected")
+
+    await gateway.async_stop_gateway()
+
+
+@pytest.mark.asyncio
+async def test_failed_items_are_not_reported_as_success(
+    hass: HomeAssistantType,
+    es_aioclient_mock: AiohttpClientMocker,
+    caplog: pytest.LogCaptureFixture,
+):
+    """Verify a publish with failed items is summarized instead of reported as successful."""
+
+    es_url = "http://test_sink_failed_summary:9200"
+
+    es_aioclient_mock.post(
+        es_url + "/_bulk",
+        json={
+            "errors": True,
+            "items": [{"index": {"error": {"type": "mapper_parsing_exception"}}}],
+        },
+    )
+    mock_es_initialization(es_aioclient_mock, es_url)
+
+    config = build_full_config({"url": es_url})
+    gateway = ElasticsearchGateway(config)
+    await gateway.async_init()
+
+    sink = PublishSink("test", config, gateway, hass)
+
+    assert await sink.async_send(_actions(1, 2)) == []
+
+    assert "Publish Succeeded" not in caplog.text
+    assert "[test] Published 1 of 2 documents, 1 failed to index" in caplog.text
+
+    await gateway.async_stop_gateway()
@@ -0,0 +1,114 @@
+"""Tests for the per-entity rate limiter."""
+
+import pytest
+from homeassistant.core import State
+
+from custom_components.elasticsearch.const import (
+    CONF_RATE_LIMIT_DOMAINS,
+    CONF_RATE_LIMIT_ENTITIES,
+    CONF_RATE_LIMIT_PER_ENTITY,
+    CONF_RATE_LIMIT_STRATEGY,
+    RATE_LIMIT_STRATEGY_DROP,
+    RATE_LIMIT_STRATEGY_LATEST,
+)
+from custom_components.elasticsearch.errors import ElasticException
+from custom_components.elasticsearch.es_rate_limiter import (
+    EntityRateLimiter,
+    TokenBucket,
+)
+
+
+def test_token_bucket_refill():
+    """Verify tokens are consumed and refilled at the configured rate."""
+    bucket = TokenBucket(rate_per_minute=6, capacity=1, now=0)
+
+    assert bucket.try_consume(0)
+    assert not bucket.try_consume(5)
+    assert bucket.try_consume(10)
+    assert not bucket.try_consume(10)
+
+
+def test_disabled_by_default():
+    """Verify all state changes are allowed when no limits are configured."""
+    limiter = EntityRateLimiter({})
+
+    assert not limiter.enabled
+    for i in range(100):
+        assert limiter.allow(State("sensor.power", str(i)), None, now=0)
+    assert limiter.total_suppressed == 0
+
+
+def test_drop_strategy():
+    """Verify excess state changes are dropped and counted."""
+    limiter = EntityRateLimiter(
+        {
+            CONF_RATE_LIMIT_PER_ENTITY: 1,
+            CONF_RATE_LIMIT_STRATEGY: RATE_LIMIT_STRATEGY_DROP,
+        }
+    )
+
+    assert limiter.allow(State("sensor.power", "1"), None, now=0)
+    assert not limiter.allow(State("sensor.power", "2"), None, now=1)
+    assert not limiter.allow(State("sensor.power", "3"), None, now=2)
+    # Other entities have their own bucket
+    assert limiter.allow(State("sensor.energy", "1"), None, now=2)
+
+    assert not limiter.has_pending()
+    assert limiter.release_pending(now=120) == []
+    assert limiter.suppressed_counts == {"sensor.power": 2}
+    assert limiter.reset_publish_stats() == 2
+    assert limiter.reset_publish_stats() == 0
+
+
+def test_latest_strategy():
+    """Verify only the latest suppressed value is held back and released."""
+    limiter = EntityRateLimiter(
+        {
+            CONF_RATE_LIMIT_PER_ENTITY: 1,
+            CONF_RATE_LIMIT_STRATEGY: RATE_LIMIT_STRATEGY_LATEST,
+        }
+    )
+
+    assert limiter.allow(State("sensor.power", "1"), None, now=0)
+    assert not limiter.allow(State("sensor.power", "2"), None, now=1)
+    assert not limiter.allow(State("sensor.power", "3"), None, now=2)
+
+    assert limiter.has_pending()
+    assert limiter.release_pending(now=30) == []
+
+    released = limiter.release_pending(now=60)
+    assert [state.state for (state, _) in released] == ["3"]
+    assert not limiter.has_pending()
+    assert limiter.suppressed_counts == {"sensor.power": 1}
+
+
+def test_rate_resolution():
+    """Verify entity overrides take precedence over domain overrides and the default."""
+    limiter = EntityRateLimiter(
+        {
+            CONF_RATE_LIMIT_PER_ENTITY: 60,
+            CONF_RATE_LIMIT_DOMAINS: {"sensor": 1},
+            CONF_RATE_LIMIT_ENTITIES: {"sensor.unlimited": 0},
+            CONF_RATE_LIMIT_STRATEGY: RATE_LIMIT_STRATEGY_DROP,
+        }
+    )
+
+    # sensor domain: 1/min
+    assert limiter.allow(State("sensor.power", "1"), None, now=0)
+    assert not limiter.allow(State("sensor.power", "2"), None, now=1)
+
+    # explicit entity override disables the limit
+    for i in range(10):
+        assert limiter.allow(State("sensor.unlimited", str(i)), None, now=0)
+
+    # default: 60/min
+    assert limiter.allow(State("switch.plug", "on"), None, now=0)
+    assert limiter.allow(State("switch.plug", "off"), None, now=1)
+
+
+def test_invalid_strategy():
+    """Verify an unknown strategy is rejected."""
+    with pytest.raises(ElasticException):
+        EntityRateLimiter(
+            {CONF_RATE_LIMIT_PER_ENTITY: 1, CONF_RATE_LIMIT_STRATEGY: "unknown"}
+        )
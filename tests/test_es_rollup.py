@@ -0,0 +1,109 @@
+"""Tests for the rollup aggregator."""
+
+from datetime import UTC, datetime, timedelta
+
+from homeassistant.core import State
+
+from custom_components.elasticsearch.const import (
+    CONF_ROLLUP_DOMAINS,
+    CONF_ROLLUP_ENTITIES,
+    CONF_ROLLUP_PASSTHROUGH_ENTITIES,
+    CONF_ROLLUP_WINDOW,
+)
+from custom_components.elasticsearch.es_rollup import RollupAggregator
+
+START = datetime(2023, 4, 12, 12, tzinfo=UTC)
+
+
+def test_disabled_by_default():
+    """Verify nothing is rolled up when no domains or entities are configured."""
+    aggregator = RollupAggregator({})
+
+    assert not aggregator.enabled
+    assert not aggregator.rolls_up(State("sensor.power", "1"))
+
+
+def test_rolls_up_domains_and_entities():
+    """Verify rolled up and passed through entities are resolved by domain and entity."""
+    aggregator = RollupAggregator(
+        {
+            CONF_ROLLUP_DOMAINS: ["sensor"],
+            CONF_ROLLUP_ENTITIES: ["counter.test_1"],
+            CONF_ROLLUP_PASSTHROUGH_ENTITIES: ["sensor.energy"],
+        }
+    )
+
+    assert aggregator.rolls_up(State("sensor.power", "1"))
+    assert aggregator.rolls_up(State("counter.test_1", "1"))
+    assert not aggregator.rolls_up(State("counter.test_2", "1"))
+    assert aggregator.passes_through(State("sensor.energy", "1"))
+    assert not aggregator.passes_through(State("sensor.power", "1"))
+
+
+def test_windows_are_aggregated_and_closed():
+    """Verify values are aggregated per clock-aligned window, and only closed windows are collected."""
+    aggregator = RollupAggregator(
+        {CONF_ROLLUP_ENTITIES: ["sensor.power"], CONF_ROLLUP_WINDOW: 60}
+    )
+
+    for offset, value in ((5, 10.0), (20, 30.0), (50, 20.0)):
+        aggregator.add(
+            State("sensor.power", str(value)), value, START + timedelta(seconds=offset)
+        )
+
+    assert not aggregator.has_closed_windows(START + timedelta(seconds=59))
+    assert aggregator.collect(START + timedelta(seconds=59)) == []
+    assert aggregator.has_closed_windows(START + timedelta(seconds=60))
+
+    # A state change in the next window closes the previous one
+    aggregator.add(State("sensor.power", "40.0"), 40.0, START + timedelta(seconds=61))
+    assert aggregator.has_closed_windows(START + timedelta(seconds=61))
+
+    [rollup] = aggregator.collect(START + timedelta(seconds=62))
+    assert rollup.start == START
+    assert rollup.state.state == "20.0"
+    assert (rollup.count, rollup.min, rollup.max, rollup.avg, rollup.last) == (
+        3,
+        10.0,
+        30.0,
+        20.0,
+        20.0,
+    )
+
+    # The open window is closed once its end has passed
+    [rollup] = aggregator.collect(START + timedelta(seconds=120))
+    assert rollup.start == START + timedelta(seconds=60)
+    assert rollup.count == 1
+    assert not aggregator.has_closed_windows(START + timedelta(seconds=120))
+
+
+def test_idle_entities_carry_forward():
+    """Verify idle entities get one empty window per ended window, carrying their value forward."""
+    aggregator = RollupAggregator(
+        {CONF_ROLLUP_ENTITIES: ["sensor.power"], CONF_ROLLUP_WINDOW: 60}
+    )
+    state = State("sensor.power", "10.0")
+
+    rollup = aggregator.carry_forward(state, 10.0, START + timedelta(seconds=30))
+    assert rollup.start == START - timedelta(seconds=60)
+    assert (rollup.count, rollup.min, rollup.max, rollup.avg, rollup.last) == (
+        0,
+        10.0,
+        10.0,
+        10.0,
+        10.0,
+    )
+
+    # Only once per window
+    assert aggregator.carry_forward(state, 10.0, START + timedelta(seconds=45)) is None
+
+    # An entity with an open window is not idle
+    aggregator.add(state, 10.0, START + timedelta(seconds=70))
+    assert aggregator.carry_forward(state, 10.0, START + timedelta(seconds=90)) is None
+
+    # Nor is an entity whose last window was collected
+    aggregator.collect(START + timedelta(seconds=120))
+    assert aggregator.carry_forward(state, 10.0, START + timedelta(seconds=130)) is None
+
+    rollup = aggregator.carry_forward(state, 10.0, START + timedelta(seconds=190))
+    assert rollup.start == START + timedelta(seconds=120)
@@ -0,0 +1,85 @@
+"""Tests for the storage profiles."""
+
+from custom_components.elasticsearch.const import (
+    STORAGE_PROFILE_BALANCED,
+    STORAGE_PROFILE_MINIMAL_STORAGE,
+    STORAGE_PROFILE_QUERY_OPTIMIZED,
+)
+from custom_components.elasticsearch.es_storage_profile import STORAGE_PROFILES
+from custom_components.elasticsearch.es_version import ElasticsearchVersion
+
+
+def _es_version(major: int, minor: int, build_flavor: str = "default"):
+    es_version = ElasticsearchVersion(client=None)
+    es_version.major = major
+    es_version.minor = minor
+    es_version.build_flavor = build_flavor
+    return es_version
+
+
+def _mappings():
+    return {
+        "dynamic_templates": [
+            {
+                "attributes": {
+                    "path_match": "hass.entity.attributes.*",
+                    "mapping": {"type": "text", "fields": {"keyword": {"type": "keyword"}}},
+                }
+            }
+        ],
+        "properties": {"value": {"type": "text"}, "id": {"type": "keyword"}},
+    }
+
+
+def test_balanced_profile_is_unchanged():
+    """Verify the balanced profile renders the templates as shipped."""
+    settings = {"codec": "best_compression"}
+    mappings = _mappings()
+
+    STORAGE_PROFILES[STORAGE_PROFILE_BALANCED].render(
+        settings, mappings, _es_version(8, 11)
+    )
+
+    assert settings == {"codec": "best_compression"}
+    assert mappings == _mappings()
+
+
+def test_minimal_storage_profile():
+    """Verify the minimal storage profile sorts by entity, disables norms, and uses synthetic _source where supported."""
+    settings = {"codec": "best_compression"}
+    mappings = _mappings()
+
+    STORAGE_PROFILES[STORAGE_PROFILE_MINIMAL_STORAGE].render(
+        settings, mappings, _es_version(8, 18)
+    )
+
+    assert settings == {
+        "codec": "best_compression",
+        "index.mapping.source.mode": "synthetic",
+        "index.sort.field": ["hass.entity.id", "@timestamp"],
+        "index.sort.order": ["asc", "desc"],
+        "index.refresh_interval": "30s",
+        "index.number_of_replicas": 0,
+    }
+    assert mappings["properties"]["value"]["norms"] is False
+    assert "norms" not in mappings["properties"]["id"]
+    assert mappings["dynamic_templates"][0]["attributes"]["mapping"]["norms"] is False
+
+    # Synthetic _source is not supported, and time series indices have their own sort order
+    settings = {}
+    STORAGE_PROFILES[STORAGE_PROFILE_MINIMAL_STORAGE].render(
+        settings, _mappings(), _es_version(8, 11), time_series=True
+    )
+    assert "index.mapping.source.mode" not in settings
+    assert "index.sort.field" not in settings
+
+
+def test_query_optimized_profile_on_serverless():
+    """Verify serverless only receives the settings it allows."""
+    settings = {"codec": "best_compression"}
+
+    STORAGE_PROFILES[STORAGE_PROFILE_QUERY_OPTIMIZED].render(
+        settings, _mappings(), _es_version(8, 11, "serverless")
+    )
+
+    assert settings == {"codec": "default"}
@@ -0,0 +1,76 @@
+"""Tests for the startup import cost of the integration."""
+
+import json
+import os
+import subprocess
+import sys
+
+# The integration has to import in less time than this share of the time the Elasticsearch client,
+# which it defers, takes to import in the same interpreter. Both are measured on the same machine
+# under the same load, so the budget does not depend on the speed of CI.
+IMPORT_TIME_BUDGET = 1.0
+
+# Modules which Home Assistant has already loaded by the time the integration is imported.
+PRELOADED_MODULES = [
+    "homeassistant.config_entries",
+    "homeassistant.core",
+    "homeassistant.helpers.area_registry",
+    "homeassistant.helpers.config_validation",
+    "homeassistant.helpers.device_registry",
+    "homeassistant.helpers.entity_registry",
+    "homeassistant.helpers.event",
+    "homeassistant.helpers.state",
+    "homeassistant.helpers.storage",
+]
+
+# Modules which are only needed once the integration connects to a cluster.
+DEFERRED_MODULES = ["elasticsearch7", "pytz", "urllib3"]
+
+
+def _import_integration() -> tuple[dict[str, int], list[str]]:
+    """Import the integration, then the Elasticsearch client, in a fresh interpreter.
+
+    Returns the cumulative import time of both, and the modules the integration loaded.
+    """
+    script = (
+        "import json, sys\n"
+        f"import {', '.join(PRELOADED_MODULES)}\n"
+        "preloaded = set(sys.modules)\n"
+        "import custom_components.elasticsearch\n"
+        "print(json.dumps(sorted(set(sys.modules) - preloaded)))\n"
+        "import elasticsearch7\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", script],
+        capture_output=True,
+        check=True,
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+        text=True,
+    )
+
+    # Each line of the profile is "import time: self [us] | cumulative | module".
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() in (
+            "custom_components.elasticsearch",
+            "elasticsearch7",
+        ):
+            cumulative[parts[2].strip()] = int(parts[1])
+
+    assert len(cumulative) == 2, result.stderr
+    return cumulative, json.loads(result.stdout)
+
+
+def test_import_time_budget():
+    """Verify the integration defers its heavy dependencies, and imports within budget."""
+    cumulative, modules = _import_integration()
+
+    assert "custom_components.elasticsearch" in modules
+    for module in modules:
+        assert module.split(".")[0] not in DEFERRED_MODULES, module
+
+    assert (
+        cumulative["custom_components.elasticsearch"]
+        < IMPORT_TIME_BUDGET * cumulative["elasticsearch7"]
+    )
@@ -0,0 +1,52 @@
+"""Tests for the component logger."""
+
+import logging
+
+from custom_components.elasticsearch.logger import LOGGER, EventTracer
+
+
+def test_tracing_requires_debug_logging():
+    """Verify no events are traced unless debug logging is enabled."""
+    LOGGER.setLevel(logging.INFO)
+    try:
+        tracer = EventTracer(sample_rate=1, entities=["sensor.traced"])
+
+        assert not tracer.debug_enabled
+        assert not tracer.should_trace("sensor.traced")
+        assert not tracer.should_trace("sensor.other")
+
+        LOGGER.setLevel(logging.DEBUG)
+
+        # The level is only picked up on refresh
+        assert not tracer.should_trace("sensor.traced")
+        tracer.refresh()
+        assert tracer.should_trace("sensor.traced")
+    finally:
+        LOGGER.setLevel(logging.NOTSET)
+
+
+def test_tracing_is_opt_in():
+    """Verify debug logging alone does not trace every event."""
+    LOGGER.setLevel(logging.DEBUG)
+    try:
+        tracer = EventTracer()
+
+        assert tracer.debug_enabled
+        assert not tracer.active
+        assert not tracer.should_trace("sensor.other")
+    finally:
+        LOGGER.setLevel(logging.NOTSET)
+
+
+def test_sampled_and_entity_tracing():
+    """Verify sampled events and traced entities are selected."""
+    LOGGER.setLevel(logging.DEBUG)
+    try:
+        tracer = EventTracer(sample_rate=3, entities=["sensor.traced"])
+
+        sampled = [tracer.should_trace("sensor.other") for _ in range(6)]
+        assert sampled == [False, False, True, False, False, True]
+
+        assert all(tracer.should_trace("sensor.traced") for _ in range(5))
+    finally:
+        LOGGER.setLevel(logging.NOTSET)
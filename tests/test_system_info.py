@@ -34,3 +34,21 @@ async def test_error_handling(hass: HomeAssistantType):
     with mock.patch('homeassistant.helpers.system_info.async_get_system_info', side_effect=mock_get_system_info):
         sys_info = SystemInfo(hass)
         assert await sys_info.async_get_system_info() == {}
+
+
+@pytest.mark.asyncio
+async def test_cached(hass: HomeAssistantType):
+    """Verify system info is only retrieved once, and failures are not cached."""
+
+    with mock.patch(
+        "homeassistant.helpers.system_info.async_get_system_info",
+        side_effect=[
+            HomeAssistantError("Something bad happened"),
+            {"version": current_version},
+        ],
+    ) as get_system_info:
+        assert await SystemInfo(hass).async_get_system_info() == {}
+        assert (await SystemInfo(hass).async_get_system_info())["version"] == current_version
+        assert (await SystemInfo(hass).async_get_system_info())["version"] == current_version
+
+    assert get_system_info.call_count == 2
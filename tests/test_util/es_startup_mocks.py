@@ -1,5 +1,7 @@
 """ES Startup Mocks."""
 
+import re
+
 from homeassistant.const import CONF_URL, CONTENT_TYPE_JSON
 from pytest_homeassistant_custom_component.test_util.aiohttp import AiohttpClientMocker
 
@@ -8,6 +10,11 @@ from custom_components.elasticsearch.config_flow import (
     DEFAULT_ILM_POLICY_NAME,
     DEFAULT_INDEX_FORMAT,
 )
+from custom_components.elasticsearch.const import (
+    ENRICHMENT_PIPELINE_NAME,
+    ENTITY_METADATA_ENRICH_POLICY_NAME,
+    ENTITY_METADATA_INDEX_NAME,
+)
 from tests.const import (
     CLUSTER_HEALTH_RESPONSE_BODY,
     CLUSTER_INFO_7DOT11_RESPONSE_BODY,
@@ -36,6 +43,8 @@ def mock_es_initialization(
     mock_index_creation=True,
     mock_health_check=True,
     mock_ilm_setup=True,
+    mock_datastream_setup=True,
+    mock_attribute_mappings=True,
     mock_serverless_version=False,
     mock_unsupported_version=False,
     mock_authentication_error=False,
@@ -174,18 +183,23 @@ def mock_es_initialization(
         )
 
     if mock_modern_template_setup:
-        aioclient_mock.get(
-            url + "/_index_template/metrics-homeassistant",
-            status=404,
-            headers={"content-type": CONTENT_TYPE_JSON},
-            json={"error": "template missing"},
-        )
-        aioclient_mock.put(
-            url + "/_index_template/metrics-homeassistant",
-            status=200,
-            headers={"content-type": CONTENT_TYPE_JSON},
-            json={"hi": "need dummy content"},
-        )
+        for template_name in [
+            "metrics-homeassistant",
+            "metrics-homeassistant_numeric",
+            "metrics-homeassistant_rollup",
+        ]:
+            aioclient_mock.get(
+                url + f"/_index_template/{template_name}",
+                status=404,
+                headers={"content-type": CONTENT_TYPE_JSON},
+                json={"error": "template missing"},
+            )
+            aioclient_mock.put(
+                url + f"/_index_template/{template_name}",
+                status=200,
+                headers={"content-type": CONTENT_TYPE_JSON},
+                json={"hi": "need dummy content"},
+            )
     if mock_template_setup:
         aioclient_mock.get(
             url + "/_template/hass-index-template-v4_2",
@@ -303,3 +317,49 @@ def mock_es_initialization(
             headers={"content-type": CONTENT_TYPE_JSON},
             json={"hi": "need dummy content"},
         )
+
+    if mock_datastream_setup:
+        datastream_url = re.compile(re.escape(url) + "/_data_stream/")
+        aioclient_mock.get(
+            datastream_url,
+            status=200,
+            headers={"content-type": CONTENT_TYPE_JSON},
+            json={"data_streams": []},
+        )
+        aioclient_mock.put(
+            datastream_url,
+            status=200,
+            headers={"content-type": CONTENT_TYPE_JSON},
+            json={"acknowledged": True},
+        )
+
+    if mock_attribute_mappings:
+        aioclient_mock.get(
+            re.compile(re.escape(url) + "/[^/]+/_mapping/field/"),
+            status=200,
+            headers={"content-type": CONTENT_TYPE_JSON},
+            json={},
+        )
+
+
+def mock_es_enrichment_setup(aioclient_mock: AiohttpClientMocker, url: str):
+    """Mock the requests which install the enrichment on a cluster."""
+    aioclient_mock.put(
+        f"{url}/{ENTITY_METADATA_INDEX_NAME}", json={"acknowledged": True}
+    )
+    aioclient_mock.get(
+        f"{url}/_enrich/policy/{ENTITY_METADATA_ENRICH_POLICY_NAME}",
+        json={"policies": []},
+    )
+    aioclient_mock.put(
+        f"{url}/_enrich/policy/{ENTITY_METADATA_ENRICH_POLICY_NAME}/_execute",
+        json={"status": {"phase": "COMPLETE"}},
+    )
+    aioclient_mock.put(
+        f"{url}/_enrich/policy/{ENTITY_METADATA_ENRICH_POLICY_NAME}",
+        json={"acknowledged": True},
+    )
+    aioclient_mock.put(
+        f"{url}/_ingest/pipeline/{ENRICHMENT_PIPELINE_NAME}",
+        json={"acknowledged": True},
+    )
@@ -0,0 +1,49 @@
+"""Tests for utilities."""
+
+import asyncio
+
+import pytest
+
+from custom_components.elasticsearch.utils import async_gather_all, parse_byte_size
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [
+        ("100mb", 100 * 1024 * 1024),
+        ("10MB", 10 * 1024 * 1024),
+        ("512kb", 512 * 1024),
+        ("1.5gb", int(1.5 * 1024**3)),
+        ("2048b", 2048),
+        ("2048", 2048),
+    ],
+)
+def test_parse_byte_size(value, expected):
+    """Verify Elasticsearch byte size values are converted to bytes."""
+    assert parse_byte_size(value) == expected
+
+
+def test_parse_byte_size_invalid():
+    """Verify unknown units are rejected."""
+    with pytest.raises(ValueError):
+        parse_byte_size("10 parsecs")
+
+
+@pytest.mark.asyncio
+async def test_async_gather_all():
+    """Verify all awaitables complete before the first error is raised."""
+    completed = []
+
+    async def step(name, error=None):
+        await asyncio.sleep(0)
+        completed.append(name)
+        if error:
+            raise error
+
+    with pytest.raises(KeyError):
+        await async_gather_all(
+            step("first", KeyError()), step("second", ValueError()), step("third")
+        )
+
+    assert sorted(completed) == ["first", "second", "third"]
+    assert await async_gather_all(step("fourth")) == [None]